@@ -0,0 +1,10 @@
+from ._lazy import lazy_exports
+
+_EXPORTS = {
+    "RunStats": ".run_stats",
+    "TMP_PREFIX": ".file_io",
+    "atomic_write": ".file_io",
+    "encode_image": ".file_io",
+}
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
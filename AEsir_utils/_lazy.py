@@ -0,0 +1,29 @@
+import importlib
+
+
+def lazy_exports(package, exports):
+    """Build the module-level ``__getattr__`` and ``__dir__`` of a lazily loaded package.
+
+    Args:
+        package (str): ``__name__`` of the package.
+        exports (dict): Maps each public name to the relative module defining it,
+                        e.g. ``{"img_crop_square": ".img_process"}``. The module is
+                        only imported when the name is first accessed.
+
+    Returns:
+        tuple: ``(__getattr__, __dir__)`` to assign in the package ``__init__``.
+    """
+    namespace = importlib.import_module(package).__dict__
+
+    def __getattr__(name):
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module, package), name)
+        namespace[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(namespace) | set(exports))
+
+    return __getattr__, __dir__
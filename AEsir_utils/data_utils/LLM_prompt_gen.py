@@ -1,7 +1,23 @@
+import hashlib
+import io
+import json
 import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from ..run_stats import timed
 from .data_visual import tree_to_string
+from .dir_tree import scan_tree
+from .prompt_cache import PromptCache
 from pathlib import Path
 
+__all__ = [
+    "OVERVIEW_PROMPT", "FILE_PROMPT", "DEFAULT_KNOWN_TEXT_EXTENSIONS",
+    "SIGNATURES_PROMPT", "ENTRY_POINT_NAMES", "approx_token_count", "tiktoken_counter",
+    "rank_files", "generate_proj_prompt", "generate_proj_prompt_2",
+    "iter_proj_prompt", "write_proj_prompt", "iter_proj_prompt_shards",
+]
+
 OVERVIEW_PROMPT = """
 ====================================== Project Directory Structure (Source Files) ======================================
 {proj_dir_tree}
@@ -14,6 +30,12 @@ FILE_PROMPT = """
 ===================================================================================================================
 """
 
+SIGNATURES_PROMPT = """
+============================================ the signatures of the file ({file}) ===========================================
+{signatures}
+===================================================================================================================
+"""
+
 DEFAULT_KNOWN_TEXT_EXTENSIONS = {
     # Code & Scripts
     ".py", ".ipynb", ".js", ".ts", ".jsx", ".tsx", ".html", ".htm", ".xhtml", ".css",
@@ -32,48 +54,381 @@ DEFAULT_KNOWN_TEXT_EXTENSIONS = {
     "", # For files like 'Makefile', 'Dockerfile', 'LICENSE', 'README' (will be checked by name too)
 }
 
+# Number of leading bytes inspected to tell text from binary files.
+SNIFF_BYTES = 8192
+# Control characters that do not occur in text files (everything below 0x20
+# except \t \n \f \r and ESC, plus DEL).
+_BINARY_BYTES = bytes(set(range(32)) - {9, 10, 12, 13, 27} | {127})
+
+def _looks_binary(head):
+    """Guess from the first bytes of a file whether it is binary."""
+    if b"\0" in head:
+        return True
+    if not head:
+        return False
+    return len(head.translate(None, _BINARY_BYTES)) < len(head) * 0.9
+
+def _suffix(file_name):
+    """Same as ``Path(file_name).suffix`` without building a Path."""
+    i = file_name.rfind('.')
+    if 0 < i < len(file_name) - 1:
+        return file_name[i:]
+    return ''
+
 def generate_proj_prompt(
     proj_dir: str
 ) -> str:
     """
     Generate a prompt for a project directory.
 
+    Every file except hidden ones and ``.pyc`` files is included, unfiltered. The prompt is
+    assembled by the same piece iterator and writer as `iter_proj_prompt` and
+    `write_proj_prompt`, reading one file at a time. Use `generate_proj_prompt_2` for
+    exclusions, size limits and token budgets.
+
     Args:
         proj_dir (str): The path to the project directory.
 
     Returns:
         str: The generated prompt.
     """
-    dir_pefix = proj_dir
-    if not dir_pefix.endswith("/"):
-        dir_pefix += "/"
-    prompt_1 = OVERVIEW_PROMPT.format(proj_dir_tree=tree_to_string(proj_dir))
-    
-    file_path_lst = []
-    for root, dirs, files in os.walk(proj_dir):
-        if "/." in root:
-            continue
-        for file in files:
-            if file.startswith('.'):
+    out = io.StringIO()
+    _write_pieces(_iter_prompt(_legacy_prompt_parts(proj_dir)), out)
+    return out.getvalue()
+
+def _legacy_prompt_parts(proj_dir):
+    """``(overview_prompt, file_prompts)`` of `generate_proj_prompt`, the blocks read lazily."""
+    tree = scan_tree(proj_dir) # Walk once; the tree and the file list share the result
+    overview_prompt = OVERVIEW_PROMPT.format(proj_dir_tree=tree_to_string(tree))
+
+    def file_prompts():
+        for file in tree.iter_files():
+            if file.name.startswith('.'):
+                continue
+            if ".pyc" in file.name:
                 continue
-            if ".pyc" in file:
+            with open(file.path, 'r') as f:
+                yield FILE_PROMPT.format(file=file.rel_path, file_content=f.read())
+
+    return overview_prompt, file_prompts()
+
+def approx_token_count(text):
+    """Fast token estimate (about 4 characters per token for code and English text)."""
+    return (len(text) + 3) // 4
+
+def tiktoken_counter(encoding="cl100k_base"):
+    """
+    Returns an exact token counter for `max_tokens` budgets, based on tiktoken.
+
+    Args:
+        encoding (str, optional): Name of the tiktoken encoding. Defaults to "cl100k_base".
+
+    Returns:
+        callable: Maps a string to its number of tokens.
+    """
+    try:
+        import tiktoken
+    except ImportError as e:
+        raise ImportError("tiktoken_counter requires the 'tiktoken' package") from e
+    enc = tiktoken.get_encoding(encoding)
+    return lambda text: len(enc.encode(text, disallowed_special=()))
+
+# File names (lowercase) ranked first by `rank_files`, along with README files.
+ENTRY_POINT_NAMES = {
+    "main.py", "__main__.py", "app.py", "manage.py", "setup.py", "pyproject.toml",
+    "index.js", "index.ts", "main.js", "main.ts", "server.js", "package.json",
+    "main.go", "go.mod", "main.rs", "lib.rs", "cargo.toml", "makefile", "dockerfile",
+}
+
+def rank_files(files):
+    """
+    Orders files by how useful they are in a size-limited prompt.
+
+    Entry points (ENTRY_POINT_NAMES and README files) come first, shallowest first. The
+    other files are ordered by the sum of their recency rank (newest first) and their size
+    rank (smallest first), so recently modified small files come before old large ones.
+
+    Args:
+        files (list): FileNode objects, e.g. from `scan_tree`.
+
+    Returns:
+        list: The same files, highest priority first.
+    """
+    entries, others = [], []
+    for item in files:
+        name = item.name.lower()
+        if name in ENTRY_POINT_NAMES or name.startswith("readme"):
+            entries.append(item)
+        else:
+            others.append(item)
+    entries.sort(key=lambda item: (item.rel_path.count(os.sep), item.rel_path))
+
+    def stat_or_none(item):
+        try:
+            return item.stat()
+        except OSError:
+            return None
+
+    stats = {id(item): stat_or_none(item) for item in others}
+    by_recency = sorted(others, key=lambda item: -stats[id(item)].st_mtime_ns if stats[id(item)] else 0)
+    by_size = sorted(others, key=lambda item: stats[id(item)].st_size if stats[id(item)] else float("inf"))
+    score = {}
+    for rank, item in enumerate(by_recency):
+        score[id(item)] = rank
+    for rank, item in enumerate(by_size):
+        score[id(item)] += rank
+    others.sort(key=lambda item: (score[id(item)], item.rel_path))
+    return entries + others
+
+_SIGNATURE_LINE = re.compile(
+    r"^[ \t]*(?:@\w|(?:export\s+|pub(?:\([^)]*\))?\s+|public\s+|private\s+|protected\s+|static\s+|async\s+|default\s+)*"
+    r"(?:def|class|function|interface|type|struct|enum|trait|impl|fn|func)\b)",
+    re.MULTILINE,
+)
+
+def _signatures(file_content):
+    """The definition lines (functions, classes, ...) of a source file, without their bodies."""
+    lines = []
+    for m in _SIGNATURE_LINE.finditer(file_content):
+        end = file_content.find('\n', m.start())
+        lines.append(file_content[m.start():end if end != -1 else len(file_content)].rstrip())
+    return "\n".join(lines)
+
+def _budgeted_file_prompts(files, max_file_size_kb, read_workers, max_tokens, reserved, token_counter, priority,
+                           cache=None, settings=None, stats=None):
+    """
+    Builds the file blocks of `generate_proj_prompt_2` within `max_tokens`, of which
+    `reserved` tokens are already used by the overview.
+
+    Files are read in priority order. A file whose full content no longer fits is reduced to
+    its signatures, or listed as skipped; once the budget is spent the remaining files are
+    listed without being read. The blocks are returned in tree order.
+    """
+    order = {id(item): i for i, item in enumerate(files)}
+    ranked = priority(list(files))
+    # Keep room for the note listing the skipped files.
+    note_tokens = token_counter(
+        f"--- Token budget of {max_tokens} reached, {len(files)} files skipped: and {len(files)} more ---\n"
+    ) + 1
+    remaining = max_tokens - reserved - note_tokens
+    blocks = {}
+    skipped = []
+    min_block_tokens = token_counter(SIGNATURES_PROMPT.format(file="", signatures=""))
+
+    reads = _ordered_map(
+        lambda item: (item, _file_candidates(item, max_file_size_kb, cache, settings, stats)), ranked, read_workers
+    )
+    done = 0
+    for item, candidates in reads:
+        done += 1
+        for i, block in enumerate(candidates):
+            cost = token_counter(block) + 1 # + the joining newline
+            if cost <= remaining:
+                blocks[order[id(item)]] = block
+                remaining -= cost
+                if i and stats is not None:
+                    stats.count("files_signatures_only")
+                break
+        else:
+            skipped.append(item)
+        if remaining < min_block_tokens:
+            break
+    reads.close()
+    skipped.extend(ranked[done:])
+    if stats is not None:
+        for item in skipped:
+            stats.skip(item.rel_path, "token budget")
+
+    file_prompts = [blocks[i] for i in sorted(blocks)]
+    if skipped:
+        skipped.sort(key=lambda item: order[id(item)])
+        names = []
+        for item in skipped:
+            cost = token_counter(item.rel_path) + 1
+            if cost > remaining:
+                break
+            names.append(item.rel_path)
+            remaining -= cost
+        listed = f": {', '.join(names)}" if names else ""
+        more = f" and {len(skipped) - len(names)} more" if names and len(names) < len(skipped) else ""
+        file_prompts.append(
+            f"--- Token budget of {max_tokens} reached, {len(skipped)} files skipped{listed}{more} ---\n"
+        )
+    return file_prompts
+
+def _select_files(tree, include_extensions, exclude_extensions, exclude_files):
+    """The files of `tree` that pass the name and extension filters of `generate_proj_prompt_2`."""
+    selected = []
+    for item in tree.iter_files():
+        if not item.is_file: # Broken symlinks, sockets, FIFOs, ...
+            continue
+        # 1. Check for hidden files
+        if item.name.startswith('.') and item.name not in (include_extensions or []): # Allow explicitly included hidden files
+            if item.name not in (exclude_files or []): # Unless also in exclude_files
                 continue
-            file_path = os.path.join(root, file)
-            file_path_lst.append(file_path)
-            
-    file_content_lst = []
-    for file_path in file_path_lst:
-        with open(file_path, 'r') as f:
-            file_content = f.read()
-            file_content_lst.append(
-                FILE_PROMPT.format(
-                    file=file_path.replace(dir_pefix, ""),
-                    file_content=file_content
-                )
-            )
-            
-    prompt_2 = "\n".join(file_content_lst)
-    return prompt_1 + "\n" + prompt_2
+
+        # 2. Check against excluded files
+        if item.name in exclude_files:
+            continue
+        # check DEFAULT_KNOWN_TEXT_EXTENSIONS, by extension or by full name (e.g. 'Dockerfile')
+        file_ext = _suffix(item.name).lower()
+        if file_ext not in DEFAULT_KNOWN_TEXT_EXTENSIONS and item.name.lower() not in DEFAULT_KNOWN_TEXT_EXTENSIONS:
+            continue
+
+        # 3. Check file extensions
+        if include_extensions and file_ext not in include_extensions:
+            continue
+        if exclude_extensions and file_ext in exclude_extensions:
+            continue
+        selected.append(item)
+    return selected
+
+# Prefix of the note for files that could not be read; such notes are never cached.
+_READ_ERROR = "--- Could not read file"
+
+def _read_file_text(item, max_file_size_kb, stats=None):
+    """
+    Returns ``(file_content, None)``, or ``(None, note)`` if the file is too large, binary or
+    unreadable. The size limit is checked on the cached stat before the file is opened, and
+    only the first SNIFF_BYTES are read before deciding that it is text.
+    """
+    try:
+        # 4. Check file size (the stat is cached on the tree node)
+        with timed(stats, "stat"):
+            size = item.size
+        if size > max_file_size_kb * 1024:
+            if stats is not None:
+                stats.skip(item.rel_path, f"too large (>{max_file_size_kb}KB)")
+            return None, f"--- File {item.rel_path} is too large (>{max_file_size_kb}KB), content skipped. ---\n"
+
+        # 5. Sniff and read file content
+        with timed(stats, "read"), open(item.path, 'rb') as f:
+            head = f.read(SNIFF_BYTES)
+            data = None if _looks_binary(head) else head + f.read()
+    except Exception as e:
+        if stats is not None:
+            stats.fail(item.rel_path, e)
+        return None, f"{_READ_ERROR} {item.rel_path}: {e} ---\n"
+    if data is None:
+        if stats is not None:
+            stats.skip(item.rel_path, "binary")
+        return None, f"--- File {item.rel_path} appears to be binary, content skipped. ---\n"
+    if stats is not None:
+        stats.count("files_read")
+        stats.count("bytes_read", len(data))
+    # Same result as reading in text mode with errors='replace' (universal newlines)
+    return data.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n'), None
+
+def _read_file_prompt(item, max_file_size_kb, cache=None, settings=None, stats=None):
+    """Returns the prompt block of one file: its FILE_PROMPT, or a note why it was skipped."""
+    key = _cache_key("file", settings, item) if cache is not None else None
+    if key is not None:
+        block = cache.get(key)
+        if block is not None:
+            if stats is not None:
+                stats.count("files_cached")
+            return block
+    file_content, note = _read_file_text(item, max_file_size_kb, stats)
+    if file_content is None:
+        block = note
+    else:
+        block = FILE_PROMPT.format(
+            file=item.rel_path, # Relative path for cleaner output
+            file_content=file_content
+        )
+    if key is not None and not block.startswith(_READ_ERROR):
+        cache.put(key, block)
+    return block
+
+def _file_candidates(item, max_file_size_kb, cache=None, settings=None, stats=None):
+    """The blocks a budgeted prompt may use for one file, best first: the FILE_PROMPT (or the
+    note why it was skipped), then the SIGNATURES_PROMPT if the file has any definitions."""
+    key = _cache_key("file", settings, item) if cache is not None else None
+    if key is not None:
+        block = cache.get(key)
+        signatures_block = cache.get("signatures" + key[4:]) if block is not None else None
+        if signatures_block is not None:
+            if stats is not None:
+                stats.count("files_cached")
+            return [block, signatures_block] if signatures_block else [block]
+    file_content, note = _read_file_text(item, max_file_size_kb, stats)
+    if file_content is None:
+        block, signatures_block = note, ""
+    else:
+        block = FILE_PROMPT.format(file=item.rel_path, file_content=file_content)
+        signatures = _signatures(file_content)
+        signatures_block = SIGNATURES_PROMPT.format(file=item.rel_path, signatures=signatures) if signatures else ""
+    if key is not None and not block.startswith(_READ_ERROR):
+        cache.put(key, block)
+        cache.put("signatures" + key[4:], signatures_block)
+    return [block, signatures_block] if signatures_block else [block]
+
+def _cache_settings(project_path, **options):
+    """Digest of everything besides a file's own stat that its cached blocks depend on."""
+    text = json.dumps(
+        [str(project_path), OVERVIEW_PROMPT, FILE_PROMPT, SIGNATURES_PROMPT, SNIFF_BYTES,
+         {k: sorted(v) if isinstance(v, (list, tuple, set)) else v for k, v in sorted(options.items())}],
+        default=str,
+    )
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+def _cache_key(kind, settings, item):
+    """``kind:settings:rel_path:size:mtime_ns``, or None if the file cannot be stat'ed."""
+    try:
+        st = item.stat()
+    except OSError:
+        return None
+    return f"{kind}:{settings}:{item.rel_path}:{st.st_size}:{st.st_mtime_ns}"
+
+def _overview_key(tree, settings, use_gitignore):
+    """
+    Key of the rendered overview. Adding, removing or renaming an entry updates the mtime of
+    its directory, so the overview is unchanged as long as no directory mtime (and no
+    .gitignore file) changed. None if a directory cannot be stat'ed.
+    """
+    h = hashlib.blake2b(settings.encode('utf-8'), digest_size=16)
+    try:
+        for d in tree.iter_dirs():
+            h.update(f"{d.rel_path}\0{d.stat().st_mtime_ns}\0".encode('utf-8', errors='surrogateescape'))
+            if use_gitignore:
+                try:
+                    st = os.stat(os.path.join(d.path, '.gitignore'))
+                except FileNotFoundError:
+                    continue
+                h.update(f"{st.st_size}\0{st.st_mtime_ns}\0".encode('utf-8'))
+    except OSError:
+        return None
+    return "overview:" + h.hexdigest()
+
+def _flushed_after(blocks, cache, close):
+    """Yields `blocks`, then commits the cache (and closes it if it was opened from a path)."""
+    try:
+        yield from blocks
+    finally:
+        if close:
+            cache.close()
+        else:
+            cache.flush()
+
+def _ordered_map(fn, items, workers):
+    """
+    Like ``map(fn, items)``, but runs up to `workers` calls at once in a thread pool.
+
+    Results are yielded in input order and at most ``4 * workers`` calls are in flight,
+    so latency-bound work (e.g. reads from network filesystems) overlaps without
+    reordering the output or submitting everything up front.
+    """
+    if workers is None or workers <= 1:
+        yield from map(fn, items)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= 4 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
 def generate_proj_prompt_2(
     proj_dir: str,
@@ -81,7 +436,14 @@ def generate_proj_prompt_2(
     exclude_extensions: list = None, # e.g., [".pyc", ".log"]
     exclude_dirs: list = None,       # e.g., [".git", "node_modules", "__pycache__"]
     exclude_files: list = None,      # e.g., [".DS_Store"]
-    max_file_size_kb: int = 1024     # Max file size in KB to include (1MB default)
+    max_file_size_kb: int = 1024,    # Max file size in KB to include (1MB default)
+    use_gitignore: bool = True,      # Skip files and directories ignored by .gitignore files
+    read_workers: int = 1,           # Threads reading files concurrently (output order is kept)
+    max_tokens: int = None,          # Token budget for the whole prompt
+    token_counter=None,              # Callable str -> int, defaults to approx_token_count
+    priority=None,                   # Callable ranking the files, defaults to rank_files
+    cache=None,                      # PromptCache or path of a cache file reused across calls
+    stats=None                       # RunStats collecting phase times, counts and skipped files
 ) -> str:
     """
     Generates a prompt describing a project directory, its structure, and file contents.
@@ -101,14 +463,77 @@ def generate_proj_prompt_2(
                                         unless `include_extensions` overrides this for a specific extension.
         max_file_size_kb (int, optional): Maximum file size in kilobytes to include.
                                           Files larger than this will be skipped. Defaults to 1024KB (1MB).
+        use_gitignore (bool, optional): Honor the project's (nested) .gitignore files. Ignored and
+                                        excluded directories are pruned before they are walked.
+                                        Defaults to True.
+        read_workers (int, optional): Number of threads that read files concurrently. Useful on
+                                      network filesystems, where per-file latency dominates.
+                                      The output order does not depend on it. Defaults to 1.
+        max_tokens (int, optional): Token budget for the whole prompt. Files are then taken in
+                                    `priority` order; once a file's content does not fit it is
+                                    reduced to its signatures (def/class/function lines) or
+                                    listed as skipped. None means no limit.
+        token_counter (callable, optional): Counts the tokens of a string. Defaults to
+                                            `approx_token_count`; see `tiktoken_counter`.
+        priority (callable, optional): Takes the list of candidate FileNode objects and returns
+                                       it highest priority first. Defaults to `rank_files`.
+        cache (PromptCache or str, optional): Persistent cache of the rendered blocks, keyed by
+                                              each file's relative path, size and mtime_ns and by
+                                              the options above. Only changed files are read again,
+                                              and the overview is reused while no directory changed.
+                                              Pass a `PromptCache` to inspect its hit/miss ``stats``.
+        stats (RunStats, optional): Collects the ``walk``, ``select``, ``stat``, ``read`` and
+                                    ``format`` phase times (``stat`` and ``read`` summed over the
+                                    `read_workers` threads), the ``files_read``, ``bytes_read``,
+                                    ``files_cached`` and ``files_signatures_only`` counts, and
+                                    every file skipped (too large, binary, token budget) or
+                                    failed (unreadable), with its reason.
+
+    Files are matched against DEFAULT_KNOWN_TEXT_EXTENSIONS by extension or by full name, and
+    the first SNIFF_BYTES of each file are checked so that binary files are skipped unread.
 
     Returns:
         str: The generated prompt.
     """
+    return "".join(iter_proj_prompt(
+        proj_dir,
+        include_extensions=include_extensions,
+        exclude_extensions=exclude_extensions,
+        exclude_dirs=exclude_dirs,
+        exclude_files=exclude_files,
+        max_file_size_kb=max_file_size_kb,
+        use_gitignore=use_gitignore,
+        read_workers=read_workers,
+        max_tokens=max_tokens,
+        token_counter=token_counter,
+        priority=priority,
+        cache=cache,
+        stats=stats,
+    ))
+
+def _proj_prompt_parts(
+    proj_dir,
+    include_extensions=None,
+    exclude_extensions=None,
+    exclude_dirs=None,
+    exclude_files=None,
+    max_file_size_kb=1024,
+    use_gitignore=True,
+    read_workers=1,
+    max_tokens=None,
+    token_counter=None,
+    priority=None,
+    cache=None,
+    stats=None
+):
+    """
+    Returns ``(overview_prompt, file_prompts)`` for the options of `generate_proj_prompt_2`,
+    where `file_prompts` lazily yields the file blocks, or None if `proj_dir` is not a directory.
+    """
     project_path = Path(proj_dir).resolve() # Use pathlib and resolve to an absolute path
 
     if not project_path.is_dir():
-        return "Error: Provided path is not a directory or does not exist."
+        return None
 
     # --- Set defaults for exclusions ---
     if exclude_extensions is None:
@@ -118,70 +543,145 @@ def generate_proj_prompt_2(
     if exclude_files is None:
         exclude_files = [".DS_Store"]
 
-    # --- Generate directory tree ---
-    # (Assuming your tree_to_string handles exclusions or you adapt the example)
-    dir_tree_str = tree_to_string(project_path, ignore_dirs=[d for d in exclude_dirs if not d.startswith('.')]) # Pass non-hidden exclude_dirs
-    overview_prompt = OVERVIEW_PROMPT.format(proj_dir_tree=dir_tree_str)
+    # --- Walk the project once; the tree and the file list share the result ---
+    # Hidden, excluded and .gitignore'd directories are pruned during the walk.
+    with timed(stats, "walk"):
+        tree = scan_tree(project_path, ignore_dirs=exclude_dirs, gitignore=use_gitignore)
+
+    settings = overview_key = overview_prompt = None
+    close_cache = isinstance(cache, (str, os.PathLike))
+    if close_cache:
+        cache = PromptCache(cache)
+    if cache is not None:
+        settings = _cache_settings(
+            project_path, include_extensions=include_extensions, exclude_extensions=exclude_extensions,
+            exclude_dirs=exclude_dirs, exclude_files=exclude_files, max_file_size_kb=max_file_size_kb,
+            use_gitignore=use_gitignore,
+        )
+        overview_key = _overview_key(tree, settings, use_gitignore)
+        if overview_key is not None:
+            overview_prompt = cache.get(overview_key)
+            if overview_prompt is not None and stats is not None:
+                stats.count("overview_cached")
+    if overview_prompt is None:
+        dir_tree_str = tree_to_string(tree, stats=stats)
+        overview_prompt = OVERVIEW_PROMPT.format(proj_dir_tree=dir_tree_str)
+        if overview_key is not None:
+            cache.put(overview_key, overview_prompt)
 
     # --- Collect and filter file paths ---
-    file_prompts = []
-    for item in project_path.rglob("*"): # rglob searches recursively
-        if item.is_file():
-            # 1. Check against excluded directories
-            if any(excluded_dir in item.parts for excluded_dir in exclude_dirs):
-                continue
-            # 2. Check for hidden directories in the path (more robustly)
-            if any(part.startswith('.') and part not in ('.', '..') for part in item.parent.parts if part != project_path.name):
-                 # Exclude if any parent directory (other than project root itself if hidden) is hidden
-                if not (item.parent == project_path and project_path.name.startswith('.')): # Allow files in hidden project root if not otherwise excluded
-                    continue
+    with timed(stats, "select"):
+        files = _select_files(tree, include_extensions, exclude_extensions, exclude_files)
+    if stats is not None:
+        stats.count("files_selected", len(files))
 
+    # --- Read file contents, concurrently if requested, in tree order ---
+    if max_tokens is None:
+        file_prompts = _ordered_map(
+            lambda item: _read_file_prompt(item, max_file_size_kb, cache, settings, stats), files, read_workers
+        )
+    else:
+        # The budget is allocated in priority order, so these blocks are built up front.
+        token_counter = token_counter or approx_token_count
+        file_prompts = _budgeted_file_prompts(
+            files, max_file_size_kb, read_workers, max_tokens,
+            token_counter(overview_prompt) + 1, token_counter, priority or rank_files, cache, settings, stats
+        )
+    if cache is not None:
+        file_prompts = _flushed_after(file_prompts, cache, close_cache)
+    return overview_prompt, file_prompts
 
-            # 3. Check for hidden files
-            if item.name.startswith('.') and item.name not in (include_extensions or []): # Allow explicitly included hidden files
-                 if item.name not in (exclude_files or []): # Unless also in exclude_files
-                    continue
+def iter_proj_prompt(proj_dir, **kwargs):
+    """
+    Yields the prompt of `generate_proj_prompt_2` piece by piece.
 
+    The overview comes first, then one FILE_PROMPT block (or note) per file, each read only
+    when it is requested, so the prompt never has to be held in memory as a whole.
+    ``"".join(iter_proj_prompt(proj_dir, **kwargs))`` equals ``generate_proj_prompt_2(proj_dir, **kwargs)``.
 
-            # 4. Check against excluded files
-            if item.name in exclude_files:
-                continue
-            # check DEFAULT_KNOWN_TEXT_EXTENSIONS
-            if item.suffix.lower() not in DEFAULT_KNOWN_TEXT_EXTENSIONS:
-                continue
+    Args:
+        proj_dir (str): The path to the project directory.
+        **kwargs: The options of `generate_proj_prompt_2`.
 
-            # 5. Check file extensions
-            file_ext = item.suffix.lower()
-            if include_extensions and file_ext not in include_extensions:
-                continue
-            if exclude_extensions and file_ext in exclude_extensions:
-                continue
+    Yields:
+        str: Consecutive pieces of the prompt.
+    """
+    yield from _iter_prompt(_proj_prompt_parts(proj_dir, **kwargs))
 
-            # 6. Check file size
-            if item.stat().st_size > max_file_size_kb * 1024:
-                file_prompts.append(
-                    f"--- File {item.relative_to(project_path)} is too large (>{max_file_size_kb}KB), content skipped. ---\n"
-                )
-                continue
+def _iter_prompt(parts):
+    """Yields the overview and the file blocks of `parts`, separated by newlines."""
+    if parts is None:
+        yield "Error: Provided path is not a directory or does not exist."
+        return
+    overview_prompt, file_prompts = parts
+    yield overview_prompt + "\n"
+    separator = ""
+    for block in file_prompts:
+        yield separator + block
+        separator = "\n"
+
+def _write_pieces(pieces, out):
+    """Writes `pieces` to `out` one at a time; returns the number of characters written."""
+    n = 0
+    for piece in pieces:
+        out.write(piece)
+        n += len(piece)
+    return n
 
-            # 7. Read file content
-            try:
-                
-                with open(item, 'r', encoding='utf-8', errors='replace') as f:
-                    file_content = f.read()
-                file_prompts.append(
-                    FILE_PROMPT.format(
-                        file=item.relative_to(project_path), # Get relative path for cleaner output
-                        file_content=file_content
-                    )
-                )
-            except Exception as e:
-                file_prompts.append(
-                    f"--- Could not read file {item.relative_to(project_path)}: {e} ---\n"
-                )
-
-    all_file_contents_prompt = "\n".join(file_prompts)
-    return f"{overview_prompt}\n{all_file_contents_prompt}"
+def write_proj_prompt(proj_dir, out, **kwargs):
+    """
+    Streams the prompt of `generate_proj_prompt_2` to a file.
+
+    Args:
+        proj_dir (str): The path to the project directory.
+        out (str or file-like): A path, or any object with a ``write(str)`` method
+                                (e.g. an open file or ``socket.makefile('w')``).
+        **kwargs: The options of `generate_proj_prompt_2`.
+
+    Returns:
+        int: The number of characters written.
+    """
+    if isinstance(out, (str, os.PathLike)):
+        with open(out, 'w', encoding='utf-8') as f:
+            return write_proj_prompt(proj_dir, f, **kwargs)
+    return _write_pieces(iter_proj_prompt(proj_dir, **kwargs), out)
+
+def iter_proj_prompt_shards(proj_dir, max_shard_tokens, **kwargs):
+    """
+    Splits the prompt of `generate_proj_prompt_2` into several self-contained prompts.
+
+    Every shard starts with the directory overview and holds consecutive file blocks; shards
+    are only split at file boundaries and are yielded as soon as they are full, so only one
+    shard is in memory at a time. A single block larger than `max_shard_tokens` gets a shard
+    of its own (combine with `max_tokens` or `max_file_size_kb` to bound those).
+
+    Args:
+        proj_dir (str): The path to the project directory.
+        max_shard_tokens (int): Token limit of each shard, counted with `token_counter`.
+        **kwargs: The options of `generate_proj_prompt_2`.
+
+    Yields:
+        str: One prompt per shard, in the format of `generate_proj_prompt_2`.
+    """
+    parts = _proj_prompt_parts(proj_dir, **kwargs)
+    if parts is None:
+        yield "Error: Provided path is not a directory or does not exist."
+        return
+    overview_prompt, file_prompts = parts
+    token_counter = kwargs.get("token_counter") or approx_token_count
+    base = token_counter(overview_prompt) + 1
+    shard, used = [], base
+    n_shards = 0
+    for block in file_prompts:
+        cost = token_counter(block) + 1
+        if shard and used + cost > max_shard_tokens:
+            yield f"{overview_prompt}\n" + "\n".join(shard)
+            n_shards += 1
+            shard, used = [], base
+        shard.append(block)
+        used += cost
+    if shard or n_shards == 0:
+        yield f"{overview_prompt}\n" + "\n".join(shard)
 
 if __name__ == "__main__":
     proj_dir = "./"
@@ -1,2 +1,38 @@
-from .data_visual import *
-from .LLM_prompt_gen import *
\ No newline at end of file
+from .._lazy import lazy_exports
+
+_EXPORTS = {
+    "print_json_structure": ".data_visual",
+    "read_safetensors_header": ".data_visual",
+    "inspect_ckpt": ".data_visual",
+    "get_ckpt_structure": ".data_visual",
+    "print_nnmodel_state_dict": ".data_visual",
+    "summarize_model": ".data_visual",
+    "format_model_summary": ".data_visual",
+    "diff_ckpt": ".ckpt_diff",
+    "format_ckpt_diff": ".ckpt_diff",
+    "FileNode": ".dir_tree",
+    "DirNode": ".dir_tree",
+    "scan_tree": ".dir_tree",
+    "compile_gitignore_pattern": ".gitignore",
+    "GitIgnoreMatcher": ".gitignore",
+    "tree_to_string": ".data_visual",
+    "display_tree": ".data_visual",
+    "infer_json_schema": ".json_schema",
+    "print_json_schema": ".json_schema",
+    "OVERVIEW_PROMPT": ".LLM_prompt_gen",
+    "FILE_PROMPT": ".LLM_prompt_gen",
+    "SIGNATURES_PROMPT": ".LLM_prompt_gen",
+    "DEFAULT_KNOWN_TEXT_EXTENSIONS": ".LLM_prompt_gen",
+    "generate_proj_prompt": ".LLM_prompt_gen",
+    "generate_proj_prompt_2": ".LLM_prompt_gen",
+    "iter_proj_prompt": ".LLM_prompt_gen",
+    "write_proj_prompt": ".LLM_prompt_gen",
+    "iter_proj_prompt_shards": ".LLM_prompt_gen",
+    "approx_token_count": ".LLM_prompt_gen",
+    "tiktoken_counter": ".LLM_prompt_gen",
+    "rank_files": ".LLM_prompt_gen",
+    "ENTRY_POINT_NAMES": ".LLM_prompt_gen",
+    "PromptCache": ".prompt_cache",
+}
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,324 @@
+import argparse
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Absolute imports, so that the file still runs as a script.
+from AEsir_utils.data_utils.data_visual import SAFETENSORS_DTYPES, _format_bytes, _load_torch_mmap, inspect_ckpt, read_safetensors_header
+
+__all__ = ["diff_ckpt", "format_ckpt_diff"]
+
+# safetensors dtype codes numpy reads natively. BF16 and F8_* are converted by hand / via torch.
+_NUMPY_DTYPES = {
+    "F64": "<f8", "F32": "<f4", "F16": "<f2",
+    "I64": "<i8", "I32": "<i4", "I16": "<i2", "I8": "i1",
+    "U64": "<u8", "U32": "<u4", "U16": "<u2", "U8": "u1",
+    "BOOL": "?",
+}
+
+
+def _flat_tensors(obj, prefix=""):
+    """Yields ``(key, tensor)`` for every tensor-like value of a (nested) dict, keyed like `inspect_ckpt`."""
+    for k, v in obj.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            yield from _flat_tensors(v, key + ".")
+        elif hasattr(v, "shape") and hasattr(v, "dtype"):
+            yield key, v
+
+
+def _safetensors_chunks(raw, code, chunk_elems):
+    if code == "BF16":
+        itemsize = 2
+    elif code.startswith("F8"):
+        itemsize = 1
+    else:
+        dtype = np.dtype(_NUMPY_DTYPES[code])
+        itemsize = dtype.itemsize
+    n = raw.size // itemsize
+    for i in range(0, n, chunk_elems):
+        part = raw[i * itemsize:min(n, i + chunk_elems) * itemsize]
+        if code == "BF16":
+            # bfloat16 is the upper half of a float32.
+            yield (part.view("<u2").astype(np.uint32) << 16).view(np.float32).astype(np.float64)
+        elif code.startswith("F8"):
+            import torch
+            fp8 = getattr(torch, SAFETENSORS_DTYPES[code][len("torch."):])
+            yield torch.from_numpy(np.array(part)).view(fp8).to(torch.float64).numpy()
+        else:
+            yield part.view(dtype).astype(np.float64)
+
+
+def _tensor_chunks(tensor, chunk_elems):
+    if type(tensor).__module__.startswith("torch"):
+        import torch
+        flat = tensor.detach().reshape(-1)
+        for i in range(0, flat.numel(), chunk_elems):
+            yield flat[i:i + chunk_elems].to(device="cpu", dtype=torch.float64).numpy()
+    else:
+        flat = np.asarray(tensor).reshape(-1)
+        for i in range(0, flat.size, chunk_elems):
+            yield flat[i:i + chunk_elems].astype(np.float64)
+
+
+class _TensorReader:
+    """Reads the tensors of one checkpoint as flat float64 chunks, one tensor at a time.
+
+    Files are opened on first use and kept memory-mapped: '.safetensors' data through
+    ``np.memmap``, torch files through ``torch.load(..., mmap=True)``.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self._files = {}
+
+    def _open(self, file):
+        opened = self._files.get(file)
+        if opened is None:
+            if isinstance(self.data, dict):
+                opened = dict(_flat_tensors(self.data))
+            else:
+                path = self.data if file is None else os.path.join(os.path.dirname(self.data), file)
+                if path.endswith('.safetensors'):
+                    header, data_start = read_safetensors_header(path)
+                    opened = (header, data_start, np.memmap(path, dtype=np.uint8, mode='r'))
+                else:
+                    opened = dict(_flat_tensors(_load_torch_mmap(path)))
+            self._files[file] = opened
+        return opened
+
+    def chunks(self, key, file, chunk_elems):
+        opened = self._open(file)
+        if isinstance(opened, tuple):
+            header, data_start, mm = opened
+            begin, end = header[key]["data_offsets"]
+            return _safetensors_chunks(mm[data_start + begin:data_start + end], header[key]["dtype"], chunk_elems)
+        return _tensor_chunks(opened[key], chunk_elems)
+
+
+def _tensor_stats(base_chunks, other_chunks):
+    """Streams both tensors chunk by chunk, merging per-chunk moments of ``other - base``
+    (Chan et al.), so memory stays at a few chunks whatever the tensor size."""
+    n = 0
+    mean = m2 = sq_delta = sq_base = sq_other = max_abs = 0.0
+    n_changed = n_nonfinite = 0
+    for a, b in zip(base_chunks, other_chunks):
+        d = b - a
+        finite = np.isfinite(d)
+        if not finite.all():
+            n_nonfinite += d.size - int(finite.sum())
+            a, b, d = a[finite], b[finite], d[finite]
+        k = d.size
+        if k == 0:
+            continue
+        chunk_mean = float(d.mean())
+        centered = d - chunk_mean
+        delta = chunk_mean - mean
+        total = n + k
+        mean += delta * k / total
+        m2 += float(np.dot(centered, centered)) + delta * delta * n * k / total
+        n = total
+        sq_delta += float(np.dot(d, d))
+        sq_base += float(np.dot(a, a))
+        sq_other += float(np.dot(b, b))
+        max_abs = max(max_abs, float(np.abs(d).max()))
+        n_changed += int(np.count_nonzero(d))
+    l2_base = math.sqrt(sq_base)
+    l2_delta = math.sqrt(sq_delta)
+    return {
+        "l2_base": l2_base,
+        "l2_other": math.sqrt(sq_other),
+        "l2_delta": l2_delta,
+        "rel_l2_delta": l2_delta / l2_base if l2_base > 0 else None,
+        "mean_delta": mean,
+        "std_delta": math.sqrt(m2 / n) if n else 0.0,
+        "max_abs_delta": max_abs,
+        "n_changed": n_changed,
+        "n_nonfinite": n_nonfinite,
+    }
+
+
+def _diff_tensors(task):
+    """Worker entry point: statistics of a list of ``(key, base_file, other_file)`` tensors."""
+    base, other, items, chunk_elems = task
+    base_reader, other_reader = _TensorReader(base), _TensorReader(other)
+    return {
+        key: _tensor_stats(
+            base_reader.chunks(key, base_file, chunk_elems),
+            other_reader.chunks(key, other_file, chunk_elems),
+        )
+        for key, base_file, other_file in items
+    }
+
+
+def _split_tasks(items, base_info, num_workers):
+    """Groups tensors by shard pair, so each worker maps as few files as possible. A single
+    group (unsharded checkpoints) is split into contiguous runs of similar byte size."""
+    groups = {}
+    for item in items:
+        groups.setdefault(item[1:], []).append(item)
+    groups = list(groups.values())
+    if len(groups) >= num_workers:
+        return groups
+    tasks = []
+    for group in groups:
+        n_parts = max(1, 2 * num_workers // len(groups))
+        budget = sum(base_info[key]["nbytes"] for key, _, _ in group) / n_parts
+        part, size = [], 0
+        for item in group:
+            part.append(item)
+            size += base_info[item[0]]["nbytes"]
+            if size >= budget:
+                tasks.append(part)
+                part, size = [], 0
+        if part:
+            tasks.append(part)
+    return tasks
+
+
+def diff_ckpt(base, other, stats=True, chunk_elems=1 << 20, num_workers=1):
+    """
+    Compares two checkpoints, e.g. a fine-tuned model against its base, without loading either.
+
+    Structures are compared with `inspect_ckpt`. Then every tensor present in both with
+    the same shape is streamed from the memory-mapped files in chunks of `chunk_elems`
+    elements, converted to float64, so memory stays at a few chunks per worker whatever
+    the checkpoint sizes.
+
+    Args:
+        base (str or dict): The reference checkpoint: a '.safetensors', '*.index.json' or
+                            torch.load compatible file, or a loaded (nested) dict of tensors.
+        other (str or dict): The checkpoint compared to `base`, in any of the same forms.
+        stats (bool, optional): Compute per-tensor statistics. False only compares the
+                                structures, reading no tensor data. Defaults to True.
+        chunk_elems (int, optional): Elements read per chunk. Defaults to 2**20.
+        num_workers (int, optional): Processes computing the statistics, each handling whole
+                                     shards (or runs of tensors of an unsharded file). Only
+                                     used when both checkpoints are paths. Defaults to 1.
+
+    Returns:
+        dict: A JSON-serializable report. ``missing`` and ``extra`` list the keys only in
+              `base` or only in `other`. ``shape_changed`` and ``dtype_changed`` map keys to
+              ``{"base": ..., "other": ...}``. ``tensors`` maps every compared key to its
+              ``l2_base``, ``l2_other``, ``l2_delta``, ``rel_l2_delta`` (None if the base is
+              zero), ``mean_delta``, ``std_delta``, ``max_abs_delta``, ``n_changed`` (elements
+              that differ) and ``n_nonfinite`` (elements left out of the statistics because
+              either side is inf or nan). ``summary`` holds the totals.
+    """
+    if isinstance(base, os.PathLike):
+        base = os.fspath(base)
+    if isinstance(other, os.PathLike):
+        other = os.fspath(other)
+    base_info = inspect_ckpt(base)["tensors"]
+    other_info = inspect_ckpt(other)["tensors"]
+    report = {
+        "base": base if isinstance(base, str) else None,
+        "other": other if isinstance(other, str) else None,
+        "missing": [k for k in base_info if k not in other_info],
+        "extra": [k for k in other_info if k not in base_info],
+        "shape_changed": {}, "dtype_changed": {}, "tensors": {},
+    }
+    items = []
+    for k, b in base_info.items():
+        o = other_info.get(k)
+        if o is None:
+            continue
+        if b["dtype"] != o["dtype"]:
+            report["dtype_changed"][k] = {"base": b["dtype"], "other": o["dtype"]}
+        if b["shape"] != o["shape"]:
+            report["shape_changed"][k] = {"base": b["shape"], "other": o["shape"]}
+        else:
+            items.append((k, b.get("file"), o.get("file")))
+
+    if stats and items:
+        if num_workers > 1 and isinstance(base, str) and isinstance(other, str):
+            tasks = [(base, other, part, chunk_elems) for part in _split_tasks(items, base_info, num_workers)]
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                results = {}
+                for part in executor.map(_diff_tensors, tasks):
+                    results.update(part)
+        else:
+            results = _diff_tensors((base, other, items, chunk_elems))
+        report["tensors"] = {k: results[k] for k, _, _ in items}
+
+    tensors = report["tensors"].values()
+    report["summary"] = {
+        "n_base": len(base_info), "n_other": len(other_info), "n_compared": len(items),
+        "n_missing": len(report["missing"]), "n_extra": len(report["extra"]),
+        "n_shape_changed": len(report["shape_changed"]), "n_dtype_changed": len(report["dtype_changed"]),
+        "n_changed": sum(1 for t in tensors if t["n_changed"]),
+        "bytes_compared": sum(base_info[k]["nbytes"] for k, _, _ in items) if stats else 0,
+        "l2_delta": math.sqrt(sum(t["l2_delta"] ** 2 for t in tensors)),
+        "max_abs_delta": max((t["max_abs_delta"] for t in tensors), default=0.0),
+    }
+    return report
+
+
+def format_ckpt_diff(report, top=20):
+    """
+    Renders a `diff_ckpt` report in the style of `get_ckpt_structure`.
+
+    Args:
+        report (dict): The result of `diff_ckpt`.
+        top (int, optional): Number of changed tensors to list, largest relative L2
+                             change first. None lists them all. Defaults to 20.
+
+    Returns:
+        str: The structural differences, the most changed tensors and the summary.
+    """
+    lines = []
+    for k in report["missing"]:
+        lines.append(f"\033[31m- {k}\033[0m")
+    for k in report["extra"]:
+        lines.append(f"\033[32m+ {k}\033[0m")
+    for k, v in report["shape_changed"].items():
+        lines.append(f"\033[33m~ {k}\033[0m: shape {v['base']} -> {v['other']}")
+    for k, v in report["dtype_changed"].items():
+        lines.append(f"\033[33m~ {k}\033[0m: dtype {v['base']} -> {v['other']}")
+
+    changed = [(k, t) for k, t in report["tensors"].items() if t["n_changed"] or t["n_nonfinite"]]
+    changed.sort(key=lambda kt: (kt[1]["rel_l2_delta"] is None, -(kt[1]["rel_l2_delta"] or kt[1]["l2_delta"])))
+    for k, t in changed[:top]:
+        rel = "n/a" if t["rel_l2_delta"] is None else f"{t['rel_l2_delta']:.3e}"
+        line = (
+            f"\033[33m{k}\033[0m: rel_l2 {rel}   l2 {t['l2_delta']:.3e}   "
+            f"mean {t['mean_delta']:.3e}   std {t['std_delta']:.3e}   max_abs {t['max_abs_delta']:.3e}"
+        )
+        if t["n_nonfinite"]:
+            line += f"   \033[31mnon-finite: {t['n_nonfinite']:,}\033[0m"
+        lines.append(line)
+    if top is not None and len(changed) > top:
+        lines.append(f"    ... {len(changed) - top} more changed tensors")
+
+    s = report["summary"]
+    lines.append(
+        f"\033[32mcompared:\033[0m {s['n_compared']} tensors ({_format_bytes(s['bytes_compared'])})   "
+        f"\033[32mchanged:\033[0m {s['n_changed']}   \033[32mmissing:\033[0m {s['n_missing']}   "
+        f"\033[32mextra:\033[0m {s['n_extra']}   \033[32mshape/dtype changed:\033[0m "
+        f"{s['n_shape_changed']}/{s['n_dtype_changed']}"
+    )
+    lines.append(f"\033[32mtotal l2 delta:\033[0m {s['l2_delta']:.3e}   \033[32mmax abs delta:\033[0m {s['max_abs_delta']:.3e}")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('base', type=str)
+    parser.add_argument('other', type=str)
+    parser.add_argument('--json', type=str, default=None, help='write the report to this file')
+    parser.add_argument('--num_workers', type=int, default=1)
+    parser.add_argument('--chunk_elems', type=int, default=1 << 20)
+    parser.add_argument('--no_stats', action='store_true', help='only compare keys, shapes and dtypes')
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+    report = diff_ckpt(
+        args.base, args.other, stats=not args.no_stats,
+        chunk_elems=args.chunk_elems, num_workers=args.num_workers
+    )
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(format_ckpt_diff(report, top=args.top), end="")
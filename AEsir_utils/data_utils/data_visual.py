@@ -1,13 +1,22 @@
-import torch
-import numpy as np
-from typing import Union, List, Tuple
 import json
 import os
+import sys
 # from safetensors.torch import load_file
+# Absolute imports, so that the file still runs as a script.
+from AEsir_utils.run_stats import timed
+from AEsir_utils.data_utils.dir_tree import DirNode, scan_tree
 
+__all__ = [
+    "print_json_structure", "read_safetensors_header", "inspect_ckpt",
+    "get_ckpt_structure", "summarize_model", "format_model_summary", "print_nnmodel_state_dict",
+    "tree_to_string", "display_tree",
+]
 
+# numpy and torch are only imported when a function needs them, so that the
+# directory tree tools stay cheap to import.
 
-def print_json_structure(data, indent='', level=0):
+
+def print_json_structure(data, indent='', level=0, stream=False, sample=None, sampling="first"):
     """
     Recursively prints the structure of a JSON-like data object.
 
@@ -15,15 +24,30 @@ def print_json_structure(data, indent='', level=0):
     and an example element for lists, and the shape for numpy arrays and torch tensors.
     Other data types are printed with their type name and value.
 
+    '.jsonl' files, and '.json' files when `stream` or `sample` is set, are instead
+    parsed incrementally with `infer_json_schema` and printed as a schema merged
+    across all list elements / lines, with key frequencies, type unions and lengths.
+
     Args:
         data: The data object to be analyzed. Can be a dictionary, list, numpy array,
-              torch tensor, string(json file), or other data type.
+              torch tensor, string(json or jsonl file), or other data type.
         indent (str): The indentation string used for formatting the output.
         level (int): The current level of recursion, used for formatting the output.
+        stream (bool): Stream a '.json' file in constant memory instead of loading it.
+        sample (int, optional): Only merge N records per list, see `infer_json_schema`.
+        sampling (str): "first" or "reservoir" sampling of the `sample` records.
     """
-    if isinstance(data, str):
-        assert data.endswith('.json'), "Only support json file"
-        data = json.load(open(data))
+    if isinstance(data, str) and level == 0: # Nested strings are values, not paths
+        assert data.endswith(('.json', '.jsonl')), "Only support json or jsonl file"
+        if stream or sample is not None or data.endswith('.jsonl'):
+            from .json_schema import infer_json_schema, print_json_schema
+            print_json_schema(infer_json_schema(data, sample=sample, sampling=sampling), indent)
+            return
+        with open(data) as f:
+            data = json.load(f)
+    # An array or tensor can only be passed in if its library is already loaded.
+    np = sys.modules.get("numpy")
+    torch = sys.modules.get("torch")
     
     if isinstance(data, dict):
         for key, value in data.items():
@@ -38,11 +62,11 @@ def print_json_structure(data, indent='', level=0):
             print_json_structure(data[-1], indent, level + 1)
     
     # 处理 NumPy 数组
-    elif isinstance(data, np.ndarray):
+    elif np is not None and isinstance(data, np.ndarray):
         print(f"{indent}\033[32mnp.ndarray with shape\033[0m {data.shape}")
     
     # 处理 PyTorch 张量
-    elif isinstance(data, torch.Tensor):
+    elif torch is not None and isinstance(data, torch.Tensor):
         print(f"{indent}\033[32mtorch.Tensor with shape\033[0m {data.shape}")
     
     # 处理其他类型
@@ -50,138 +74,436 @@ def print_json_structure(data, indent='', level=0):
         print(f"\033[32m{indent}({type(data).__name__})\033[0m{data}")
 
 
-def get_ckpt_structure(data):
+# safetensors dtype codes, spelled like ``str(torch_tensor.dtype)``.
+SAFETENSORS_DTYPES = {
+    "F64": "torch.float64", "F32": "torch.float32", "F16": "torch.float16",
+    "BF16": "torch.bfloat16", "F8_E4M3": "torch.float8_e4m3fn", "F8_E5M2": "torch.float8_e5m2",
+    "I64": "torch.int64", "I32": "torch.int32", "I16": "torch.int16", "I8": "torch.int8",
+    "U64": "torch.uint64", "U32": "torch.uint32", "U16": "torch.uint16", "U8": "torch.uint8",
+    "BOOL": "torch.bool",
+}
+
+
+def read_safetensors_header(file):
     """
-    Loads a checkpoint file and returns a string representation of its structure. 
+    Reads the JSON header of a '.safetensors' file without touching the tensor data.
 
     Args:
-        file (str): Path to the checkpoint file. The file can be a '.safetensors' 
-                    file or any other format compatible with torch.load.
+        file (str): Path to the '.safetensors' file.
 
     Returns:
-        str: A string containing the keys, shapes, and data types of the tensors
-             in the checkpoint.
+        tuple: ``(header, data_start)``. ``header`` maps each tensor name to its
+               ``dtype`` code, ``shape`` and ``data_offsets`` (relative to
+               ``data_start``, the byte offset of the data section in the file).
+    """
+    with open(file, 'rb') as f:
+        header_size = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(header_size))
+    header.pop("__metadata__", None)
+    return header, 8 + header_size
+
+
+def _safetensors_entries(file):
+    header, _ = read_safetensors_header(file)
+    for k, v in header.items():
+        begin, end = v["data_offsets"]
+        yield k, {
+            "shape": list(v["shape"]),
+            "dtype": SAFETENSORS_DTYPES.get(v["dtype"], v["dtype"]),
+            "nbytes": end - begin,
+        }
+
+
+def _tensor_entries(obj, prefix=""):
+    """Yields ``(key, entry)`` for every tensor-like value of a (nested) dict."""
+    for k, v in obj.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            yield from _tensor_entries(v, key + ".")
+        elif hasattr(v, "shape") and hasattr(v, "dtype"):
+            yield key, {
+                "shape": list(v.shape),
+                "dtype": str(v.dtype),
+                "nbytes": int(v.nbytes) if hasattr(v, "nbytes") else v.numel() * v.element_size(),
+            }
+
+
+def _load_torch_mmap(file):
+    """torch.load without reading tensor data up front, where the torch version
+    and checkpoint format allow memory mapping."""
+    import torch
+    try:
+        return torch.load(file, map_location="cpu", mmap=True)
+    except (TypeError, RuntimeError):
+        # torch < 2.1 has no ``mmap`` argument; legacy (non-zip) files can't be mapped.
+        return torch.load(file, map_location="cpu")
+
+
+def _ckpt_file_entries(file):
+    if file.endswith('.safetensors'):
+        yield from _safetensors_entries(file)
+    else:
+        ckpt = _load_torch_mmap(file)
+        yield from _tensor_entries(ckpt)
+        del ckpt
+
+
+def _ckpt_index_entries(file):
+    """Entries of a sharded checkpoint, following its '*.index.json' weight map."""
+    with open(file) as f:
+        weight_map = json.load(f)["weight_map"]
+    shard_dir = os.path.dirname(file)
+    shards = {}
+    for shard in dict.fromkeys(weight_map.values()):
+        for k, entry in _ckpt_file_entries(os.path.join(shard_dir, shard)):
+            entry["file"] = shard
+            shards[k] = entry
+    for k, shard in weight_map.items():
+        if k in shards:
+            yield k, shards[k]
+
+
+def inspect_ckpt(data):
+    """
+    Collects the structure of a checkpoint without materializing its tensors.
+
+    '.safetensors' files are described from their JSON header alone, other files
+    are opened with ``torch.load(..., mmap=True)`` and '*.index.json' files are
+    followed to every shard they reference.
+
+    Args:
+        data (str or dict): Path to a '.safetensors', '*.index.json' or torch.load
+                            compatible file, or an already loaded (nested) dict of tensors.
+
+    Returns:
+        dict: ``tensors`` maps each key to its ``shape`` (list), ``dtype`` (str),
+              ``nbytes`` and, for sharded checkpoints, ``file``. ``total_params``,
+              ``total_bytes``, ``params_per_dtype`` and ``bytes_per_dtype`` summarize them.
     """
+    if isinstance(data, os.PathLike):
+        data = os.fspath(data)
     if isinstance(data, str):
-        if data.endswith('.safetensors'):
-            from safetensors.torch import load_file
-            ckpt = load_file(data)
+        if data.endswith('.index.json'):
+            entries = _ckpt_index_entries(data)
         else:
-            ckpt = torch.load(data)
+            entries = _ckpt_file_entries(data)
     elif isinstance(data, dict):
-        ckpt = data
+        entries = _tensor_entries(data)
     else:
-        raise ValueError(f"Unsupported data type: {type(data)}")        
-        
-    # if save_path is None:
-    #     for k,v in ckpt.items():
-    #         print(k,":   ",v.shape, "   ",v.dtype)
-    # else:
-    #     with open(save_path,'w') as f:
-    #         for k,v in ckpt.items():
-    #             f.write(k + ": " + str(v.shape) + "   " + str(v.dtype) + '\n')
-    op_txt = ""
-    for k,v in ckpt.items():
-        op_txt += f"\033[33m{k}\033[0m" + ": " + str(v.shape) + "   " + str(v.dtype) + '\n'
+        raise ValueError(f"Unsupported data type: {type(data)}")
+
+    info = {
+        "tensors": {}, "total_params": 0, "total_bytes": 0,
+        "params_per_dtype": {}, "bytes_per_dtype": {},
+    }
+    for k, entry in entries:
+        numel = 1
+        for dim in entry["shape"]:
+            numel *= dim
+        dtype = entry["dtype"]
+        info["tensors"][k] = entry
+        info["total_params"] += numel
+        info["total_bytes"] += entry["nbytes"]
+        info["params_per_dtype"][dtype] = info["params_per_dtype"].get(dtype, 0) + numel
+        info["bytes_per_dtype"][dtype] = info["bytes_per_dtype"].get(dtype, 0) + entry["nbytes"]
+    return info
+
+
+def _format_shape(shape, dtype):
+    if dtype.startswith("torch."):
+        return f"torch.Size({list(shape)})"
+    return str(tuple(shape))
+
+
+def _format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.1f}{unit}" if unit != "B" else f"{n}B"
+        n /= 1024
+    return f"{n:.1f}TB"
+
+
+def get_ckpt_structure(data, return_info=False, stats=None):
+    """
+    Returns a string representation of the structure of a checkpoint.
+
+    The checkpoint is inspected with `inspect_ckpt`, so tensor data is never
+    loaded for '.safetensors' files and is memory-mapped for torch files.
+
+    Args:
+        data (str or dict): Path to the checkpoint file. The file can be a '.safetensors'
+                            file, a sharded checkpoint's '*.index.json' or any other format
+                            compatible with torch.load. A loaded dict of tensors also works.
+        return_info (bool, optional): Also return the structured result of `inspect_ckpt`.
+        stats (RunStats, optional): Collects the ``read`` (header / mmap load) and ``format``
+                                    phase times and the ``tensors`` and ``tensor_bytes`` counts.
+
+    Returns:
+        str: A string containing the keys, shapes, and data types of the tensors
+             in the checkpoint, followed by the parameter count and bytes per dtype.
+             ``(str, dict)`` if `return_info` is True.
+    """
+    with timed(stats, "read"):
+        info = inspect_ckpt(data)
+    if stats is not None:
+        stats.count("tensors", len(info["tensors"]))
+        stats.count("tensor_bytes", info["total_bytes"])
+    with timed(stats, "format"):
+        op_txt = _format_ckpt_info(info)
+    if return_info:
+        return op_txt, info
     return op_txt
 
-def print_nnmodel_state_dict(model):
-    print_json_structure(model.state_dict())
-    
-def tree_to_string(directory, prefix="", level=-1, show_hidden=False, current_level=1, ignore_dirs=[]):
+
+def _format_ckpt_info(info):
+    lines = []
+    for k, v in info["tensors"].items():
+        lines.append(f"\033[33m{k}\033[0m" + ": " + _format_shape(v["shape"], v["dtype"]) + "   " + v["dtype"])
+    lines.append(
+        f"\033[32mtotal params:\033[0m {info['total_params']:,}   "
+        f"\033[32mtotal size:\033[0m {_format_bytes(info['total_bytes'])}"
+    )
+    for dtype, n in info["bytes_per_dtype"].items():
+        lines.append(f"    {dtype}: {info['params_per_dtype'][dtype]:,} params, {_format_bytes(n)}")
+    return "\n".join(lines) + "\n"
+
+def _new_module_node(name, module_type):
+    return {
+        "name": name, "type": module_type, "params": 0, "trainable": 0, "buffers": 0,
+        "bytes": 0, "tensors": 0, "dtypes": {}, "children": {},
+    }
+
+
+def summarize_model(model, depth=None, include_buffers=True):
+    """
+    Aggregates the parameters and buffers of a model per module, without touching their data.
+
+    Every tensor is visited once through ``named_parameters`` / ``named_buffers`` and added
+    to the totals of each enclosing module, so models built on the meta device (e.g. under
+    ``with torch.device("meta"):``) are summarized without allocating any weight. Shared
+    (tied) parameters are counted once, under the first module that registers them.
+
+    Args:
+        model (torch.nn.Module): The model.
+        depth (int, optional): Deepest module level kept as its own node. Deeper modules are
+                               folded into their ancestor at this depth. None keeps them all.
+        include_buffers (bool, optional): Also count buffers (e.g. BatchNorm running stats).
+                                          Defaults to True.
+
+    Returns:
+        dict: The root module node. Each node holds its ``name``, module ``type``, the
+              aggregated ``params``, ``trainable`` params, ``buffers`` elements, ``bytes``,
+              ``tensors`` count and ``dtypes`` (dtype -> elements), and its ``children``
+              nodes keyed by attribute name, in registration order.
+    """
+    module_types = {name: type(m).__name__ for name, m in model.named_modules()}
+    root = _new_module_node("", module_types.get("", type(model).__name__))
+
+    def add(key, tensor, is_param):
+        numel = tensor.numel()
+        nbytes = numel * tensor.element_size()
+        dtype = str(tensor.dtype)
+        trainable = numel if is_param and tensor.requires_grad else 0
+        path = key.split(".")[:-1]
+        if depth is not None:
+            path = path[:depth]
+        node = root
+        prefix = ""
+        for i in range(len(path) + 1):
+            node["params" if is_param else "buffers"] += numel
+            node["trainable"] += trainable
+            node["bytes"] += nbytes
+            node["tensors"] += 1
+            node["dtypes"][dtype] = node["dtypes"].get(dtype, 0) + numel
+            if i == len(path):
+                break
+            prefix = f"{prefix}.{path[i]}" if prefix else path[i]
+            child = node["children"].get(path[i])
+            if child is None:
+                child = node["children"][path[i]] = _new_module_node(path[i], module_types.get(prefix, ""))
+            node = child
+
+    for key, p in model.named_parameters():
+        add(key, p, True)
+    if include_buffers:
+        for key, b in model.named_buffers():
+            add(key, b, False)
+    return root
+
+
+def _format_count(n):
+    for unit in ("", "K", "M", "B"):
+        if abs(n) < 1000:
+            return f"{n}" if unit == "" else f"{n:.1f}{unit}"
+        n /= 1000
+    return f"{n:.1f}T"
+
+
+def _module_signature(node):
+    """What two repeated blocks (e.g. ``layers.0`` and ``layers.1``) must share to be merged."""
+    return (node["type"], node["params"], node["trainable"], node["buffers"], node["bytes"],
+            tuple(node["dtypes"].items()))
+
+
+def _render_module(node, label, prefix, connector, depth, collapse_repeats, output_lines):
+    line = (
+        f"{prefix}{connector}\033[33m{label}\033[0m ({node['type']}): "
+        f"{_format_count(node['params'])} params"
+    )
+    if node["trainable"] != node["params"]:
+        line += f" ({_format_count(node['trainable'])} trainable)"
+    if node["buffers"]:
+        line += f", {_format_count(node['buffers'])} buffer elems"
+    line += f", {_format_bytes(node['bytes'])}   " + " ".join(node["dtypes"])
+    output_lines.append(line)
+    if depth == 0:
+        return
+
+    # 连续的、结构相同的数字编号子模块（如 layers.0 ... layers.31）合并成一行
+    groups = []
+    for name, child in node["children"].items():
+        last = groups[-1] if groups else None
+        if (collapse_repeats and last is not None and name.isdigit() and last[0][0].isdigit()
+                and int(name) == int(last[-1][0]) + 1
+                and _module_signature(child) == _module_signature(last[0][1])):
+            last.append((name, child))
+        else:
+            groups.append([(name, child)])
+
+    if connector:
+        prefix += "    " if connector == "└── " else "│   "
+    for i, group in enumerate(groups):
+        connector = "└── " if i == len(groups) - 1 else "├── "
+        name, child = group[0]
+        if len(group) > 1:
+            label = f"{name}..{group[-1][0]} (x{len(group)}, each)"
+        else:
+            label = name
+        _render_module(child, label, prefix, connector, None if depth is None else depth - 1,
+                       collapse_repeats, output_lines)
+
+
+def format_model_summary(summary, depth=None, collapse_repeats=True):
+    """
+    Renders a `summarize_model` tree, one line per module.
+
+    Args:
+        summary (dict): The result of `summarize_model`.
+        depth (int, optional): Number of module levels shown below the root. None shows all.
+        collapse_repeats (bool, optional): Merge runs of consecutive numbered siblings with
+                                           identical totals, e.g. the blocks of a transformer,
+                                           into one line. Defaults to True.
+
+    Returns:
+        str: The rendered tree.
     """
-    递归地可视化文件目录结构，并返回其字符串表示形式。
+    output_lines = []
+    _render_module(summary, summary["name"] or "model", "", "", depth, collapse_repeats, output_lines)
+    return "\n".join(output_lines) + "\n"
+
+
+def print_nnmodel_state_dict(model, depth=None, include_buffers=True):
+    """
+    Prints a per-module summary of a model, see `summarize_model` and `format_model_summary`.
+
+    Args:
+        model (torch.nn.Module): The model, possibly on the meta device.
+        depth (int, optional): Number of module levels shown. None shows all.
+        include_buffers (bool, optional): Also count buffers. Defaults to True.
+    """
+    print(format_model_summary(summarize_model(model, depth=depth, include_buffers=include_buffers)), end="")
+
+
+def tree_to_string(directory, prefix="", level=-1, show_hidden=False, current_level=1, ignore_dirs=[], stats=None):
+    """
+    可视化文件目录结构，并返回其字符串表示形式。
+
+    目录只通过 `scan_tree` 遍历一次（每个目录只 listdir 一次）；也可以直接传入
+    已经构建好的 `DirNode`，与文件过滤、内容收集共用同一次遍历的结果。
 
     参数:
-        directory (str): 要可视化的目录路径。
+        directory (str or DirNode): 要可视化的目录路径，或 `scan_tree` 返回的目录树。
         prefix (str): 用于构建树形结构的前缀字符串。
         level (int): 可视化的最大深度。-1 表示没有限制。
         show_hidden (bool): 是否显示隐藏文件和目录。
-        current_level (int): 当前的递归深度。
+        current_level (int): 起始深度（与 `level` 一起决定还要展开几层）。
         ignore_dirs (list): 一个列表，包含要忽略的目录名(例如 ".git")。
+                            传入 `DirNode` 时忽略该参数（遍历时已经过滤）。
+        stats (RunStats, optional): 记录 ``walk``（遍历）和 ``format``（渲染）两个阶段的耗时、
+                                    ``dirs`` / ``files`` 数量，以及无法列出的目录（失败原因）。
 
     返回:
         str: 目录结构的字符串表示，如果出错则返回错误信息字符串。
     """
-    if not os.path.isdir(directory):
-        return f"错误: '{directory}' 不是一个有效的目录。"
+    depth = -1 if level == -1 else level - current_level + 1 # 还需要展开的层数
+    if isinstance(directory, DirNode):
+        tree = directory
+    else:
+        if not os.path.isdir(directory):
+            return f"错误: '{directory}' 不是一个有效的目录。"
+        if depth == -1 or depth > 0:
+            with timed(stats, "walk"):
+                tree = scan_tree(directory, ignore_dirs=ignore_dirs, show_hidden=show_hidden, max_depth=depth)
+        else:
+            return "" # 如果超过级别限制，返回空字符串，避免添加不必要的内容
+
+    if tree.error == "permission":
+        # 顶层目录权限不足
+        if current_level == 0:
+            return f"错误: 权限不足，无法访问 '{tree.path}'。"
+        return f"{prefix}├── [权限不足: {tree.name}]\n"
+    if tree.error == "missing":
+        return f"错误: 目录 '{tree.path}' 未找到。"
 
     output_lines = []
+    with timed(stats, "format"):
+        _render_tree(tree, prefix, show_hidden, depth, output_lines)
+    if stats is not None:
+        _count_tree(tree, stats)
+    return "\n".join(output_lines)
 
-    if level != -1 and current_level > level:
-        return "" # 如果超过级别限制，返回空字符串，避免添加不必要的内容
 
-    files = []
-    dirs = []
-    base_name = os.path.basename(directory) # 获取当前目录的名称
+def _count_tree(tree, stats):
+    """把目录树的目录数、文件数以及无法列出的目录记录到 `stats`。"""
+    n_dirs = n_files = 0
+    for d in tree.iter_dirs():
+        n_dirs += 1
+        n_files += len(d.files)
+        if d.error is not None:
+            stats.fail(d.path, "permission denied" if d.error == "permission" else "not found")
+    stats.count("dirs", n_dirs)
+    stats.count("files", n_files)
 
-    try:
-        entries = os.listdir(directory)
-        if not show_hidden:
-            entries = [entry for entry in entries if not entry.startswith('.')]
-        entries.sort() # 对条目进行排序以便一致地显示
-    except PermissionError:
-        # 如果是顶层目录权限不足，则在主调用中处理。
-        # 如果是子目录权限不足，则在此处添加一行。
-        if current_level == 0: # 检查是否是初始调用
-             return f"错误: 权限不足，无法访问 '{directory}'。"
-        else:
-            return f"{prefix}├── [权限不足: {base_name}]\n"
-    except FileNotFoundError:
-        return f"错误: 目录 '{directory}' 未找到。"
-
-    # 将当前目录（如果是初始调用且非"."）添加到输出中
-    # 这个逻辑稍微复杂，因为我们不想重复打印初始目录名，除非它是递归的一部分
-    # 对于原始的tree命令，它会打印 "." 或给定的目录名作为根
-
-    # 将条目分类为目录和文件
-    for entry in entries:
-        path = os.path.join(directory, entry)
-        if os.path.isdir(path):
-            if entry in ignore_dirs:
-                continue
-            dirs.append(entry)
-        else:
-            files.append(entry)
+
+def _render_tree(node, prefix, show_hidden, depth, output_lines):
+    """把 `node` 的子目录（在前）和文件（在后）按树形格式追加到 `output_lines`。"""
+    if show_hidden:
+        dirs, files = node.dirs, node.files
+    else:
+        dirs = [d for d in node.dirs if not d.name.startswith('.')]
+        files = [f for f in node.files if not f.name.startswith('.')]
 
     # 处理目录
-    for i, dir_name in enumerate(dirs):
+    for i, child in enumerate(dirs):
         is_last_entry_in_current_level = (i == len(dirs) - 1) and (len(files) == 0)
         connector = "└── " if is_last_entry_in_current_level else "├── "
-        output_lines.append(f"{prefix}{connector}{dir_name}")
+        output_lines.append(f"{prefix}{connector}{child.name}")
 
         new_prefix = prefix + ("    " if is_last_entry_in_current_level else "│   ")
-        # 递归调用，并将其结果添加到输出行
-        # 确保递归调用返回的是字符串，然后按行分割并添加到列表中
-        # 或者，如果递归函数也返回列表，则直接 extend
-        recursive_output = tree_to_string(os.path.join(directory, dir_name), new_prefix, level, show_hidden, current_level + 1, ignore_dirs)
-        if recursive_output: # 确保不是空字符串或错误消息
-            if isinstance(recursive_output, str) and not recursive_output.startswith("错误:"):
-                 # 如果递归返回的是一个多行字符串，则按行分割
-                 # 但我们设计的递归函数本身会处理好前缀，所以这里直接添加
-                output_lines.append(recursive_output.rstrip('\n')) # 去掉末尾可能的多余换行符
-            elif isinstance(recursive_output, list): # 以防万一将来修改为返回列表
-                output_lines.extend(recursive_output)
-            elif recursive_output.startswith("错误:") or recursive_output.startswith(prefix + "├── [权限不足:"): # 如果是错误信息或权限不足信息
-                output_lines.append(recursive_output.rstrip('\n'))
-
+        if depth == 1: # 已到达最大深度，不再展开
+            continue
+        if child.error == "permission":
+            output_lines.append(f"{new_prefix}├── [权限不足: {child.name}]")
+        elif child.error == "missing":
+            output_lines.append(f"错误: 目录 '{child.path}' 未找到。")
+        elif child.listed:
+            _render_tree(child, new_prefix, show_hidden, depth - 1 if depth != -1 else -1, output_lines)
 
     # 处理文件
-    for i, file_name in enumerate(files):
+    for i, file in enumerate(files):
         is_last_file = (i == len(files) - 1)
         connector = "└── " if is_last_file else "├── "
-        output_lines.append(f"{prefix}{connector}{file_name}")
-
-    # 对于初始调用，我们可能想要添加根目录本身
-    # 这个逻辑可以放在调用函数的地方，或者在这里有条件地添加
-    if current_level == 0 and directory != ".":
-        # 如果我们想在最前面加上根目录名
-        # return f"{base_name}\n" + "\n".join(output_lines)
-        # 或者让调用者自己决定是否打印根目录名
-        pass
-
-
-    return "\n".join(output_lines)
+        output_lines.append(f"{prefix}{connector}{file.name}")
 
 
 def display_tree(directory_path, level=-1, show_hidden=False):
@@ -0,0 +1,153 @@
+import os
+
+from .gitignore import GitIgnoreMatcher
+
+__all__ = ["FileNode", "DirNode", "scan_tree"]
+
+
+class FileNode:
+    """A non-directory entry found by `scan_tree`. Its stat result is fetched once and cached.
+
+    ``is_file`` is False for broken symlinks and special files (sockets, FIFOs, ...).
+    """
+
+    __slots__ = ("name", "path", "rel_path", "is_file", "_entry", "_stat")
+
+    def __init__(self, entry, rel_path):
+        self.name = entry.name
+        self.path = entry.path
+        self.rel_path = rel_path
+        try:
+            self.is_file = entry.is_file()
+        except OSError:
+            self.is_file = False
+        self._entry = entry
+        self._stat = None
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = self._entry.stat()
+            self._entry = None
+        return self._stat
+
+    @property
+    def size(self):
+        return self.stat().st_size
+
+    @property
+    def mtime_ns(self):
+        return self.stat().st_mtime_ns
+
+    def __repr__(self):
+        return f"FileNode({self.rel_path!r})"
+
+
+class DirNode:
+    """A directory found by `scan_tree`, with its sorted subdirectories and files.
+
+    ``error`` is None, or ``"permission"`` / ``"missing"`` if the directory could
+    not be listed. ``listed`` is False for directories below ``max_depth`` and for
+    symlinks to directories, which are recorded but never descended into.
+    """
+
+    __slots__ = ("name", "path", "rel_path", "dirs", "files", "error", "listed", "_stat")
+
+    def __init__(self, name, path, rel_path):
+        self.name = name
+        self.path = path
+        self.rel_path = rel_path
+        self.dirs = []
+        self.files = []
+        self.error = None
+        self.listed = False
+        self._stat = None
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    def iter_files(self):
+        """Yields every file of the tree: a directory's own files before its subdirectories'."""
+        yield from self.files
+        for d in self.dirs:
+            yield from d.iter_files()
+
+    def iter_dirs(self):
+        """Yields this directory and every directory below it, depth first."""
+        yield self
+        for d in self.dirs:
+            yield from d.iter_dirs()
+
+    def __repr__(self):
+        return f"DirNode({self.rel_path or self.path!r}, dirs={len(self.dirs)}, files={len(self.files)})"
+
+
+def scan_tree(directory, ignore_dirs=(), show_hidden=False, max_depth=-1, gitignore=False):
+    """
+    Walks a directory once with ``os.scandir`` and returns a reusable tree model.
+
+    Every directory is listed exactly once and files are only stat'ed on first
+    access of their size / mtime, so the same `DirNode` can be rendered with
+    `tree_to_string` and used for file filtering and content collection.
+    Symlinks to directories are recorded (unlisted) but never followed.
+
+    Args:
+        directory (str): The directory to scan.
+        ignore_dirs (iterable): Directory names that are neither listed nor descended into.
+        show_hidden (bool): Also descend into hidden directories (starting with '.').
+                            Hidden files are always recorded; renderers filter them.
+        max_depth (int): Number of directory levels to list. -1 means no limit.
+        gitignore (bool): Skip paths ignored by the .gitignore files of the tree
+                          (nested files, negation and anchored patterns are supported).
+                          Ignored directories are pruned before descending into them.
+
+    Returns:
+        DirNode: The root of the tree. ``rel_path`` of the root is ''.
+    """
+    directory = os.fspath(directory)
+    ignore_dirs = frozenset(ignore_dirs)
+    root = DirNode(os.path.basename(directory), directory, "")
+    _scan_into(root, ignore_dirs, show_hidden, max_depth, GitIgnoreMatcher() if gitignore else None)
+    return root
+
+
+def _scan_into(node, ignore_dirs, show_hidden, depth_left, matcher):
+    if depth_left == 0:
+        return
+    try:
+        with os.scandir(node.path) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except PermissionError:
+        node.error = "permission"
+        return
+    except FileNotFoundError:
+        node.error = "missing"
+        return
+    node.listed = True
+    if matcher is not None:
+        matcher = matcher.for_directory(
+            node.rel_path, node.path, has_gitignore=any(e.name == '.gitignore' for e in entries)
+        )
+
+    prefix = node.rel_path + os.sep if node.rel_path else ""
+    for entry in entries:
+        name = entry.name
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if is_dir and (name in ignore_dirs or (not show_hidden and name.startswith('.'))):
+            continue
+        rel_path = prefix + name
+        if matcher is not None and matcher.is_ignored(rel_path, is_dir):
+            continue
+        if is_dir:
+            child = DirNode(name, entry.path, rel_path)
+            node.dirs.append(child)
+            # Like os.walk(followlinks=False): a link to a directory (possibly to one of its
+            # ancestors) is shown but not walked, so the walk never loops or duplicates files.
+            if not entry.is_symlink():
+                _scan_into(child, ignore_dirs, show_hidden, depth_left - 1, matcher)
+        else:
+            node.files.append(FileNode(entry, rel_path))
@@ -0,0 +1,184 @@
+import os
+import re
+
+__all__ = ["compile_gitignore_pattern", "GitIgnoreMatcher"]
+
+
+def _translate(pattern):
+    """Translates the glob part of a gitignore pattern into a regex (without anchors)."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**', i):
+                after_slash = i == 0 or pattern[i - 1] == '/'
+                if after_slash and pattern.startswith('/', i + 2):
+                    out.append('(?:.*/)?')  # "**/": zero or more directories
+                    i += 3
+                    continue
+                if after_slash and i + 2 == n:
+                    out.append('.*')  # trailing "/**": everything inside
+                    i += 2
+                    continue
+                i += 1  # any other "**" is a plain "*"
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            j = i + 1
+            if j < n and pattern[j] in '!^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            j = pattern.find(']', j)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j]
+                if body[:1] in ('!', '^'):
+                    body = '^' + body[1:]
+                out.append('(?!/)[' + body.replace('\\', '\\\\') + ']')
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+
+def compile_gitignore_pattern(line):
+    """
+    Compiles one line of a .gitignore file.
+
+    Args:
+        line (str): The line, without the trailing newline.
+
+    Returns:
+        tuple: ``(regex, negate, dir_only)``, or None for blank lines and comments.
+               ``regex`` matches paths relative to the directory of the .gitignore
+               file, using '/' as separator.
+    """
+    if line.endswith('\r'):
+        line = line[:-1]
+    # Trailing spaces are ignored unless escaped with a backslash.
+    stripped = line.rstrip(' ')
+    if stripped.endswith('\\') and len(stripped) < len(line):
+        stripped += ' '
+    line = stripped
+    if not line or line.startswith('#'):
+        return None
+
+    negate = line.startswith('!')
+    if negate:
+        line = line[1:]
+    elif line.startswith('\\!') or line.startswith('\\#'):
+        line = line[1:]
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+    # A slash at the start or in the middle anchors the pattern to the .gitignore
+    # directory; otherwise it matches at any depth.
+    anchored = '/' in line
+    line = line.lstrip('/')
+    regex = _translate(line)
+    if not anchored:
+        regex = '(?:.*/)?' + regex
+    return re.compile(regex + r'\Z', re.DOTALL), negate, dir_only
+
+
+class _RuleSet:
+    """The compiled rules of one .gitignore file."""
+
+    __slots__ = ("base", "rules", "file_regex", "dir_regex")
+
+    def __init__(self, base, lines):
+        self.base = base  # directory of the .gitignore, relative to the scan root
+        self.rules = [r for r in map(compile_gitignore_pattern, lines) if r is not None]
+        self.file_regex = self.dir_regex = None
+        if not any(negate for _, negate, _ in self.rules):
+            # Without negations the order does not matter: one combined match.
+            self.file_regex = self._combine(r for r, _, dir_only in self.rules if not dir_only)
+            self.dir_regex = self._combine(r for r, _, _ in self.rules)
+
+    @staticmethod
+    def _combine(regexes):
+        parts = [r.pattern for r in regexes]
+        return re.compile('|'.join(f'(?:{p})' for p in parts), re.DOTALL) if parts else None
+
+    def match(self, rel_path, is_dir):
+        """True if ignored, False if re-included by a negation, None if no rule matches."""
+        if self.dir_regex is not None or not self.rules:
+            regex = self.dir_regex if is_dir else self.file_regex
+            return True if regex is not None and regex.match(rel_path) else None
+        for regex, negate, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                return not negate
+        return None
+
+
+class GitIgnoreMatcher:
+    """
+    Matches paths against the .gitignore files of a directory tree.
+
+    Rules of deeper .gitignore files take precedence over those of their parents,
+    and within a file the last matching rule wins, as in git. Use `for_directory`
+    while walking down so that every .gitignore is read and compiled only once.
+    """
+
+    __slots__ = ("_rule_sets",)
+
+    def __init__(self, rule_sets=()):
+        self._rule_sets = tuple(rule_sets)
+
+    @classmethod
+    def from_lines(cls, lines, base=""):
+        """A matcher for explicit gitignore-style `lines`, relative to `base`."""
+        return cls((_RuleSet(base, lines),))
+
+    def for_directory(self, rel_dir, abs_dir, has_gitignore=True):
+        """
+        Returns the matcher for the contents of a directory.
+
+        Args:
+            rel_dir (str): The directory relative to the scan root ('' for the root).
+            abs_dir (str): The directory path on disk.
+            has_gitignore (bool): Whether the directory contains a .gitignore file.
+                                  Pass False to skip the lookup when already known.
+        """
+        if not has_gitignore:
+            return self
+        try:
+            with open(os.path.join(abs_dir, '.gitignore'), encoding='utf-8', errors='replace') as f:
+                lines = f.read().split('\n')
+        except OSError:
+            return self
+        return GitIgnoreMatcher(self._rule_sets + (_RuleSet(rel_dir.replace(os.sep, '/'), lines),))
+
+    def is_ignored(self, rel_path, is_dir):
+        """
+        Args:
+            rel_path (str): Path relative to the scan root.
+            is_dir (bool): Whether the path is a directory.
+
+        Returns:
+            bool: True if the path is ignored.
+        """
+        rel_path = rel_path.replace(os.sep, '/')
+        for rule_set in reversed(self._rule_sets):
+            base = rule_set.base
+            if base:
+                if not rel_path.startswith(base + '/'):
+                    continue
+                path = rel_path[len(base) + 1:]
+            else:
+                path = rel_path
+            result = rule_set.match(path, is_dir)
+            if result is not None:
+                return result
+        return False
@@ -0,0 +1,348 @@
+import json
+import random
+import re
+
+__all__ = ["infer_json_schema", "print_json_schema"]
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# What may follow the part of a number decoded so far, e.g. ".5e10" after "1".
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+# An error this close to the end of the buffer may just be a value cut by the chunk boundary.
+_ERROR_MARGIN = 8
+
+
+class _JsonStream:
+    """Incremental reader over a JSON text file.
+
+    Only the current chunk and the value being decoded are kept in memory.
+    Containers are walked token by token by the caller, everything else is
+    decoded with the C-accelerated ``JSONDecoder.raw_decode``.
+    """
+
+    def __init__(self, f, chunk_size=1 << 20):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size):
+        data = self.f.read(size)
+        if not data:
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Skips whitespace and returns the next character ('' at the end of the file)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill(self.chunk_size):
+                return ""
+
+    def next_char(self, expected):
+        c = self.peek()
+        if c not in expected:
+            raise ValueError(f"Invalid JSON: expected one of {expected!r}, got {c!r}")
+        self.pos += 1
+        return c
+
+    def decode(self):
+        """Decodes the next complete value."""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # Only an unterminated string or an error at the very end of the buffer can
+                # be fixed by reading on; anything else is invalid wherever the value ends.
+                incomplete = e.msg.startswith("Unterminated string") or e.pos >= len(self.buf) - _ERROR_MARGIN
+                if not incomplete or not self._fill(size):
+                    raise
+            else:
+                # A number that reaches the end of the buffer, e.g. "1." of "1.5e10", may
+                # continue in the next chunk: decode it again with more data.
+                if (not isinstance(value, (int, float)) or isinstance(value, bool)
+                        or _NUMBER_TAIL.match(self.buf, end).end() < len(self.buf)
+                        or not self._fill(size)):
+                    self.pos = end
+                    return value
+            size *= 2
+
+
+class _StopStream(Exception):
+    pass
+
+
+class _SchemaNode:
+    """Merged schema of every value seen at one position of a JSON document."""
+
+    __slots__ = ("count", "types", "lengths", "num_range", "keys", "items", "truncated")
+
+    OTHER_KEYS = "<other keys>"
+
+    def __init__(self):
+        self.count = 0
+        self.types = {}
+        self.lengths = {}      # type name -> [min, max, total]
+        self.num_range = None  # [min, max] over int/float values
+        self.keys = None
+        self.items = None
+        self.truncated = False
+
+    def _seen(self, type_name):
+        self.count += 1
+        self.types[type_name] = self.types.get(type_name, 0) + 1
+
+    def _length(self, type_name, n):
+        stats = self.lengths.get(type_name)
+        if stats is None:
+            self.lengths[type_name] = [n, n, n]
+        else:
+            stats[0] = min(stats[0], n)
+            stats[1] = max(stats[1], n)
+            stats[2] += n
+
+    def child(self, key, max_keys):
+        if self.keys is None:
+            self.keys = {}
+        node = self.keys.get(key)
+        if node is None:
+            if len(self.keys) >= max_keys:
+                key = self.OTHER_KEYS
+                node = self.keys.get(key)
+            if node is None:
+                node = self.keys[key] = _SchemaNode()
+        return node
+
+    def item_node(self):
+        if self.items is None:
+            self.items = _SchemaNode()
+        return self.items
+
+    def add(self, value, max_keys):
+        """Merges an in-memory value into the schema."""
+        self._seen(type(value).__name__)
+        if isinstance(value, dict):
+            self._length("dict", len(value))
+            for k, v in value.items():
+                self.child(k, max_keys).add(v, max_keys)
+        elif isinstance(value, list):
+            self._length("list", len(value))
+            items = self.item_node()
+            for v in value:
+                items.add(v, max_keys)
+        elif isinstance(value, str):
+            self._length("str", len(value))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            if self.num_range is None:
+                self.num_range = [value, value]
+            else:
+                self.num_range[0] = min(self.num_range[0], value)
+                self.num_range[1] = max(self.num_range[1], value)
+
+    def to_dict(self):
+        out = {"count": self.count, "types": dict(self.types)}
+        if self.lengths:
+            out["lengths"] = {
+                t: {"min": s[0], "max": s[1], "mean": s[2] / self.types[t]}
+                for t, s in self.lengths.items()
+            }
+        if self.num_range is not None:
+            out["range"] = {"min": self.num_range[0], "max": self.num_range[1]}
+        if self.keys is not None:
+            n_dicts = self.types.get("dict", 0)
+            out["keys"] = {}
+            for k, node in self.keys.items():
+                child = node.to_dict()
+                child["frequency"] = node.count / n_dicts if n_dicts else 0.0
+                out["keys"][k] = child
+        if self.items is not None:
+            out["items"] = self.items.to_dict()
+        if self.truncated:
+            out["truncated"] = True
+        return out
+
+
+def _stream_into(stream, node, depth, opts):
+    """Parses the next value of ``stream`` into ``node``, walking containers up to
+    ``opts["stream_depth"]`` token by token. Anything deeper, and every list
+    element, is decoded whole."""
+    c = stream.peek()
+    if depth >= opts["stream_depth"] or c not in "{[" or c == "":
+        node.add(stream.decode(), opts["max_keys"])
+        return
+
+    stream.pos += 1
+    if c == "{":
+        node._seen("dict")
+        n = 0
+        if stream.peek() == "}":
+            stream.pos += 1
+        else:
+            while True:
+                key = stream.decode()
+                stream.next_char(":")
+                _stream_into(stream, node.child(key, opts["max_keys"]), depth + 1, opts)
+                n += 1
+                if stream.next_char(",}") == "}":
+                    break
+        node._length("dict", n)
+        return
+
+    node._seen("list")
+    items = node.item_node()
+    sample, sampling, rng = opts["sample"], opts["sampling"], opts["rng"]
+    reservoir = []
+    n = 0
+    if stream.peek() == "]":
+        stream.pos += 1
+    else:
+        while True:
+            if sample is None or (sampling == "first" and n < sample):
+                items.add(stream.decode(), opts["max_keys"])
+            elif sampling == "first":
+                if depth == 0:
+                    # Nothing follows a top-level list: stop reading the file.
+                    node.truncated = True
+                    node._length("list", n)
+                    raise _StopStream
+                stream.decode()
+            else:
+                value = stream.decode()
+                if n < sample:
+                    reservoir.append(value)
+                else:
+                    j = rng.randrange(n + 1)
+                    if j < sample:
+                        reservoir[j] = value
+            n += 1
+            if stream.next_char(",]") == "]":
+                break
+    for value in reservoir:
+        items.add(value, opts["max_keys"])
+    node._length("list", n)
+
+
+def infer_json_schema(data, sample=None, sampling="first", seed=None,
+                      stream_depth=2, max_keys=1000, chunk_size=1 << 20):
+    """
+    Infers a schema merged across all list elements (or JSONL lines) of a JSON document.
+
+    Files are parsed incrementally: containers down to `stream_depth` are walked
+    token by token and list elements (e.g. the records of a top-level list, or of
+    the lists in a COCO-style ``{"images": [...], ...}`` dict) are decoded one at a
+    time, so memory stays bounded by the largest single record.
+
+    Args:
+        data: Path to a '.json' or '.jsonl' file, or an in-memory JSON-like object.
+        sample (int, optional): Only merge N elements of each streamed list / N lines.
+        sampling (str, optional): "first" takes the first N elements (and stops reading a
+                                  top-level list or JSONL file early), "reservoir" takes
+                                  a uniform random sample of N. Defaults to "first".
+        seed (int, optional): Seed for reservoir sampling.
+        stream_depth (int, optional): Nesting depth of containers that are streamed.
+        max_keys (int, optional): Maximum distinct keys tracked per dict; further keys are
+                                  merged into an ``"<other keys>"`` entry.
+        chunk_size (int, optional): Number of characters read at a time.
+
+    Returns:
+        dict: Schema node with the value ``count``, ``types`` (type name -> count),
+              ``lengths`` (min/max/mean per container or str type), numeric ``range``,
+              ``keys`` (per-key schema with its occurrence ``frequency``) and ``items``
+              (merged schema of list elements or JSONL lines).
+    """
+    if sampling not in ("first", "reservoir"):
+        raise ValueError(f"Unknown sampling mode: {sampling}")
+    opts = {
+        "sample": sample, "sampling": sampling, "rng": random.Random(seed),
+        "stream_depth": stream_depth, "max_keys": max_keys,
+    }
+    root = _SchemaNode()
+    if not isinstance(data, str):
+        root.add(data, max_keys)
+        return root.to_dict()
+
+    with open(data, encoding="utf-8") as f:
+        if data.endswith(".jsonl"):
+            _jsonl_into(f, root, opts)
+        else:
+            stream = _JsonStream(f, chunk_size)
+            try:
+                _stream_into(stream, root, 0, opts)
+            except _StopStream:
+                pass
+            else:
+                if stream.peek() != "":
+                    raise ValueError("Invalid JSON: extra data after the top-level value")
+    return root.to_dict()
+
+
+def _jsonl_into(f, root, opts):
+    """A JSONL file is described as a list whose elements are its lines."""
+    root._seen("list")
+    items = root.item_node()
+    sample, rng = opts["sample"], opts["rng"]
+    reservoir = []
+    n = 0
+    for line in f:
+        if not line.strip():
+            continue
+        if sample is None:
+            items.add(json.loads(line), opts["max_keys"])
+        elif opts["sampling"] == "first":
+            if n >= sample:
+                root.truncated = True
+                break
+            items.add(json.loads(line), opts["max_keys"])
+        elif n < sample:
+            reservoir.append(json.loads(line))
+        else:
+            j = rng.randrange(n + 1)
+            if j < sample:
+                reservoir[j] = json.loads(line)
+        n += 1
+    for value in reservoir:
+        items.add(value, opts["max_keys"])
+    root._length("list", n)
+
+
+def _describe(schema):
+    parts = [
+        f"{t} {n / schema['count']:.0%}" if len(schema["types"]) > 1 else t
+        for t, n in schema["types"].items()
+    ]
+    text = " | ".join(parts)
+    for t, stats in schema.get("lengths", {}).items():
+        if t in ("str", "dict"):
+            text += f", {t} len {stats['min']}..{stats['max']} (mean {stats['mean']:.1f})"
+    if "range" in schema:
+        text += f", range {schema['range']['min']}..{schema['range']['max']}"
+    return text
+
+
+def print_json_schema(schema, indent=''):
+    """
+    Prints a schema returned by `infer_json_schema` in the style of `print_json_structure`.
+
+    Args:
+        schema (dict): The schema to print.
+        indent (str): The indentation string used for formatting the output.
+    """
+    print(f"{indent}\033[32m({_describe(schema)})\033[0m")
+    for key, child in schema.get("keys", {}).items():
+        print(f"{indent}|-- \033[31m{key}\033[0m: \033[36m{child['frequency']:.1%}\033[0m")
+        print_json_schema(child, indent + "    ")
+    if "items" in schema:
+        stats = schema["lengths"]["list"]
+        more = "+" if schema.get("truncated") else ""
+        print(
+            f"{indent}\033[33mList of length {stats['min']}..{stats['max']}{more} "
+            f"(mean {stats['mean']:.1f}, {schema['types']['list']} lists)\033[0m"
+        )
+        print(f"\033[33m{indent}(Merged element schema of {schema['items']['count']} elements):\033[0m")
+        print_json_schema(schema["items"], indent)
@@ -0,0 +1,147 @@
+import os
+import sqlite3
+import threading
+import time
+
+__all__ = ["PromptCache"]
+
+
+class PromptCache:
+    """
+    Persistent, size-capped cache of rendered prompt blocks, stored in one SQLite file.
+
+    Entries are evicted least recently used first once their total size exceeds
+    `max_bytes`. Hits only update the recency in memory until `flush`, so lookups
+    never write to disk. New entries are buffered and committed in batches, each in a
+    short transaction, so other processes (or caches) using the same file are only
+    locked out for the duration of one batch. The cache can be shared by the threads
+    of one process.
+
+    Args:
+        path (str): The cache file, created if missing.
+        max_bytes (int, optional): Size cap of the stored values (UTF-8 bytes).
+                                   Defaults to 256MB.
+        batch_size (int, optional): Buffered entries that trigger a commit. Defaults to 64.
+        commit_interval (float, optional): Seconds after which buffered entries are committed
+                                           by the next `put`, however few. Defaults to 1.
+
+    Attributes:
+        stats (dict): ``hits``, ``misses``, ``writes`` and ``evictions`` since the cache was opened.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, batch_size=64, commit_interval=1.0):
+        path = os.fspath(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._pending = {}
+        self._last_commit = time.monotonic()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._db.commit()
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key):
+        """Returns the cached value of `key`, or None."""
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                self.stats["hits"] += 1
+                return pending[0]
+            row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self._touched[key] = time.time()
+            return row[0]
+
+    def put(self, key, value):
+        """Stores `value` (str) under `key`. It is committed with the next batch, or by `flush`."""
+        size = len(value.encode('utf-8'))
+        with self._lock:
+            self._pending[key] = (value, size, time.time())
+            self._touched.pop(key, None)
+            self.stats["writes"] += 1
+            if (len(self._pending) >= self.batch_size
+                    or time.monotonic() - self._last_commit >= self.commit_interval):
+                self._write_pending()
+                self._commit()
+
+    def _write_pending(self):
+        """Writes the buffered entries (in the current transaction). Call with the lock held."""
+        for key, (value, size, last_used) in self._pending.items():
+            old = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, size, last_used),
+            )
+            self._total += size - (old[0] if old else 0)
+        self._pending.clear()
+
+    def _commit(self):
+        self._db.commit()
+        self._last_commit = time.monotonic()
+
+    def flush(self):
+        """Writes the buffered entries and the recency of hits, evicts down to `max_bytes`
+        and commits."""
+        with self._lock:
+            self._write_pending()
+            if self._touched:
+                self._db.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    [(t, k) for k, t in self._touched.items()],
+                )
+                self._touched.clear()
+            if self._total > self.max_bytes:
+                # Evict to 90% of the cap so that the next writes don't evict again right away.
+                target = self._total - int(self.max_bytes * 0.9)
+                freed, keys = 0, []
+                for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY last_used"):
+                    if freed >= target:
+                        break
+                    keys.append((key,))
+                    freed += size
+                self._db.executemany("DELETE FROM entries WHERE key = ?", keys)
+                self._total -= freed
+                self.stats["evictions"] += len(keys)
+            self._commit()
+
+    def info(self):
+        """Returns the ``entries`` count and total ``bytes`` on disk (committing the buffered
+        entries first), along with `stats`."""
+        with self._lock:
+            if self._pending:
+                self._write_pending()
+                self._commit()
+            n = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"entries": n, "bytes": self._total, "max_bytes": self.max_bytes, **self.stats}
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+            self._commit()
+            self._total = 0
+            self._touched.clear()
+            self._pending.clear()
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
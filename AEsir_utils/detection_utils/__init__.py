@@ -1 +1,22 @@
-from .visual_tools import *
\ No newline at end of file
+from .._lazy import lazy_exports
+
+_EXPORTS = {
+    "bbox_to_rect": ".visual_tools",
+    "show_bboxes": ".visual_tools",
+    "BOX_FORMATS": ".box_ops",
+    "as_numpy_boxes": ".box_ops",
+    "box_convert": ".box_ops",
+    "box_area": ".box_ops",
+    "clip_boxes": ".box_ops",
+    "box_iou": ".box_ops",
+    "iter_box_iou_blocks": ".box_ops",
+    "box_iou_max": ".box_ops",
+    "box_iou_pairs": ".box_ops",
+    "nms": ".box_ops",
+    "batched_nms": ".box_ops",
+    "draw_bboxes": ".raster_overlay",
+    "iter_draw_bboxes": ".raster_overlay",
+    "draw_bboxes_dir": ".raster_overlay",
+}
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,340 @@
+import sys
+
+import numpy as np
+
+__all__ = [
+    "BOX_FORMATS", "as_numpy_boxes", "box_convert", "box_area", "clip_boxes",
+    "box_iou", "iter_box_iou_blocks", "box_iou_max", "box_iou_pairs", "nms", "batched_nms",
+]
+
+# (x1, y1, x2, y2) corners, (x, y, w, h) with the top-left corner, and (cx, cy, w, h) centres.
+BOX_FORMATS = ("xyxy", "xywh", "cxcywh")
+
+# Every function takes (..., 4) boxes as a NumPy array or a torch tensor and returns the same
+# kind (on the same device for tensors); nothing is copied between the two. torch is never
+# imported here: a tensor can only be passed in once torch has been imported by the caller.
+
+
+def _torch(x):
+    """The torch module if `x` is a tensor, else None."""
+    torch = sys.modules.get("torch")
+    return torch if torch is not None and isinstance(x, torch.Tensor) else None
+
+
+def _stack(parts, like):
+    torch = _torch(like)
+    return torch.stack(parts, dim=-1) if torch is not None else np.stack(parts, axis=-1)
+
+
+def _minimum(a, b):
+    torch = _torch(a)
+    return torch.minimum(a, b) if torch is not None else np.minimum(a, b)
+
+
+def _maximum(a, b):
+    torch = _torch(a)
+    return torch.maximum(a, b) if torch is not None else np.maximum(a, b)
+
+
+def as_numpy_boxes(bboxes):
+    """
+    Converts boxes given as a torch tensor (on any device), an array or a list to one (N, 4)
+    float NumPy array. Tensors are moved to the CPU once, as a whole.
+    """
+    if hasattr(bboxes, "detach"):
+        bboxes = bboxes.detach().cpu().numpy()
+    elif isinstance(bboxes, (list, tuple)) and len(bboxes) and hasattr(bboxes[0], "detach"):
+        bboxes = [bbox.detach().cpu().numpy() for bbox in bboxes]
+    bboxes = np.asarray(bboxes)
+    if bboxes.dtype.kind != 'f':
+        bboxes = bboxes.astype(np.float64)
+    return bboxes.reshape(-1, 4)
+
+
+def box_convert(boxes, in_fmt, out_fmt):
+    """
+    Converts boxes between the formats of BOX_FORMATS.
+
+    Args:
+        boxes (np.ndarray or torch.Tensor): (..., 4) boxes.
+        in_fmt (str): The format of `boxes`: "xyxy", "xywh" or "cxcywh".
+        out_fmt (str): The format to convert to.
+
+    Returns:
+        The converted boxes, of the same type as `boxes`. `boxes` itself if the formats are equal.
+    """
+    for fmt in (in_fmt, out_fmt):
+        if fmt not in BOX_FORMATS:
+            raise ValueError(f"Unknown box format: {fmt}, expected one of {BOX_FORMATS}")
+    if in_fmt == out_fmt:
+        return boxes
+    a, b, c, d = boxes[..., 0], boxes[..., 1], boxes[..., 2], boxes[..., 3]
+    if in_fmt == "xywh":
+        a, b, c, d = a, b, a + c, b + d
+    elif in_fmt == "cxcywh":
+        a, b, c, d = a - c / 2, b - d / 2, a + c / 2, b + d / 2
+    # a, b, c, d are now x1, y1, x2, y2
+    if out_fmt == "xywh":
+        a, b, c, d = a, b, c - a, d - b
+    elif out_fmt == "cxcywh":
+        a, b, c, d = (a + c) / 2, (b + d) / 2, c - a, d - b
+    return _stack([a, b, c, d], boxes)
+
+
+def box_area(boxes, fmt="xyxy"):
+    """Areas of (..., 4) boxes. Boxes with x2 < x1 or y2 < y1 have area 0."""
+    boxes = box_convert(boxes, fmt, "xyxy")
+    return (boxes[..., 2] - boxes[..., 0]).clip(min=0) * (boxes[..., 3] - boxes[..., 1]).clip(min=0)
+
+
+def clip_boxes(boxes, size, fmt="xyxy"):
+    """
+    Clips boxes to an image.
+
+    Args:
+        boxes (np.ndarray or torch.Tensor): (..., 4) boxes.
+        size (tuple): The image ``(height, width)``.
+        fmt (str, optional): The format of `boxes` (and of the result). Defaults to "xyxy".
+    """
+    height, width = size
+    xyxy = box_convert(boxes, fmt, "xyxy")
+    x = xyxy[..., 0::2].clip(min=0, max=width)
+    y = xyxy[..., 1::2].clip(min=0, max=height)
+    clipped = _stack([x[..., 0], y[..., 0], x[..., 1], y[..., 1]], xyxy)
+    return box_convert(clipped, "xyxy", fmt)
+
+
+def box_iou(boxes1, boxes2, fmt="xyxy"):
+    """
+    Pairwise intersection over union.
+
+    Args:
+        boxes1: (N, 4) boxes.
+        boxes2: (M, 4) boxes, of the same type as `boxes1`.
+        fmt (str, optional): The format of both. Defaults to "xyxy".
+
+    Returns:
+        The (N, M) IoU matrix. Pairs whose union is empty have IoU 0.
+        Use `iter_box_iou_blocks` and friends when N x M does not fit in memory.
+    """
+    boxes1 = box_convert(boxes1, fmt, "xyxy")
+    boxes2 = box_convert(boxes2, fmt, "xyxy")
+    return _iou_xyxy(boxes1, box_area(boxes1), boxes2, box_area(boxes2))
+
+
+def _iou_xyxy(boxes1, area1, boxes2, area2):
+    # One coordinate at a time, so that only (N, M) temporaries are created.
+    w = (_minimum(boxes1[:, None, 2], boxes2[None, :, 2]) - _maximum(boxes1[:, None, 0], boxes2[None, :, 0])).clip(min=0)
+    h = (_minimum(boxes1[:, None, 3], boxes2[None, :, 3]) - _maximum(boxes1[:, None, 1], boxes2[None, :, 1])).clip(min=0)
+    inter = w * h
+    union = area1[:, None] + area2[None, :] - inter
+    return inter / union.clip(min=1e-12) if _torch(inter) is not None else np.divide(
+        inter, union, out=np.zeros_like(inter, dtype=np.result_type(inter, np.float32)), where=union > 0
+    )
+
+
+def iter_box_iou_blocks(boxes1, boxes2, block_size=2048, fmt="xyxy"):
+    """
+    Yields the IoU matrix of `box_iou` block by block, so that e.g. 50k x 50k comparisons
+    only ever hold one ``block_size x block_size`` block in memory.
+
+    Yields:
+        tuple: ``(row, col, block)``, where `block` holds the IoUs of ``boxes1[row:row + len(block)]``
+               with ``boxes2[col:col + block.shape[1]]``.
+    """
+    boxes1 = box_convert(boxes1, fmt, "xyxy")
+    boxes2 = box_convert(boxes2, fmt, "xyxy")
+    area1, area2 = box_area(boxes1), box_area(boxes2)
+    for row in range(0, len(boxes1), block_size):
+        b1, a1 = boxes1[row:row + block_size], area1[row:row + block_size]
+        for col in range(0, len(boxes2), block_size):
+            yield row, col, _iou_xyxy(b1, a1, boxes2[col:col + block_size], area2[col:col + block_size])
+
+
+def _overlapping_blocks(boxes1, boxes2, block_size, fmt):
+    """
+    Like `iter_box_iou_blocks`, but over boxes sorted by x1 and skipping the block pairs whose
+    extents do not intersect (all their IoUs are 0), which is most of them for spatially
+    spread boxes. Yields ``(rows, cols, block)`` with the original indices of the block.
+    """
+    torch = _torch(boxes1)
+    boxes1 = box_convert(boxes1, fmt, "xyxy")
+    boxes2 = box_convert(boxes2, fmt, "xyxy")
+    order1 = torch.argsort(boxes1[:, 0]) if torch is not None else np.argsort(boxes1[:, 0], kind='stable')
+    order2 = torch.argsort(boxes2[:, 0]) if torch is not None else np.argsort(boxes2[:, 0], kind='stable')
+    boxes1, boxes2 = boxes1[order1], boxes2[order2]
+    area1, area2 = box_area(boxes1), box_area(boxes2)
+
+    def extents(boxes):
+        """(min x1, min y1, max x2, max y2) of every block, as Python floats."""
+        out = []
+        for start in range(0, len(boxes), block_size):
+            b = boxes[start:start + block_size]
+            out.append((float(b[:, 0].min()), float(b[:, 1].min()), float(b[:, 2].max()), float(b[:, 3].max())))
+        return out
+
+    extents2 = extents(boxes2)
+    for i, (x1, y1, x2, y2) in enumerate(extents(boxes1)):
+        row = i * block_size
+        b1, a1 = boxes1[row:row + block_size], area1[row:row + block_size]
+        for j, (u1, v1, u2, v2) in enumerate(extents2):
+            if x2 <= u1 or u2 <= x1 or y2 <= v1 or v2 <= y1:
+                continue
+            col = j * block_size
+            yield (order1[row:row + block_size], order2[col:col + block_size],
+                   _iou_xyxy(b1, a1, boxes2[col:col + block_size], area2[col:col + block_size]))
+
+
+def box_iou_max(boxes1, boxes2, block_size=2048, fmt="xyxy"):
+    """
+    For every box of `boxes1`, its highest IoU with `boxes2` and the index of that box
+    (e.g. to match detections to ground truth), computed block by block. Blocks of boxes
+    that cannot overlap are skipped, so spread-out boxes cost far less than N x M.
+
+    Returns:
+        tuple: ``(max_iou, index)``, both of length N. `index` is -1 where no box of
+               `boxes2` overlaps.
+    """
+    torch = _torch(boxes1)
+    n = len(boxes1)
+    if torch is not None:
+        dtype = boxes1.dtype if boxes1.is_floating_point() else torch.float32
+        best = torch.zeros(n, dtype=dtype, device=boxes1.device)
+        index = torch.full((n,), -1, dtype=torch.long, device=boxes1.device)
+    else:
+        best = np.zeros(n, dtype=np.result_type(boxes1, np.float32))
+        index = np.full(n, -1, dtype=np.int64)
+    for rows, cols, block in _overlapping_blocks(boxes1, boxes2, block_size, fmt):
+        value, arg = block.max(dim=1) if torch is not None else (block.max(axis=1), block.argmax(axis=1))
+        better = value > best[rows]
+        best[rows] = _where(better, value, best[rows])
+        index[rows] = _where(better, cols[arg], index[rows])
+    return best, index
+
+
+def _where(cond, a, b):
+    torch = _torch(cond)
+    return torch.where(cond, a, b) if torch is not None else np.where(cond, a, b)
+
+
+def box_iou_pairs(boxes1, boxes2, threshold, block_size=2048, fmt="xyxy"):
+    """
+    The pairs whose IoU exceeds `threshold` (>= 0), as a sparse list, computed block by block.
+    Blocks of boxes that cannot overlap are skipped.
+
+    Returns:
+        tuple: ``(rows, cols, ious)``: indices into `boxes1` and `boxes2` and their IoUs,
+               ordered by block.
+    """
+    torch = _torch(boxes1)
+    rows, cols, ious = [], [], []
+    for block_rows, block_cols, block in _overlapping_blocks(boxes1, boxes2, block_size, fmt):
+        r, c = (torch.nonzero(block > threshold, as_tuple=True) if torch is not None
+                else np.nonzero(block > threshold))
+        rows.append(block_rows[r])
+        cols.append(block_cols[c])
+        ious.append(block[r, c])
+    if torch is not None:
+        if not rows:
+            empty = torch.zeros(0, dtype=torch.long, device=boxes1.device)
+            return empty, empty, torch.zeros(0, device=boxes1.device)
+        return torch.cat(rows), torch.cat(cols), torch.cat(ious)
+    if not rows:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(ious)
+
+
+def _torchvision_ops():
+    try:
+        from torchvision import ops
+    except ImportError:
+        return None
+    return ops
+
+
+def nms(boxes, scores, iou_threshold, fmt="xyxy"):
+    """
+    Non-maximum suppression: drops every box whose IoU with a higher-scoring kept box
+    exceeds `iou_threshold`.
+
+    Tensors go through ``torchvision.ops.nms`` when torchvision is installed. Otherwise each
+    kept box is compared with the remaining candidates in one vectorized step, and the
+    suppressed ones are dropped before the next step.
+
+    Args:
+        boxes: (N, 4) boxes: a tensor, or an array or list.
+        scores: (N,) scores, of the same type as `boxes` (or an array or list).
+        iou_threshold (float): The IoU above which a box is suppressed.
+        fmt (str, optional): The format of `boxes`. Defaults to "xyxy".
+
+    Returns:
+        The indices of the kept boxes, by decreasing score (an int64 array or long tensor).
+    """
+    torch = _torch(boxes)
+    if torch is None:
+        boxes = as_numpy_boxes(boxes)
+    boxes = box_convert(boxes, fmt, "xyxy")
+    if torch is not None:
+        scores = torch.as_tensor(scores, device=boxes.device)
+        ops = _torchvision_ops()
+        if ops is not None:
+            return ops.nms(boxes.float() if not boxes.is_floating_point() else boxes, scores, iou_threshold)
+        order = torch.sort(scores, descending=True, stable=True).indices
+    else:
+        order = np.argsort(-np.asarray(scores), kind='stable')
+    if len(order) == 0:
+        return order
+
+    x1, y1, x2, y2 = (boxes[order, k] for k in range(4))
+    areas = (x2 - x1).clip(min=0) * (y2 - y1).clip(min=0)
+    keep = []
+    candidates = torch.arange(len(order), device=boxes.device) if torch is not None else np.arange(len(order))
+    while len(candidates):
+        i, rest = candidates[0], candidates[1:]
+        keep.append(i)
+        w = (_minimum(x2[rest], x2[i]) - _maximum(x1[rest], x1[i])).clip(min=0)
+        h = (_minimum(y2[rest], y2[i]) - _maximum(y1[rest], y1[i])).clip(min=0)
+        inter = w * h
+        union = areas[rest] + areas[i] - inter
+        # inter > t * union, written without dividing so that empty unions need no special case
+        candidates = rest[~(inter > iou_threshold * union)]
+    if torch is not None:
+        return order[torch.stack(keep)]
+    return order[np.array(keep, dtype=np.int64)]
+
+
+def batched_nms(boxes, scores, classes, iou_threshold, fmt="xyxy"):
+    """
+    Class-aware `nms`: boxes only suppress boxes of the same class.
+
+    All classes are processed in one `nms` call, by shifting the boxes of each class into a
+    region of their own so that boxes of different classes never overlap.
+
+    Args:
+        boxes: (N, 4) boxes: a tensor, or an array or list.
+        scores: (N,) scores.
+        classes: (N,) integer class ids, of the same type as `boxes` (or an array or list).
+        iou_threshold (float): The IoU above which a box is suppressed.
+        fmt (str, optional): The format of `boxes`. Defaults to "xyxy".
+
+    Returns:
+        The indices of the kept boxes, by decreasing score.
+    """
+    torch = _torch(boxes)
+    if torch is None:
+        boxes = as_numpy_boxes(boxes)
+        classes = np.asarray(classes)
+    else:
+        scores = torch.as_tensor(scores, device=boxes.device)
+        classes = torch.as_tensor(classes, device=boxes.device)
+    boxes = box_convert(boxes, fmt, "xyxy")
+    if torch is not None:
+        ops = _torchvision_ops()
+        if ops is not None:
+            return ops.batched_nms(boxes.float() if not boxes.is_floating_point() else boxes,
+                                   scores, classes, iou_threshold)
+    if len(boxes) == 0:
+        return nms(boxes, scores, iou_threshold)
+    span = (boxes.max() - boxes.min()) + 1
+    offsets = (classes - classes.min()) * span
+    return nms(boxes - boxes.min() + offsets[:, None], scores, iou_threshold)
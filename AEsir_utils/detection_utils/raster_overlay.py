@@ -0,0 +1,332 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+from tqdm import tqdm
+
+from ..file_io import atomic_write, encode_image
+from .box_ops import as_numpy_boxes, box_convert
+
+__all__ = ["draw_bboxes", "iter_draw_bboxes", "draw_bboxes_dir"]
+
+# Matplotlib's single-letter colors, so that the defaults look the same as in `show_bboxes`.
+BASE_COLORS = {
+    'b': (0, 0, 255), 'g': (0, 128, 0), 'r': (255, 0, 0), 'c': (0, 191, 191),
+    'm': (191, 0, 191), 'y': (191, 191, 0), 'k': (0, 0, 0), 'w': (255, 255, 255),
+}
+DEFAULT_COLORS = ['b', 'g', 'r', 'm', 'c']
+LABEL_PAD = 2 # pixels around the label text
+
+
+def _to_rgb(color):
+    """An (r, g, b) tuple of ints for a color name, '#rrggbb' string, or 0-255 / 0-1 tuple."""
+    if isinstance(color, str):
+        return BASE_COLORS.get(color) or ImageColor.getrgb(color)[:3]
+    color = tuple(color)[:3]
+    if any(isinstance(c, float) for c in color) and max(color) <= 1:
+        return tuple(int(round(c * 255)) for c in color)
+    return tuple(int(c) for c in color)
+
+
+@lru_cache(maxsize=None)
+def _font(font_size):
+    try:
+        return ImageFont.load_default(size=font_size)
+    except TypeError: # Pillow < 10.1 only has the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=4096)
+def _label_mask(label, font_size):
+    """The text pixels of a label as a boolean (h, w) array, rendered once per label."""
+    font = _font(font_size)
+    x0, y0, x1, y1 = font.getbbox(label)
+    img = Image.new('L', (max(x1 - x0, 1), max(y1 - y0, 1)))
+    ImageDraw.Draw(img).text((-x0, -y0), label, fill=255, font=font)
+    mask = np.asarray(img) >= 128
+    mask.flags.writeable = False
+    return mask
+
+
+def _run_indices(starts, lengths, strides):
+    """
+    Flat indices of the runs ``start, start + stride, ...`` (``length >= 1`` pixels each), all
+    at once: a cumulative sum of the steps, where the first step of each run jumps from the
+    end of the previous run to its start.
+    """
+    steps = np.repeat(strides, lengths)
+    first = np.cumsum(lengths) - lengths
+    ends = starts + (lengths - 1) * strides
+    steps[first] = starts - np.concatenate([[0], ends[:-1]])
+    return np.cumsum(steps)
+
+
+def _paint_edges(flat, height, width, boxes, color_idx, palette, thickness):
+    """
+    Paints the edges of all `boxes` (integer, inclusive xyxy) into `flat`, a frame viewed as one
+    void element per pixel, with `palette` viewed likewise. Every edge is a run of pixels; the
+    runs of all boxes are turned into one index array and written with a single fancy
+    assignment. Edges are kept inside their box, and those outside the frame are not drawn,
+    the others are clipped to it.
+    """
+    x1, y1, x2, y2 = boxes.T
+    cx1, cy1 = np.maximum(x1, 0), np.maximum(y1, 0)
+    cx2, cy2 = np.minimum(x2, width - 1), np.minimum(y2, height - 1)
+    box_ids = np.arange(len(boxes))
+    starts, lengths, strides, owners = [], [], [], []
+    for k in range(thickness):
+        # Horizontal edges (stride 1), then vertical edges (stride W), drawn inwards.
+        for rows in (np.minimum(y1 + k, y2), np.maximum(y2 - k, y1)):
+            visible = (rows >= 0) & (rows < height)
+            starts.append(rows[visible] * width + cx1[visible])
+            lengths.append((cx2 - cx1 + 1)[visible])
+            strides.append(np.full(visible.sum(), 1, dtype=np.int64))
+            owners.append(box_ids[visible])
+        for cols in (np.minimum(x1 + k, x2), np.maximum(x2 - k, x1)):
+            visible = (cols >= 0) & (cols < width)
+            starts.append(cy1[visible] * width + cols[visible])
+            lengths.append((cy2 - cy1 + 1)[visible])
+            strides.append(np.full(visible.sum(), width, dtype=np.int64))
+            owners.append(box_ids[visible])
+    # Runs in box order, so that where boxes overlap the later box is drawn on top.
+    owners = np.concatenate(owners)
+    order = np.argsort(owners, kind='stable')
+    lengths = np.concatenate(lengths)[order]
+    strides = np.concatenate(strides)[order]
+    idx = _run_indices(np.concatenate(starts)[order], lengths, strides)
+    flat[idx] = palette[np.repeat(color_idx[owners[order]], lengths)]
+
+
+def _paint_labels(frame, boxes, labels, color_idx, palette, text_palette, font_size):
+    """Blits each label on a filled background above the top-left corner of its box
+    (or just inside it when there is no room above)."""
+    height, width = frame.shape[:2]
+    for (x1, y1, _, _), label, ci in zip(boxes, labels, color_idx):
+        mask = _label_mask(str(label), font_size)
+        h, w = mask.shape[0] + 2 * LABEL_PAD, mask.shape[1] + 2 * LABEL_PAD
+        top = y1 - h if y1 - h >= 0 else max(y1, 0)
+        left = min(max(x1, 0), width - 1)
+        bottom, right = min(top + h, height), min(left + w, width)
+        if bottom <= top or right <= left:
+            continue
+        region = frame[top:bottom, left:right]
+        region[...] = palette[ci]
+        text = mask[:max(bottom - top - LABEL_PAD, 0), :max(right - left - LABEL_PAD, 0)]
+        region[LABEL_PAD:LABEL_PAD + text.shape[0], LABEL_PAD:LABEL_PAD + text.shape[1]][text] = text_palette[ci]
+
+
+def draw_bboxes(image, bboxes, labels=None, colors=None, is_xyxy=True, thickness=2, font_size=11, inplace=False):
+    """
+    Draws bounding boxes (and labels) directly into an image, without matplotlib.
+
+    All box edges are painted with one vectorized assignment, and the text of each distinct
+    label is rendered only once and then blitted, so thousands of boxes per frame are cheap.
+
+    Boxes whose sides are at least ``2 * thickness`` pixels long come out exactly as with
+    ``ImageDraw.rectangle(box, outline=color, width=thickness)``. Thinner boxes are filled,
+    so a zero-width or zero-height box is drawn as a line or a dot; nothing is drawn outside
+    a box, whereas PIL's outline spills out of such boxes.
+
+    Args:
+        image (np.ndarray or PIL.Image.Image): A uint8 (H, W), (H, W, 3) or (H, W, 4) frame, or a PIL image.
+        bboxes: An (N, 4) torch tensor (on any device), NumPy array or list of boxes, in pixels.
+        labels (list or str, optional): Labels of the first len(labels) boxes.
+        colors (list or str, optional): Colors cycled over the boxes: names, '#rrggbb' or RGB tuples.
+                                        Defaults to ['b', 'g', 'r', 'm', 'c'] as in `show_bboxes`.
+        is_xyxy (bool, optional): Boxes are (x1, y1, x2, y2) if True, else (x, y, w, h).
+        thickness (int, optional): Line width in pixels, drawn inside the box. Defaults to 2.
+        font_size (int, optional): Label font size in pixels. Defaults to 11.
+        inplace (bool, optional): Draw into the given array instead of a copy (arrays only).
+
+    Returns:
+        np.ndarray or PIL.Image.Image: The annotated frame, of the same type as `image`.
+    """
+    is_pil = isinstance(image, Image.Image)
+    if is_pil:
+        frame = np.array(image.convert('RGBA' if 'A' in image.getbands() else 'RGB'))
+    else:
+        if image.dtype != np.uint8:
+            raise ValueError(f"Expected a uint8 frame, got {image.dtype}")
+        frame = image if inplace else image.copy()
+    work = frame if frame.flags.c_contiguous else np.ascontiguousarray(frame)
+
+    if labels is not None and not isinstance(labels, (list, tuple)):
+        labels = [labels]
+    if colors is None:
+        colors = DEFAULT_COLORS
+    elif isinstance(colors, str) or not isinstance(colors, (list, tuple)) or (
+            len(colors) in (3, 4) and all(isinstance(c, (int, float)) for c in colors)):
+        colors = [colors]
+    rgb = np.array([_to_rgb(c) for c in colors], dtype=np.float64)
+    text_rgb = np.where((rgb @ [0.299, 0.587, 0.114] > 160)[:, None], 0.0, 255.0) * np.ones(3)
+    channels = 1 if work.ndim == 2 else work.shape[2]
+    palette, text_palette = (_fit_channels(p, channels) for p in (rgb, text_rgb))
+
+    boxes = box_convert(as_numpy_boxes(bboxes), "xyxy" if is_xyxy else "xywh", "xyxy")
+    boxes = np.rint(boxes).astype(np.int64)
+    boxes = np.concatenate([np.minimum(boxes[:, :2], boxes[:, 2:]), np.maximum(boxes[:, :2], boxes[:, 2:])], axis=1)
+    color_idx = np.arange(len(boxes)) % len(colors)
+
+    height, width = work.shape[:2]
+    inside = (boxes[:, 2] >= 0) & (boxes[:, 3] >= 0) & (boxes[:, 0] < width) & (boxes[:, 1] < height)
+    if inside.any() and thickness > 0:
+        # One void element per pixel: a scatter of whole pixels is much faster than of (N, C) rows.
+        pixel = np.dtype((np.void, channels))
+        _paint_edges(work.reshape(-1).view(pixel), height, width,
+                     boxes[inside], color_idx[inside], palette.reshape(-1).view(pixel), thickness)
+    if labels:
+        n = min(len(labels), len(boxes))
+        keep = np.flatnonzero(inside[:n])
+        _paint_labels(work, boxes[keep], [labels[i] for i in keep], color_idx[keep],
+                      palette, text_palette, font_size)
+
+    if work is not frame:
+        frame[...] = work
+    return Image.fromarray(frame) if is_pil else frame
+
+
+def _fit_channels(rgb, channels):
+    """Palette rows for a frame with `channels` channels (gray, RGB or RGBA)."""
+    if channels == 1:
+        return np.rint(rgb @ [0.299, 0.587, 0.114]).astype(np.uint8)[:, None]
+    if channels == 4:
+        rgb = np.concatenate([rgb, np.full((len(rgb), 1), 255.0)], axis=1)
+    return rgb.astype(np.uint8)
+
+
+def _draw_bboxes_chunk(task):
+    """Worker entry point: draws ``(frame, bboxes, labels)`` items with the same options."""
+    items, kwargs = task
+    return [draw_bboxes(frame, bboxes, labels, inplace=True, **kwargs) for frame, bboxes, labels in items]
+
+
+def iter_draw_bboxes(frames, bboxes, labels=None, num_workers=1, chunk_size=8, **kwargs):
+    """
+    Annotates a stream of frames (e.g. decoded video) in order.
+
+    With ``num_workers > 1`` chunks of frames are drawn in a process pool; at most
+    ``2 * num_workers`` chunks are in flight, so memory stays bounded for endless streams.
+    Frames are pickled to the workers, so this only pays off when drawing dominates (many
+    boxes or labels per frame); to also decode and encode in parallel, use `draw_bboxes_dir`.
+
+    Args:
+        frames (iterable): uint8 frames (or PIL images).
+        bboxes (iterable): The boxes of each frame.
+        labels (iterable, optional): The labels of each frame.
+        num_workers (int, optional): Number of worker processes. Defaults to 1.
+        chunk_size (int, optional): Frames sent to a worker at a time. Defaults to 8.
+        **kwargs: The options of `draw_bboxes` (except `inplace`).
+
+    Yields:
+        The annotated frames, in input order.
+    """
+    labels = labels if labels is not None else iter(lambda: None, 0)
+    items = zip(frames, map(as_numpy_boxes, bboxes), labels)
+    if num_workers is None or num_workers <= 1:
+        for frame, frame_bboxes, frame_labels in items:
+            yield draw_bboxes(frame, frame_bboxes, frame_labels, **kwargs)
+        return
+
+    def chunks():
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        pending = deque()
+        for chunk in chunks():
+            pending.append(executor.submit(_draw_bboxes_chunk, (chunk, kwargs)))
+            if len(pending) >= 2 * num_workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _draw_bboxes_file(task):
+    """Worker entry point: decodes, annotates and saves one ``(src_path, dst_path, bboxes, labels, kwargs)`` task.
+
+    Returns ``"processed"``, ``"skipped"`` when ``src_path`` could not be opened as an image, or
+    ``"failed"`` when it could not be decoded, annotated or encoded. Errors writing the output
+    are raised.
+    """
+    src_path, dst_path, bboxes, labels, kwargs = task
+    try:
+        img = Image.open(src_path)
+    except Exception:
+        return "skipped"
+    with img:
+        try:
+            frame = np.array(img.convert('RGBA' if 'A' in img.getbands() else 'RGB'))
+            draw_bboxes(frame, bboxes, labels, inplace=True, **kwargs)
+            out = encode_image(Image.fromarray(frame), dst_path)
+        except Exception: # Corrupt image data or an unsupported output extension
+            return "failed"
+    atomic_write(out, dst_path)
+    return "processed"
+
+
+def draw_bboxes_dir(img_dir, annotations, output_dir, num_workers=1, verbose=True, **kwargs):
+    """
+    Annotates the images of a directory and writes the results to `output_dir`.
+
+    Decoding, drawing and encoding run in worker processes, so throughput scales with the
+    number of cores. Every result is written to a temporary file and atomically renamed into
+    place, so an interrupted run never leaves a half-written image behind.
+
+    Args:
+        img_dir (str): The directory containing the images.
+        annotations (dict): Maps file names in `img_dir` to their boxes, or to a dict with
+                            ``"bboxes"`` and optional ``"labels"``. Other files are ignored.
+        output_dir (str): Directory the annotated images are written to (created if missing),
+                          under the same names and formats.
+        num_workers (int, optional): Number of worker processes. 1 processes the images in the
+                                     current process, None uses all CPUs. Defaults to 1.
+        verbose (bool, optional): Show a progress bar and print the run throughput.
+        **kwargs: The options of `draw_bboxes` (except `inplace`).
+
+    Returns:
+        dict: Run summary with the number of ``processed``, ``skipped`` (not readable as images)
+              and ``failed`` (corrupt image data, or not encodable in the output format) files,
+              the elapsed ``seconds`` and the throughput in ``images_per_s``.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    start = time.perf_counter()
+    tasks = []
+    for name in sorted(annotations):
+        ann = annotations[name]
+        boxes, labels = (ann["bboxes"], ann.get("labels")) if isinstance(ann, dict) else (ann, None)
+        tasks.append((os.path.join(img_dir, name), os.path.join(output_dir, name),
+                      as_numpy_boxes(boxes), labels, kwargs))
+
+    counts = {"processed": 0, "skipped": 0, "failed": 0}
+    if num_workers > 1 and len(tasks) > 1:
+        chunksize = max(1, min(64, len(tasks) // (num_workers * 8)))
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = executor.map(_draw_bboxes_file, tasks, chunksize=chunksize)
+            for status in tqdm(results, total=len(tasks), disable=not verbose):
+                counts[status] += 1
+    else:
+        for task in tqdm(tasks, disable=not verbose):
+            counts[_draw_bboxes_file(task)] += 1
+    seconds = time.perf_counter() - start
+
+    summary = dict(counts)
+    summary["seconds"] = seconds
+    summary["images_per_s"] = counts["processed"] / seconds if seconds > 0 else 0.0
+    if verbose:
+        print(
+            f"draw_bboxes_dir: {counts['processed']} images in {seconds:.2f}s "
+            f"({summary['images_per_s']:.1f} images/s, {counts['skipped']} skipped, {counts['failed']} failed)"
+        )
+    return summary
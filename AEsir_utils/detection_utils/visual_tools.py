@@ -1,5 +1,16 @@
+from functools import lru_cache
+
 import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.collections import PathCollection, PolyCollection
+from matplotlib.colors import to_rgba_array
+from matplotlib.path import Path
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D
+
+from .box_ops import as_numpy_boxes, box_convert
 
+__all__ = ["bbox_to_rect", "show_bboxes"]
 
 
 
@@ -18,8 +29,61 @@ def bbox_to_rect(bbox, color, is_xyxy=True):
             xy=(bbox[0], bbox[1]), width=bbox[2], height=bbox[3],
             fill=False, edgecolor=color, linewidth=2)
 
-def show_bboxes(axes, bboxes, labels=None, colors=None, is_xyxy=True):
-    """Show bounding boxes."""
+@lru_cache(maxsize=4096)
+def _label_paths(label, fontsize, pad=4):
+    """The glyph outlines of a label centred on (0, 0) (like ha/va='center') and its background
+    box with `pad` points of padding (the default of a text bbox), both in points."""
+    path = TextPath((0, 0), label, size=fontsize)
+    if len(path.vertices):
+        # Bounds of the control points: cheap, and at most slightly larger than the glyphs.
+        (x0, y0), (x1, y1) = path.vertices.min(axis=0), path.vertices.max(axis=0)
+    else:
+        x0 = y0 = x1 = y1 = 0
+    glyphs = path.transformed(Affine2D().translate(-(x0 + x1) / 2, -(y0 + y1) / 2))
+    hw, hh = (x1 - x0) / 2 + pad, (y1 - y0) / 2 + pad
+    background = Path([(-hw, -hh), (hw, -hh), (hw, hh), (-hw, hh), (-hw, -hh)], closed=True)
+    return glyphs, background
+
+def _draw_labels(axes, anchors, labels, label_colors, text_colors, fontsize):
+    """
+    Draws all labels with two collections: their backgrounds and their glyphs.
+
+    The outlines of each distinct label are built once and placed at every anchor (in
+    data coordinates) by offsets, sized in points like ``axes.text`` with a
+    ``bbox=dict(facecolor=..., lw=0)`` background.
+    """
+    glyph_paths, background_paths = [], []
+    for label in labels:
+        glyphs, background = _label_paths(str(label), fontsize)
+        glyph_paths.append(glyphs)
+        background_paths.append(background)
+
+    points = Affine2D().scale(1 / 72) + axes.figure.dpi_scale_trans
+    for paths, facecolors in ((background_paths, label_colors), (glyph_paths, text_colors)):
+        collection = PathCollection(
+            paths, offsets=anchors, offset_transform=axes.transData, transform=points,
+            facecolors=facecolors, edgecolors='none', linewidths=0, zorder=3, clip_on=False
+        )
+        axes.add_collection(collection, autolim=False)
+
+def show_bboxes(axes, bboxes, labels=None, colors=None, is_xyxy=True, fontsize=6):
+    """
+    Show bounding boxes.
+
+    The boxes are converted to one xyxy NumPy array up front (see `box_ops`) and drawn by a single collection,
+    and the labels by two more, so dense detections take a handful of matplotlib calls.
+
+    Args:
+        axes (matplotlib.axes.Axes): The axes to draw on.
+        bboxes: An (N, 4) torch tensor (on any device), NumPy array or list of boxes.
+        labels (list or str, optional): Labels of the first len(labels) boxes.
+        colors (list or str, optional): Colors cycled over the boxes. Defaults to ['b', 'g', 'r', 'm', 'c'].
+        is_xyxy (bool, optional): Boxes are (x1, y1, x2, y2) if True, else (x, y, w, h).
+        fontsize (float, optional): Label font size in points. Defaults to 6.
+
+    Returns:
+        matplotlib.collections.PolyCollection: The collection of the boxes.
+    """
 
     def make_list(obj, default_values=None):
         if obj is None:
@@ -30,12 +94,18 @@ def show_bboxes(axes, bboxes, labels=None, colors=None, is_xyxy=True):
 
     labels = make_list(labels)
     colors = make_list(colors, ['b', 'g', 'r', 'm', 'c'])
-    for i, bbox in enumerate(bboxes):
-        color = colors[i % len(colors)]
-        rect = bbox_to_rect(bbox.detach().numpy(), color, is_xyxy)
-        axes.add_patch(rect)
-        if labels and len(labels) > i:
-            text_color = 'k' if color == 'w' else 'w'
-            axes.text(rect.xy[0], rect.xy[1]-4, labels[i],
-                      va='center', ha='center', fontsize=6, color=text_color,
-                      bbox=dict(facecolor=color, lw=0))
\ No newline at end of file
+    boxes = box_convert(as_numpy_boxes(bboxes), "xyxy" if is_xyxy else "xywh", "xyxy")
+    x1, y1, x2, y2 = boxes.T
+
+    color_idx = np.arange(len(boxes)) % len(colors)
+    rgba = to_rgba_array(colors)
+    verts = np.stack([np.stack(corner, axis=1) for corner in ((x1, y1), (x2, y1), (x2, y2), (x1, y2))], axis=1)
+    rects = PolyCollection(verts, closed=True, facecolors='none', edgecolors=rgba[color_idx], linewidths=2)
+    axes.add_collection(rects)
+
+    if labels:
+        n = min(len(labels), len(boxes))
+        text_rgba = to_rgba_array(['k' if color == 'w' else 'w' for color in colors])
+        anchors = np.stack([x1[:n], y1[:n] - 4], axis=1)
+        _draw_labels(axes, anchors, labels[:n], rgba[color_idx[:n]], text_rgba[color_idx[:n]], fontsize)
+    return rects
@@ -1,2 +1,13 @@
-from .img_process import *
-from .diffusion_process import *
+from .._lazy import lazy_exports
+
+_EXPORTS = {
+    "img_crop_square": ".img_process",
+    "NoiseSchedule": ".diffusion_process",
+    "get_noise_schedule": ".diffusion_process",
+    "add_diffusion_noise": ".diffusion_process",
+    "iter_image_batches": ".image_pipeline",
+    "ImageShardWriter": ".image_shards",
+    "ImageShardReader": ".image_shards",
+}
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
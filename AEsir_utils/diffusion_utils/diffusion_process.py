@@ -1,43 +1,291 @@
+import functools
+import math
+
 import torch
 from PIL import Image
 import numpy as np
 
-__all__ = ["add_diffusion_noise"]
+__all__ = ["NoiseSchedule", "get_noise_schedule", "add_diffusion_noise"]
+
+# Elements of scaled noise materialised at a time by the NumPy path of `NoiseSchedule.add_noise`.
+NOISE_CHUNK_ELEMS = 1 << 16
+
+
+class NoiseSchedule:
+    """Precomputed forward diffusion noise schedule.
+
+    ``betas[i]`` is the noise rate of step ``i + 1``. The cumulative products
+    are computed once, so that step ``t`` noises a clean input ``x0`` as
+    ``sqrt(alpha_bar[t]) * x0 + sqrt(1 - alpha_bar[t]) * noise`` with
+    ``alpha_bar[0] == 1`` (no noise) and ``t`` in ``[0, max_steps]``.
+
+    Parameters
+    ----------
+    betas : array_like
+        1-D sequence of per-step noise rates in ``[0, 1)``.
+
+    Attributes
+    ----------
+    max_steps : int
+        Number of diffusion steps, ``len(betas)``.
+    alpha_bar, sqrt_alpha_bar, sqrt_one_minus_alpha_bar : ``np.ndarray``
+        ``float64`` tables of length ``max_steps + 1`` indexed by step.
+    """
+
+    def __init__(self, betas):
+        betas = np.asarray(betas, dtype=np.float64)
+        if betas.ndim != 1 or len(betas) == 0:
+            raise ValueError("betas must be a non-empty 1-D sequence")
+        if np.any((betas < 0) | (betas >= 1)):
+            raise ValueError("betas must be within [0, 1)")
+        self.betas = betas
+        self.max_steps = len(betas)
+        self.alpha_bar = np.concatenate([[1.0], np.cumprod(1.0 - betas)])
+        self.sqrt_alpha_bar = np.sqrt(self.alpha_bar)
+        self.sqrt_one_minus_alpha_bar = np.sqrt(1.0 - self.alpha_bar)
+        self._torch_tables = {}
+
+    @classmethod
+    def constant(cls, beta=0.01, max_steps=1000):
+        """Schedule with the same noise rate ``beta`` at every step."""
+        return cls(np.full(max_steps, beta))
+
+    @classmethod
+    def linear(cls, beta_start=1e-4, beta_end=0.02, max_steps=1000):
+        """Schedule with noise rates linearly spaced from ``beta_start`` to ``beta_end`` (DDPM)."""
+        return cls(np.linspace(beta_start, beta_end, max_steps))
+
+    @classmethod
+    def cosine(cls, max_steps=1000, s=0.008, max_beta=0.999):
+        """Cosine schedule of Nichol & Dhariwal, with betas clipped to ``max_beta``."""
+        steps = np.arange(max_steps + 1, dtype=np.float64) / max_steps
+        f = np.cos((steps + s) / (1 + s) * math.pi / 2) ** 2
+        betas = 1.0 - f[1:] / f[:-1]
+        return cls(np.clip(betas, 0.0, max_beta))
+
+    def __repr__(self):
+        return f"{type(self).__name__}(max_steps={self.max_steps})"
+
+    def _check_steps(self, low, high):
+        if low < 0 or high > self.max_steps:
+            raise ValueError(f"noise_step should be between 0 and {self.max_steps}")
+
+    def torch_table(self, device=None, dtype=torch.float32):
+        """Return the ``(2, max_steps + 1)`` tensor of ``sqrt_alpha_bar`` and
+        ``sqrt_one_minus_alpha_bar``, cached per device and dtype."""
+        key = (torch.device(device) if device is not None else torch.device("cpu"), dtype)
+        table = self._torch_tables.get(key)
+        if table is None:
+            table = torch.from_numpy(
+                np.stack([self.sqrt_alpha_bar, self.sqrt_one_minus_alpha_bar])
+            ).to(device=key[0], dtype=dtype)
+            self._torch_tables[key] = table
+        return table
+
+    def add_noise(self, x, t, noise=None, generator=None, out=None, workspace=None):
+        """Noise ``x`` to step ``t``.
+
+        Parameters
+        ----------
+        x : ``torch.Tensor`` or ``np.ndarray``
+            Clean input. With per-sample timesteps the first dimension is the batch.
+            ``uint8`` arrays are treated as images in ``[0, 255]``: they are noised
+            in ``[0, 1]``, clipped and returned as ``uint8``. Float inputs are not
+            clipped.
+        t : int, ``torch.Tensor`` or ``np.ndarray``
+            A single step for the whole input, or a 1-D tensor/array with one step
+            per sample of ``x``.
+        noise : ``torch.Tensor`` or ``np.ndarray``, optional
+            Gaussian noise shaped like ``x``. Drawn from ``generator`` if omitted.
+        generator : int, ``torch.Generator`` or ``np.random.Generator``, optional
+            Random source, or a seed to create one from. If omitted, tensors use the
+            global torch RNG and arrays a generator seeded from the global NumPy RNG,
+            so ``torch.manual_seed``/``np.random.seed`` keep results reproducible.
+        out : ``torch.Tensor`` or ``np.ndarray``, optional
+            Preallocated result with the shape and dtype of ``x``. Must not share
+            memory with ``x``.
+        workspace : ``np.ndarray``, optional
+            ``float32`` scratch buffer shaped like ``x``, reused across calls for
+            ``uint8`` inputs instead of allocating one per call.
+
+        Returns
+        -------
+        ``torch.Tensor`` or ``np.ndarray``
+            Noisy input with the shape and dtype of ``x`` (``out`` if given).
+        """
+        if isinstance(x, np.ndarray):
+            return self._add_noise_numpy(x, t, noise, generator, out, workspace)
+
+        a, b = self._coefficients(x, t)
+        if out is None:
+            out = torch.empty_like(x)
+        if noise is None:
+            torch.randn(x.shape, generator=_torch_generator(generator, x.device),
+                        dtype=x.dtype, device=x.device, out=out)
+            out.mul_(b)
+        else:
+            torch.mul(noise, b, out=out)
+        if torch.is_tensor(a):
+            return out.addcmul_(x, a)
+        return out.add_(x, alpha=a)
 
+    def _coefficients(self, x, t):
+        """Return ``(sqrt_alpha_bar, sqrt_one_minus_alpha_bar)`` for step ``t``: floats
+        for a scalar step, or arrays/tensors broadcastable against the batch ``x``."""
+        if not (torch.is_tensor(t) or isinstance(t, np.ndarray)) or t.ndim == 0:
+            t = _scalar_step(t)
+            self._check_steps(t, t)
+            return float(self.sqrt_alpha_bar[t]), float(self.sqrt_one_minus_alpha_bar[t])
 
-def add_diffusion_noise(image, noise_step, beta=0.01, max_steps=1000):
+        if t.ndim != 1 or len(t) != len(x):
+            raise ValueError(
+                f"per-sample noise_step must have shape ({len(x)},), got {tuple(t.shape)}"
+            )
+        self._check_steps(int(t.min()), int(t.max()))
+        shape = (2, len(x)) + (1,) * (x.ndim - 1)
+        if torch.is_tensor(x):
+            coef = self.torch_table(x.device, x.dtype)[:, torch.as_tensor(t, device=x.device, dtype=torch.long)]
+        else:
+            t = np.asarray(t, dtype=np.intp)
+            coef = np.stack([self.sqrt_alpha_bar[t], self.sqrt_one_minus_alpha_bar[t]])
+            coef = coef.astype(np.float32 if x.dtype == np.uint8 else x.dtype)
+        coef = coef.reshape(shape)
+        return coef[0], coef[1]
+
+    def _add_noise_numpy(self, x, t, noise, generator, out, workspace):
+        if x.dtype == np.uint8:
+            work_dtype = np.float32
+        elif np.issubdtype(x.dtype, np.floating):
+            work_dtype = x.dtype
+        else:
+            raise TypeError(f"Unsupported array dtype: {x.dtype}, expected uint8 or float")
+        if out is None:
+            out = np.empty_like(x)
+        elif out.shape != x.shape or out.dtype != x.dtype:
+            raise ValueError(f"out must have shape {x.shape} and dtype {x.dtype}")
+        if x.dtype != np.uint8:
+            work = out
+        elif workspace is not None:
+            if workspace.shape != x.shape or workspace.dtype != work_dtype:
+                raise ValueError(f"workspace must have shape {x.shape} and dtype {np.dtype(work_dtype)}")
+            work = workspace
+        else:
+            work = np.empty(x.shape, dtype=work_dtype)
+
+        a, b = self._coefficients(x, t)
+        scale = 255.0 if x.dtype == np.uint8 else 1.0
+        np.multiply(x, np.asarray(a, dtype=work.dtype), out=work)
+        # work += b * noise, in chunks of whole samples so the scaled noise never needs a
+        # buffer the size of x. Drawing in chunks yields the same values as a single draw.
+        b = np.asarray(b * scale, dtype=work.dtype)
+        if noise is None:
+            rng = _numpy_generator(generator)
+            draw_dtype = work.dtype if work.dtype in (np.float32, np.float64) else np.float32
+        n_rows = len(work) if work.ndim else 1
+        step = max(1, NOISE_CHUNK_ELEMS * n_rows // max(work.size, 1))
+        for start in range(0, n_rows, step):
+            rows = slice(start, start + step) if work.ndim else Ellipsis
+            chunk = work[rows]
+            if noise is None:
+                term = rng.standard_normal(chunk.shape, dtype=draw_dtype)
+                term *= b[rows] if b.ndim else b
+            else:
+                term = noise[rows] * (b[rows] if b.ndim else b)
+            np.add(chunk, term, out=chunk, casting='same_kind')
+        if work is out:
+            return out
+        np.clip(work, 0.0, 255.0, out=work)
+        np.copyto(out, work, casting='unsafe')
+        return out
+
+
+def _torch_generator(generator, device):
+    if generator is None or isinstance(generator, torch.Generator):
+        return generator
+    return torch.Generator(device=device).manual_seed(int(generator))
+
+
+def _numpy_generator(generator):
+    if isinstance(generator, np.random.Generator):
+        return generator
+    if generator is None:
+        generator = np.random.randint(0, 2**63 - 1, dtype=np.int64)
+    return np.random.default_rng(generator)
+
+
+def _scalar_step(t):
+    if torch.is_tensor(t) or isinstance(t, np.ndarray):
+        t = t.item()
+    if t != int(t):
+        raise ValueError(f"noise_step must be an integer, got {t}")
+    return int(t)
+
+
+@functools.lru_cache(maxsize=None)
+def get_noise_schedule(kind="constant", max_steps=1000, **kwargs):
+    """Return a cached :class:`NoiseSchedule`.
+
+    Parameters
+    ----------
+    kind : {"constant", "linear", "cosine"}
+        Name of the :class:`NoiseSchedule` constructor.
+    max_steps : int, optional
+        Number of diffusion steps. Default ``1000``.
+    **kwargs
+        Extra arguments of the constructor, e.g. ``beta`` for ``"constant"``.
+
+    Returns
+    -------
+    :class:`NoiseSchedule`
+        The same instance for the same arguments, so its tables are built once.
+    """
+    if kind not in ("constant", "linear", "cosine"):
+        raise ValueError(f"Unknown noise schedule: {kind}")
+    return getattr(NoiseSchedule, kind)(max_steps=max_steps, **kwargs)
+
+
+def add_diffusion_noise(image, noise_step, beta=0.01, max_steps=1000, schedule=None,
+                        generator=None, out=None, workspace=None):
     """Add forward diffusion noise to an image.
 
     Parameters
     ----------
-    image : ``torch.Tensor`` or :class:`~PIL.Image.Image`
-        Input image to be noised.
-    noise_step : int
-        Current diffusion step. Must be within ``[0, max_steps]``.
+    image : ``torch.Tensor``, ``np.ndarray`` or :class:`~PIL.Image.Image`
+        Input image to be noised. ``uint8`` arrays (e.g. HWC frames) are noised
+        like PIL images; float arrays and tensors are left unclipped. A tensor or
+        array may be a batch when ``noise_step`` holds one step per sample.
+    noise_step : int, ``torch.Tensor`` or ``np.ndarray``
+        Current diffusion step. Must be within ``[0, max_steps]``. For tensor and
+        array inputs, a 1-D sequence gives the step of each sample along dim 0.
     beta : float, optional
         Noise rate of each step. Default ``0.01``.
     max_steps : int, optional
         Maximum diffusion step. Default ``1000``.
+    schedule : :class:`NoiseSchedule`, optional
+        Schedule to use instead of the constant ``beta`` schedule.
+    generator : int, ``torch.Generator`` or ``np.random.Generator``, optional
+        Random source or seed, see :meth:`NoiseSchedule.add_noise`.
+    out : ``torch.Tensor`` or ``np.ndarray``, optional
+        Preallocated result buffer; for PIL inputs a ``uint8`` array shaped like
+        ``np.asarray(image)``.
+    workspace : ``np.ndarray``, optional
+        Reusable ``float32`` scratch buffer for ``uint8`` and PIL inputs.
 
     Returns
     -------
-    ``torch.Tensor`` or :class:`~PIL.Image.Image`
+    ``torch.Tensor``, ``np.ndarray`` or :class:`~PIL.Image.Image`
         Noisy image with the same type as the input.
     """
-    if noise_step < 0 or noise_step > max_steps:
-        raise ValueError(f"noise_step should be between 0 and {max_steps}")
-
-    alpha_bar = (1.0 - beta) ** noise_step
+    if schedule is None:
+        schedule = get_noise_schedule("constant", max_steps=max_steps, beta=beta)
 
     if isinstance(image, Image.Image):
-        img = np.array(image).astype(np.float32) / 255.0
-        noise = np.random.randn(*img.shape).astype(np.float32)
-        noisy = np.sqrt(alpha_bar) * img + np.sqrt(1 - alpha_bar) * noise
-        noisy = np.clip(noisy, 0.0, 1.0)
-        return Image.fromarray((noisy * 255).astype(np.uint8))
+        noise_step = _scalar_step(noise_step)
+        noisy = schedule.add_noise(np.asarray(image), noise_step, generator=generator,
+                                   out=out, workspace=workspace)
+        return Image.fromarray(noisy)
 
-    if torch.is_tensor(image):
-        noise = torch.randn_like(image)
-        return (alpha_bar ** 0.5) * image + ((1 - alpha_bar) ** 0.5) * noise
+    if torch.is_tensor(image) or isinstance(image, np.ndarray):
+        return schedule.add_noise(image, noise_step, generator=generator, out=out, workspace=workspace)
 
-    raise TypeError("image must be a torch.Tensor or PIL.Image.Image")
+    raise TypeError("image must be a torch.Tensor, np.ndarray or PIL.Image.Image")
@@ -0,0 +1,169 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from .image_shards import is_shard_store_file
+from ..file_io import TMP_PREFIX
+from .img_process import MANIFEST_NAME, _crop_square
+
+__all__ = ["iter_image_batches"]
+
+
+def _load_batch(task):
+    """Worker entry point: decodes, crops and resizes one ``(paths, size, fast_decode)`` batch.
+
+    Returns ``(images, ok)``: a uint8 ``(n, size, size, 3)`` array of the images that could be
+    opened, and a list telling for each path whether it is in `images`.
+    """
+    paths, size, fast_decode = task
+    images = np.empty((len(paths), size, size, 3), dtype=np.uint8)
+    ok = []
+    n = 0
+    for path in paths:
+        try:
+            img = Image.open(path)
+            with img:
+                images[n] = np.asarray(_crop_square(img, size, fast_decode))
+        except Exception:
+            ok.append(False)
+            continue
+        ok.append(True)
+        n += 1
+    return images[:n], ok
+
+
+def _list_images(img_dir):
+    names = []
+    with os.scandir(img_dir) as it:
+        for entry in it:
+            if (entry.name.startswith(TMP_PREFIX) or entry.name == MANIFEST_NAME
+                    or is_shard_store_file(entry.name) or not entry.is_file()):
+                continue
+            names.append(entry.name)
+    names.sort()
+    return names
+
+
+def _draw_steps(rng, noise_steps, n):
+    if isinstance(noise_steps, (tuple, list)):
+        low, high = noise_steps
+        return rng.integers(low, high + 1, size=n)
+    return np.full(n, noise_steps, dtype=np.int64)
+
+
+def iter_image_batches(
+    img_dir,
+    size,
+    batch_size=32,
+    num_workers=None,
+    prefetch=None,
+    noise_steps=None,
+    schedule=None,
+    output="numpy",
+    shuffle=False,
+    epochs=1,
+    seed=None,
+    fast_decode=True,
+    drop_last=False
+):
+    """
+    Streams ready-to-train batches of square images straight from a directory.
+
+    Images are decoded, cropped and resized like `img_crop_square` (without writing any file)
+    by a pool of worker processes, one batch per task. At most `prefetch` batches are in
+    flight, so every core stays busy while memory stays bounded. Each batch is then noised
+    in the calling process with a single vectorized `NoiseSchedule.add_noise` call.
+
+    Args:
+        img_dir (str): The directory containing the images.
+        size (int): Side of the square images.
+        batch_size (int, optional): Images per batch. Defaults to 32.
+        num_workers (int, optional): Worker processes decoding images. None uses all CPUs;
+                                     0 or 1 decodes in the calling process, without prefetch.
+        prefetch (int, optional): Maximum number of batches in flight. Defaults to 2 * num_workers.
+        noise_steps (int or tuple, optional): Diffusion step of every image, or an inclusive
+                                              ``(low, high)`` range to draw one step per image from.
+                                              None disables noising.
+        schedule (NoiseSchedule, optional): Defaults to the schedule of `add_diffusion_noise`.
+        output (str, optional): "numpy" yields uint8 ``(B, size, size, 3)`` arrays, noised like
+                                `add_diffusion_noise` noises uint8 images (clipped). "torch"
+                                yields float32 ``(B, 3, size, size)`` tensors in [0, 1], noised
+                                without clipping. Defaults to "numpy".
+        shuffle (bool, optional): Shuffle the files at every epoch. Defaults to False.
+        epochs (int, optional): Number of passes over the directory. Defaults to 1.
+        seed (int, optional): Seed for shuffling, noise steps and noise. Results only depend on
+                              it, not on `num_workers`.
+        fast_decode (bool, optional): Use JPEG draft mode, see `img_crop_square`. Defaults to True.
+        drop_last (bool, optional): Drop the last batch of an epoch if it is incomplete.
+
+    Yields:
+        dict: ``"names"`` (file names), ``"images"``, and with `noise_steps` also ``"noisy"`` and
+              ``"steps"`` (int64 array or tensor). Files that cannot be opened as images are left
+              out, so a batch may hold fewer than `batch_size` images.
+    """
+    if output not in ("numpy", "torch"):
+        raise ValueError(f"Unknown output: {output}, expected 'numpy' or 'torch'")
+    if noise_steps is not None and schedule is None:
+        from .diffusion_process import get_noise_schedule
+        schedule = get_noise_schedule()
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    if prefetch is None:
+        prefetch = 2 * num_workers
+    # Separate streams: batches are listed ahead of consumption when prefetching.
+    shuffle_rng, rng = (np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(2))
+    names = _list_images(img_dir)
+
+    def batches():
+        for _ in range(epochs):
+            order = shuffle_rng.permutation(len(names)) if shuffle else range(len(names))
+            epoch_names = [names[i] for i in order]
+            for start in range(0, len(epoch_names), batch_size):
+                batch_names = epoch_names[start:start + batch_size]
+                if drop_last and len(batch_names) < batch_size:
+                    break
+                yield batch_names, ([os.path.join(img_dir, n) for n in batch_names], size, fast_decode)
+
+    def finish(batch_names, result):
+        images, ok = result
+        batch = {"names": [n for n, good in zip(batch_names, ok) if good]}
+        steps = _draw_steps(rng, noise_steps, len(images)) if noise_steps is not None else None
+        if output == "torch":
+            import torch
+            images = torch.from_numpy(images).permute(0, 3, 1, 2).float().div_(255)
+            batch["images"] = images
+            if steps is not None:
+                generator = torch.Generator().manual_seed(int(rng.integers(2**63 - 1)))
+                batch["steps"] = torch.from_numpy(steps)
+                batch["noisy"] = schedule.add_noise(images, batch["steps"], generator=generator)
+        else:
+            batch["images"] = images
+            if steps is not None:
+                batch["steps"] = steps
+                batch["noisy"] = schedule.add_noise(images, steps, generator=rng)
+        return batch
+
+    if num_workers <= 1:
+        for batch_names, task in batches():
+            yield finish(batch_names, _load_batch(task))
+        return
+
+    executor = ProcessPoolExecutor(max_workers=num_workers)
+    pending = deque()
+    try:
+        for batch_names, task in batches():
+            pending.append((batch_names, executor.submit(_load_batch, task)))
+            if len(pending) >= prefetch:
+                batch_names, future = pending.popleft()
+                yield finish(batch_names, future.result())
+        while pending:
+            batch_names, future = pending.popleft()
+            yield finish(batch_names, future.result())
+    finally:
+        # Also reached when the consumer stops early: drop the prefetched batches.
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -0,0 +1,214 @@
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+from ..file_io import atomic_write
+
+__all__ = ["ImageShardWriter", "ImageShardReader"]
+
+# A store is a directory holding the index and the shards, raw uint8 files of
+# ``shard_size x size x size x 3`` images each, memory-mapped by readers.
+SHARD_INDEX_NAME = "image_shards.json"
+SHARD_PREFIX = "image_shards-"
+SHARD_SUFFIX = ".u8"
+SHARD_VERSION = 1
+
+
+def _shard_name(k):
+    return f"{SHARD_PREFIX}{k:05d}{SHARD_SUFFIX}"
+
+
+def is_shard_store_file(name):
+    """Whether `name` is one of the files of a shard store (to skip them when listing images)."""
+    return name == SHARD_INDEX_NAME or (name.startswith(SHARD_PREFIX) and name.endswith(SHARD_SUFFIX))
+
+
+def _load_index(path):
+    with open(os.path.join(path, SHARD_INDEX_NAME)) as f:
+        index = json.load(f)
+    if index.get("version") != SHARD_VERSION:
+        raise ValueError(f"Unsupported shard store version: {index.get('version')}")
+    return index
+
+
+class ImageShardWriter:
+    """
+    Writes square uint8 RGB images into fixed-size, memory-mapped shards.
+
+    Opening an existing store appends to it: new images fill the last shard and then new
+    shards, and images added again under an existing name overwrite their slot in place.
+    The index is rewritten atomically by `flush` (and `close`), after the shard data, so an
+    interrupted run leaves the store as of the last flush.
+
+    Args:
+        path (str): The store directory (created if missing).
+        size (int): Side of the images. Must match an existing store.
+        shard_size (int, optional): Images per shard for a new store. Defaults to 1024.
+    """
+
+    def __init__(self, path, size, shard_size=1024):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        if os.path.exists(os.path.join(path, SHARD_INDEX_NAME)):
+            index = _load_index(path)
+            if index["size"] != size:
+                raise ValueError(f"Shard store {path} holds {index['size']}px images, not {size}px")
+            shard_size = index["shard_size"]
+            self.names = index["names"]
+        else:
+            self.names = []
+        self.size = size
+        self.shard_size = shard_size
+        self._positions = {name: i for i, name in enumerate(self.names)}
+        self._shards = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def _shard(self, k):
+        shard = self._shards.get(k)
+        if shard is None:
+            file = os.path.join(self.path, _shard_name(k))
+            shape = (self.shard_size, self.size, self.size, 3)
+            # New shards are created at full size; the unused tail stays sparse on most filesystems.
+            shard = np.memmap(file, dtype=np.uint8, mode='r+' if os.path.exists(file) else 'w+', shape=shape)
+            self._shards[k] = shard
+        return shard
+
+    def add(self, name, image):
+        """
+        Stores one image.
+
+        Args:
+            name (str): Key of the image, e.g. its original file name.
+            image (np.ndarray or PIL.Image.Image): A ``(size, size, 3)`` uint8 image.
+
+        Returns:
+            tuple: ``(shard, offset)`` of the slot the image was written to.
+        """
+        if isinstance(image, Image.Image):
+            image = np.asarray(image.convert('RGB'))
+        if image.shape != (self.size, self.size, 3) or image.dtype != np.uint8:
+            raise ValueError(f"Expected a ({self.size}, {self.size}, 3) uint8 image, got {image.shape} {image.dtype}")
+        i = self._positions.get(name)
+        if i is None:
+            i = self._positions[name] = len(self.names)
+            self.names.append(name)
+        k, offset = divmod(i, self.shard_size)
+        self._shard(k)[offset] = image
+        return k, offset
+
+    def flush(self):
+        """Writes the shard data, then the index."""
+        for shard in self._shards.values():
+            shard.flush()
+        n_shards = -(-len(self.names) // self.shard_size)
+        index = {
+            "version": SHARD_VERSION, "size": self.size, "shard_size": self.shard_size,
+            "count": len(self.names), "shards": [_shard_name(k) for k in range(n_shards)],
+            "names": self.names,
+        }
+        atomic_write(json.dumps(index, separators=(",", ":")).encode("utf-8"), os.path.join(self.path, SHARD_INDEX_NAME))
+
+    def close(self):
+        self.flush()
+        self._shards.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ImageShardReader:
+    """
+    Reads a store written by `ImageShardWriter` (or ``img_crop_square(output_format="shards")``).
+
+    Shards are memory-mapped read-only on first use, so images are zero-copy views and only
+    the pages that are actually touched are read from disk.
+
+    Args:
+        path (str): The store directory.
+
+    Attributes:
+        names (list): The image names, in storage order.
+        size (int): Side of the images.
+    """
+
+    def __init__(self, path):
+        index = _load_index(path)
+        self.path = path
+        self.size = index["size"]
+        self.shard_size = index["shard_size"]
+        self.names = index["names"]
+        self._shard_files = index["shards"]
+        self._positions = None
+        self._shards = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def _shard(self, k):
+        shard = self._shards.get(k)
+        if shard is None:
+            shape = (self.shard_size, self.size, self.size, 3)
+            shard = np.memmap(os.path.join(self.path, self._shard_files[k]), dtype=np.uint8, mode='r', shape=shape)
+            self._shards[k] = shard
+        return shard
+
+    def index_of(self, name):
+        """The position of the image stored under `name`."""
+        if self._positions is None:
+            self._positions = {n: i for i, n in enumerate(self.names)}
+        return self._positions[name]
+
+    def __getitem__(self, key):
+        """
+        ``reader[i]`` or ``reader[name]`` is a zero-copy ``(size, size, 3)`` view. ``reader[a:b]``
+        is a zero-copy ``(n, size, size, 3)`` view if the range lies within one shard, and a
+        copy otherwise (see `iter_batches` for views only).
+        """
+        if isinstance(key, str):
+            key = self.index_of(key)
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return self.get_batch(range(start, stop, step))
+            if start >= stop:
+                return np.empty((0, self.size, self.size, 3), dtype=np.uint8)
+            k, offset = divmod(start, self.shard_size)
+            if (stop - 1) // self.shard_size == k:
+                return self._shard(k)[offset:offset + stop - start]
+            parts = []
+            while start < stop:
+                end = min(stop, (start // self.shard_size + 1) * self.shard_size)
+                parts.append(self[start:end])
+                start = end
+            return np.concatenate(parts)
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(f"image index {key} out of range")
+        k, offset = divmod(key, self.shard_size)
+        return self._shard(k)[offset]
+
+    def get_batch(self, indices):
+        """Copies the images at `indices` (positions or names) into one ``(n, size, size, 3)`` array."""
+        out = np.empty((len(indices), self.size, self.size, 3), dtype=np.uint8)
+        for j, key in enumerate(indices):
+            out[j] = self[key]
+        return out
+
+    def iter_batches(self, batch_size):
+        """Yields zero-copy ``(n, size, size, 3)`` views of consecutive images. Batches do not
+        span shards, so the last batch of each shard may be smaller than `batch_size`."""
+        for start in range(0, len(self), self.shard_size):
+            stop = min(start + self.shard_size, len(self))
+            for b in range(start, stop, batch_size):
+                yield self[b:min(b + batch_size, stop)]
@@ -1,48 +1,351 @@
 from PIL import Image
 import numpy as np
 import argparse
+import hashlib
+import io
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
+# Absolute imports, so that the file still runs as a script.
+from AEsir_utils.file_io import TMP_PREFIX, atomic_write, encode_image
+from AEsir_utils.run_stats import timed
 
+__all__ = ["img_crop_square"]
+
+# JPEG sources are decoded at a reduced DCT scale whenever the reduced image is
+# still at least ``DRAFT_OVERSAMPLE`` times the target size, so the final
+# resize keeps enough resolution to antialias properly.
+DRAFT_OVERSAMPLE = 2
+# Passed as ``reducing_gap`` to ``Image.resize`` so large downscales first use
+# the fast integer ``Image.reduce`` before the resampling filter.
+REDUCING_GAP = 3.0
+# Written to the output directory; records what every output was made from so
+# that reruns only process new or modified images.
+MANIFEST_NAME = ".img_crop_square_manifest.json"
+MANIFEST_VERSION = 2
+
+
+def _crop_square(img, size, fast_decode=True):
+    """Crop ``img`` to a square and resize it to ``size`` x ``size``.
+
+    Portrait images keep their top square, landscape images their centre
+    square. ``img`` must not be loaded yet when ``fast_decode`` is set, so
+    that JPEG draft mode can take effect.
+    """
+    if fast_decode:
+        img.draft('RGB', (size * DRAFT_OVERSAMPLE, size * DRAFT_OVERSAMPLE))
+    img = img.convert('RGB')
+    w, h = img.size
+    if h > w:
+        box = (0, 0, w, w)
+    else:
+        box = ((w - h) / 2, 0, (w + h) / 2, h)
+    return img.resize(
+        (size, size), box=box,
+        reducing_gap=REDUCING_GAP if fast_decode else None
+    )
+
+
+def _file_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _manifest_record(st, digest, size, fast_decode):
+    return {
+        "size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest,
+        "target_size": size, "fast_decode": fast_decode
+    }
+
+
+def _rejected_record(st, status, reason):
+    """Manifest entry of a file that was skipped or failed, so that reruns leave it alone
+    until its size or mtime change."""
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "status": status, "reason": reason}
+
+
+def _crop_square_file(task):
+    """Worker entry point: process one ``(src_path, dst_path, size, fast_decode, known_hash, timing)`` task.
+
+    Returns ``(status, record, image, info)``. ``status`` is ``"processed"``, ``"unchanged"``
+    when the content hash still equals ``known_hash`` and the output exists, ``"skipped"``
+    when ``src_path`` could not be read or opened as an image, or ``"failed"`` when it could
+    not be decoded or encoded. ``record`` is the manifest entry for the file (a
+    `_rejected_record` when it was skipped or failed), or None when it could not be read.
+    With ``dst_path`` None nothing is written and ``image`` is the processed uint8 array
+    (for a shard store), otherwise it is None. ``info`` holds the ``reason`` of a skipped
+    or failed file and, with ``timing``, the seconds spent in the ``read``, ``decode``, ``encode``
+    and ``write`` phases and the ``bytes_read`` / ``bytes_written``; otherwise it is None.
+    """
+    src_path, dst_path, size, fast_decode, known_hash, timing = task
+    info = {} if timing else None
+
+    def done(status, record=None, image=None, reason=None):
+        if status in ("skipped", "failed") and st is not None:
+            record = _rejected_record(st, status, reason)
+        if reason is not None:
+            if info is None:
+                return status, record, image, {"reason": reason}
+            info["reason"] = reason
+        return status, record, image, info
+
+    st = None
+    t0 = time.perf_counter()
+    try:
+        with open(src_path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            data = f.read()
+    except OSError as e:
+        return done("skipped", reason=f"unreadable: {type(e).__name__}: {e}")
+    digest = _file_hash(data)
+    if timing:
+        info["read"] = time.perf_counter() - t0
+        info["bytes_read"] = len(data)
+    if digest == known_hash and (dst_path is None or os.path.exists(dst_path)):
+        return done("unchanged", _manifest_record(st, digest, size, fast_decode))
+
+    t0 = time.perf_counter()
+    try:
+        img = Image.open(io.BytesIO(data))
+    except Exception as e:
+        return done("skipped", reason=f"not an image: {type(e).__name__}: {e}")
+    with img:
+        # Image.open only parses the header; the pixel data is decoded here, so truncated or
+        # corrupt files (and decompression bombs) fail this one file, not the whole run.
+        try:
+            cropped = _crop_square(img, size, fast_decode)
+        except Exception as e:
+            return done("failed", reason=f"{type(e).__name__}: {e}")
+        if timing:
+            info["decode"] = time.perf_counter() - t0
+        if dst_path is None:
+            return done("processed", _manifest_record(st, digest, size, fast_decode), np.asarray(cropped))
+        t0 = time.perf_counter()
+        try:
+            out = encode_image(cropped, dst_path)
+        except Exception as e:
+            return done("failed", reason=f"{type(e).__name__}: {e}")
+    if timing:
+        t1 = time.perf_counter()
+        info["encode"] = t1 - t0
+    atomic_write(out, dst_path)
+    if timing:
+        info["write"] = time.perf_counter() - t1
+        info["bytes_written"] = len(out)
+    if dst_path == src_path:
+        # In place, the manifest describes the file now on disk: the output.
+        return done("processed", _manifest_record(os.stat(dst_path), _file_hash(out), size, fast_decode))
+    return done("processed", _manifest_record(st, digest, size, fast_decode))
+
+
+def _record_file_stats(stats, name, status, info):
+    """Adds the ``info`` of one `_crop_square_file` result to `stats`."""
+    stats.count(status)
+    if info is None:
+        return
+    for phase in ("read", "decode", "encode", "write"):
+        if phase in info:
+            stats.add_time(phase, info[phase])
+    for key in ("bytes_read", "bytes_written"):
+        if key in info:
+            stats.count(key, info[key])
+    if "reason" in info:
+        (stats.fail if status == "failed" else stats.skip)(name, info["reason"])
+
+
+def _load_manifest(manifest_path, img_dir):
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("img_dir") != img_dir:
+        return {}
+    return manifest.get("entries", {})
+
+
+def _save_manifest(manifest_path, img_dir, entries):
+    data = json.dumps(
+        {"version": MANIFEST_VERSION, "img_dir": img_dir, "entries": entries},
+        separators=(",", ":")
+    )
+    atomic_write(data.encode("utf-8"), manifest_path)
 
 
 def img_crop_square(
     img_dir,
-    size
+    size,
+    output_dir=None,
+    num_workers=1,
+    fast_decode=True,
+    incremental=True,
+    verbose=True,
+    output_format="files",
+    shard_size=1024,
+    stats=None
 ):
     """
     Crops all images in the specified directory into square images and resizes them.
 
     This function iterates through each image file in the given directory, crops the image
     to a square by removing the longer dimension, and then resizes it to the specified size.
-    The processed images overwrite the original images in the directory.
+    Every result is written to a temporary file and atomically renamed into place, so an
+    interrupted run never leaves a half-written image behind.
+
+    With `incremental` enabled, a manifest (`MANIFEST_NAME`) in the output directory records
+    the size, mtime and content hash of every processed file together with the target size
+    and `fast_decode`. A rerun with the same settings skips files whose size and mtime are
+    unchanged without reading them, and files whose stat changed but whose content hash did
+    not are only re-hashed, not re-encoded. Skipped and failed files are recorded too, and
+    are reported again without being reopened until their size or mtime change.
 
     Args:
         img_dir (str): The directory containing the images to be processed.
         size (int): The desired size to which the cropped square images will be resized.
+        output_dir (str, optional): Directory to write the results to (created if missing).
+                                    If None, the original images in `img_dir` are overwritten.
+        num_workers (int, optional): Number of worker processes. 1 processes the images in the
+                                     current process, None uses all CPUs. Defaults to 1.
+        fast_decode (bool, optional): Decode JPEGs at a reduced scale (PIL draft mode) and
+                                      reduce before resampling when the target size is much
+                                      smaller than the source. Defaults to True.
+        incremental (bool, optional): Read and update the manifest so that only new or
+                                      modified images are processed. Defaults to True.
+        verbose (bool, optional): Show a progress bar and print the run throughput.
+        output_format (str, optional): "files" writes one re-encoded image per source image.
+                                       "shards" packs the raw uint8 pixels into memory-mapped
+                                       shards in `output_dir`, read back with `ImageShardReader`
+                                       without any decoding. An existing store is appended to,
+                                       and changed images overwrite their slot. Defaults to "files".
+        shard_size (int, optional): Images per shard of a new store. Defaults to 1024.
+        stats (RunStats, optional): Collects the ``walk`` (listing and manifest lookup),
+                                    ``read``, ``decode``, ``encode``, ``write`` and ``manifest``
+                                    phase times (the per-file phases summed over the workers),
+                                    the per-status file counts, ``bytes_read`` and ``bytes_written``,
+                                    and every skipped or failed file with its reason.
+
+    Returns:
+        dict: Run summary with the number of ``processed``, ``unchanged``, ``skipped`` (not
+              readable as images) and ``failed`` (corrupt image data, or not encodable in the
+              output format) files, the elapsed ``seconds`` and the throughput in ``images_per_s``.
 
     Raises:
-        PIL.UnidentifiedImageError: If an image file cannot be identified and opened.
         OSError: If an image file cannot be saved.
     """
-    for file_name in tqdm(os.listdir(img_dir)):
-        try:
-            img = Image.open(os.path.join(img_dir, file_name)).convert('RGB')
-        except:
-            continue
-        # img = Image.open(os.path.join(img_dir, file_name))
-        w, h = img.size
-        if h>w:
-            img = img.crop([0, 0, w, w])
+    from AEsir_utils.diffusion_utils.image_shards import ImageShardWriter, is_shard_store_file
+
+    if output_format not in ("files", "shards"):
+        raise ValueError(f"Unknown output_format: {output_format}, expected 'files' or 'shards'")
+    if output_dir is None:
+        output_dir = img_dir
+    os.makedirs(output_dir, exist_ok=True)
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    store = ImageShardWriter(output_dir, size, shard_size) if output_format == "shards" else None
+    in_place = store is None and os.path.realpath(output_dir) == os.path.realpath(img_dir)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    source_key = os.path.realpath(img_dir)
+
+    start = time.perf_counter()
+    with timed(stats, "walk"):
+        old_entries = _load_manifest(manifest_path, source_key) if incremental else {}
+        if store is not None:
+            outputs = set(store.names)
         else:
-            img = img.crop([(w-h)/2, 0, (w+h)/2, h])
-        img = img.resize((size, size))
-        img.save(os.path.join(img_dir, file_name))
-        
+            outputs = None if in_place else set(os.listdir(output_dir))
+        entries = {}
+        rejected = []
+        tasks = []
+        with os.scandir(img_dir) as it:
+            for entry in it:
+                name = entry.name
+                if (name.startswith(TMP_PREFIX) or name == MANIFEST_NAME or is_shard_store_file(name)
+                        or not entry.is_file()):
+                    continue
+                record = old_entries.get(name)
+                known_hash = None
+                if record is not None:
+                    st = entry.stat()
+                    same_stat = record["size"] == st.st_size and record["mtime_ns"] == st.st_mtime_ns
+                    if "status" in record:
+                        if same_stat:
+                            entries[name] = record
+                            rejected.append((name, record["status"], record["reason"]))
+                            continue
+                    elif (record["target_size"] == size and record["fast_decode"] == fast_decode
+                            and (outputs is None or name in outputs)):
+                        if same_stat:
+                            entries[name] = record
+                            continue
+                        known_hash = record["hash"]
+                dst_path = os.path.join(output_dir, name) if store is None else None
+                tasks.append((entry.path, dst_path, size, fast_decode, known_hash, stats is not None))
+        tasks.sort()
+
+    counts = {"processed": 0, "unchanged": len(entries) - len(rejected), "skipped": 0, "failed": 0}
+    if stats is not None:
+        stats.count("unchanged", counts["unchanged"])
+    for name, status, reason in rejected:
+        counts[status] += 1
+        if stats is not None:
+            _record_file_stats(stats, name, status, {"reason": reason})
+
+    def collect(task, status, record, image, info):
+        name = os.path.basename(task[0])
+        counts[status] += 1
+        if image is not None:
+            store.add(name, image)
+        if record is not None:
+            entries[name] = record
+        if stats is not None:
+            _record_file_stats(stats, name, status, info)
+
+    try:
+        if num_workers > 1 and len(tasks) > 1:
+            chunksize = max(1, min(64, len(tasks) // (num_workers * 8)))
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                results = executor.map(_crop_square_file, tasks, chunksize=chunksize)
+                for task, result in zip(tasks, tqdm(results, total=len(tasks), disable=not verbose)):
+                    collect(task, *result)
+        else:
+            for task in tqdm(tasks, disable=not verbose):
+                collect(task, *_crop_square_file(task))
+    finally:
+        # The store index is written before the manifest that refers to its images.
+        with timed(stats, "manifest"):
+            if store is not None:
+                store.close()
+            if incremental:
+                _save_manifest(manifest_path, source_key, entries)
+    seconds = time.perf_counter() - start
+
+    summary = dict(counts)
+    summary["seconds"] = seconds
+    summary["images_per_s"] = counts["processed"] / seconds if seconds > 0 else 0.0
+    if verbose:
+        print(
+            f"img_crop_square: {counts['processed']} images in {seconds:.2f}s "
+            f"({summary['images_per_s']:.1f} images/s, {counts['unchanged']} unchanged, "
+            f"{counts['skipped']} skipped, {counts['failed']} failed)"
+        )
+    return summary
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--img_dir', type=str, default=None)
     parser.add_argument('--size', type=int, default=512)
+    parser.add_argument('--output_dir', type=str, default=None)
+    parser.add_argument('--num_workers', type=int, default=1)
+    parser.add_argument('--no_fast_decode', action='store_true')
+    parser.add_argument('--full', action='store_true', help='ignore the manifest and process every image')
+    parser.add_argument('--output_format', type=str, default="files", choices=["files", "shards"])
+    parser.add_argument('--shard_size', type=int, default=1024)
     args = parser.parse_args()
-    img_crop_square(args.img_dir, args.size)
\ No newline at end of file
+    img_crop_square(
+        args.img_dir, args.size, output_dir=args.output_dir,
+        num_workers=args.num_workers, fast_decode=not args.no_fast_decode,
+        incremental=not args.full, output_format=args.output_format,
+        shard_size=args.shard_size
+    )
@@ -0,0 +1,50 @@
+import io
+import os
+import tempfile
+
+from PIL import Image
+
+__all__ = ["TMP_PREFIX", "atomic_write", "encode_image"]
+
+# Prefix of the temporary files of `atomic_write`; directory walkers skip such names.
+TMP_PREFIX = ".img_crop_square-"
+
+
+def atomic_write(data, dst_path, prefix=TMP_PREFIX):
+    """
+    Writes `data` to a temporary file next to `dst_path` and renames it into place, so that
+    readers (and an interrupted run) never see a half-written file.
+
+    Args:
+        data (bytes): The file content.
+        dst_path (str): The destination path; its directory must exist.
+        prefix (str, optional): Name prefix of the temporary file. Defaults to `TMP_PREFIX`.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dst_path), prefix=prefix)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, dst_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def encode_image(img, file_name):
+    """
+    Encodes a PIL image in the format implied by the extension of `file_name`.
+
+    Returns:
+        bytes: The encoded image.
+
+    Raises:
+        ValueError: If the extension is not a format PIL can write.
+    """
+    ext = os.path.splitext(file_name)[1].lower()
+    fmt = Image.registered_extensions().get(ext)
+    if fmt is None:
+        raise ValueError(f"unknown file extension: {ext}")
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    return buf.getvalue()
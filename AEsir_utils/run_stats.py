@@ -0,0 +1,187 @@
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+__all__ = ["RunStats"]
+
+_NULL_PHASE = nullcontext()
+
+
+def timed(stats, phase):
+    """``stats.phase(phase)``, or a shared no-op context when `stats` is None."""
+    return _NULL_PHASE if stats is None else stats.phase(phase)
+
+
+def _reason_kind(reason):
+    """``(kind, text)`` of a reason: an exception is tallied by its type, a ``"kind: detail"``
+    string by the part before the first colon."""
+    if isinstance(reason, BaseException):
+        return type(reason).__name__, f"{type(reason).__name__}: {reason}"
+    text = str(reason)
+    return text.split(":", 1)[0], text
+
+
+class RunStats:
+    """
+    Opt-in run statistics for the batch utilities (`generate_proj_prompt_2`, `tree_to_string`,
+    `img_crop_square`, `get_ckpt_structure`, ...), passed as their ``stats`` argument.
+
+    Functions called without one skip all bookkeeping. With one, they report the wall time of
+    their phases (walk, stat, read, decode, encode, write, format, ...), counters such as files
+    and bytes processed, and every skipped or failed item with its reason. Phases that run in
+    threads or worker processes are summed over them, so they can exceed the elapsed time.
+    The same object can be passed to several calls to accumulate them.
+
+    Args:
+        callback (callable, optional): Called as ``callback(event, name, value)`` for every
+                                       ``"phase"`` (name, seconds), ``"count"`` (name, n),
+                                       ``"skip"`` and ``"fail"`` (item, reason) event, e.g.
+                                       to feed a live dashboard.
+        track_memory (bool, optional): Trace Python allocations with `tracemalloc` to report
+                                       their peak during the run. Slows allocation-heavy code
+                                       down, so off by default. If tracing is already on before
+                                       Python 3.9, where its peak cannot be reset, the peak is
+                                       only reported when the run exceeds the earlier one.
+        max_items (int, optional): Skipped and failed items kept with their reason, each.
+                                   Per-reason totals are always complete. Defaults to 1000.
+
+    Attributes:
+        phases (dict): Phase name -> ``{"seconds", "calls"}``.
+        counts (dict): Counter name -> value.
+        skipped (list), failed (list): ``{"item", "reason"}`` records.
+        skip_reasons (dict), fail_reasons (dict): Reason kind -> count. The kind of an
+                                                  exception is its type, that of a
+                                                  ``"kind: detail"`` string its first part.
+    """
+
+    def __init__(self, callback=None, track_memory=False, max_items=1000):
+        self.callback = callback
+        self.max_items = max_items
+        self.phases = {}
+        self.counts = {}
+        self.skipped = []
+        self.failed = []
+        self.skip_reasons = {}
+        self.fail_reasons = {}
+        self._lock = threading.Lock()
+        self._traced_peak = None
+        self._peak_offset = None
+        self._tracing = False
+        if track_memory:
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                if hasattr(tracemalloc, "reset_peak"): # Python 3.9+
+                    tracemalloc.reset_peak()
+                else:
+                    # The peak since tracing started; exceeding it means a new peak in this run.
+                    self._peak_offset = tracemalloc.get_traced_memory()[1]
+            else:
+                tracemalloc.start()
+                self._tracing = True
+        self._track_memory = track_memory
+
+    def add_time(self, phase, seconds, calls=1):
+        """Adds `seconds` (measured by the caller, e.g. in a worker process) to `phase`."""
+        with self._lock:
+            entry = self.phases.get(phase)
+            if entry is None:
+                entry = self.phases[phase] = {"seconds": 0.0, "calls": 0}
+            entry["seconds"] += seconds
+            entry["calls"] += calls
+        if self.callback is not None:
+            self.callback("phase", phase, seconds)
+
+    @contextmanager
+    def phase(self, name):
+        """Times the ``with`` block as one call of phase `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+        if self.callback is not None:
+            self.callback("count", name, n)
+
+    def _record(self, items, tally, event, item, reason):
+        kind, text = _reason_kind(reason)
+        with self._lock:
+            tally[kind] = tally.get(kind, 0) + 1
+            if len(items) < self.max_items:
+                items.append({"item": str(item), "reason": text})
+        if self.callback is not None:
+            self.callback(event, item, text)
+
+    def skip(self, item, reason):
+        """Records an item deliberately left out (too large, binary, over budget, ...)."""
+        self._record(self.skipped, self.skip_reasons, "skip", item, reason)
+
+    def fail(self, item, reason):
+        """Records an item that could not be processed. `reason` may be the exception."""
+        self._record(self.failed, self.fail_reasons, "fail", item, reason)
+
+    def peak_memory(self):
+        """
+        Returns:
+            dict: ``peak_rss_bytes`` of this process and ``peak_rss_children_bytes`` of its
+                  finished worker processes (both since they started, None where unsupported),
+                  and with `track_memory` the ``peak_traced_bytes`` of Python allocations
+                  (None when unknown).
+        """
+        peaks = {"peak_rss_bytes": None, "peak_rss_children_bytes": None}
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux, in bytes on macOS.
+            scale = 1 if sys.platform == "darwin" else 1024
+            peaks["peak_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+            peaks["peak_rss_children_bytes"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+        if self._track_memory:
+            peak = self._traced_peak
+            if peak is None:
+                import tracemalloc
+                peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+            if peak is not None and self._peak_offset is not None and peak <= self._peak_offset:
+                peak = None # The run never exceeded the earlier peak, so its own is unknown.
+            peaks["peak_traced_bytes"] = peak
+        return peaks
+
+    def stop(self):
+        """Stops the allocation tracing started by `track_memory`, keeping its peak."""
+        if self._tracing:
+            import tracemalloc
+            self._traced_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self._tracing = False
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "phases": {k: dict(v) for k, v in self.phases.items()},
+                "counts": dict(self.counts),
+                "skipped": list(self.skipped),
+                "failed": list(self.failed),
+                "skip_reasons": dict(self.skip_reasons),
+                "fail_reasons": dict(self.fail_reasons),
+                "memory": self.peak_memory(),
+            }
+
+    def to_json(self, path=None, indent=2):
+        """Returns the statistics as a JSON string, also written to `path` if given."""
+        text = json.dumps(self.to_dict(), indent=indent)
+        if path is not None:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return text
+
+    def __repr__(self):
+        phases = ", ".join(f"{k}={v['seconds']:.3f}s" for k, v in self.phases.items())
+        return f"RunStats({phases}, counts={self.counts}, skipped={sum(self.skip_reasons.values())}, failed={sum(self.fail_reasons.values())})"
@@ -0,0 +1,74 @@
+"""Latency and peak memory of ``add_diffusion_noise`` per 4K frame.
+
+Compares the previous PIL implementation with the PIL and ``np.ndarray``
+paths, the latter with and without preallocated ``out``/``workspace`` buffers.
+Peak memory is measured with ``tracemalloc``, which NumPy reports to.
+
+    pip install -e . && python benchmarks/bench_diffusion_noise.py --repeat 10
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from AEsir_utils.diffusion_utils import add_diffusion_noise
+
+
+def legacy_add_diffusion_noise(image, noise_step, beta=0.01):
+    """The PIL path of ``add_diffusion_noise`` before the NumPy fast path."""
+    alpha_bar = (1.0 - beta) ** noise_step
+    img = np.array(image).astype(np.float32) / 255.0
+    noise = np.random.randn(*img.shape).astype(np.float32)
+    noisy = np.sqrt(alpha_bar) * img + np.sqrt(1 - alpha_bar) * noise
+    noisy = np.clip(noisy, 0.0, 1.0)
+    return Image.fromarray((noisy * 255).astype(np.uint8))
+
+
+def measure(fn, repeat):
+    """Return ``(median latency in ms, peak traced memory in MiB)`` of ``fn()``."""
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return float(np.median(times)) * 1e3, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--height', type=int, default=2160)
+    parser.add_argument('--width', type=int, default=3840)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--step', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    pil_frame = Image.fromarray(frame)
+    out = np.empty_like(frame)
+    workspace = np.empty(frame.shape, dtype=np.float32)
+    gen = np.random.default_rng(0)
+
+    cases = [
+        ("legacy PIL", lambda: legacy_add_diffusion_noise(pil_frame, args.step)),
+        ("PIL", lambda: add_diffusion_noise(pil_frame, args.step, generator=gen)),
+        ("ndarray", lambda: add_diffusion_noise(frame, args.step, generator=gen)),
+        ("ndarray + out/workspace", lambda: add_diffusion_noise(
+            frame, args.step, generator=gen, out=out, workspace=workspace)),
+    ]
+    print(f"{args.width}x{args.height}x3 uint8 frame, noise_step={args.step}")
+    print(f"{'path':<26}{'latency (ms)':>14}{'peak (MiB)':>12}")
+    for name, fn in cases:
+        latency, peak = measure(fn, args.repeat)
+        print(f"{name:<26}{latency:>14.1f}{peak:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Cold import time regression check for the lightweight tools.
+
+Each statement is imported in a fresh interpreter. The script fails (exit
+status 1) if the median import time, over the bare interpreter startup, exceeds
+its budget, or if a heavy dependency was loaded along the way.
+
+    pip install -e . && python benchmarks/bench_import_time.py --budget-ms 50
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ("torch", "numpy", "PIL", "matplotlib", "safetensors")
+
+CASES = [
+    "from AEsir_utils.data_utils import generate_proj_prompt_2, display_tree",
+    "from AEsir_utils.data_utils import tree_to_string",
+    "import AEsir_utils.diffusion_utils, AEsir_utils.detection_utils",
+]
+
+CHECK = (
+    "import sys\n"
+    "{stmt}\n"
+    "loaded = [m for m in {heavy!r} if m in sys.modules]\n"
+    "if loaded:\n"
+    "    sys.exit('heavy modules loaded: ' + ', '.join(loaded))\n"
+)
+
+
+def time_python(code, repeat):
+    """Median wall time in ms of running ``code`` in a fresh interpreter."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        times.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip())
+    return statistics.median(times) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget-ms', type=float, default=50.0)
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args()
+
+    baseline = time_python("pass", args.repeat)
+    print(f"interpreter startup: {baseline:.1f} ms, budget: {args.budget_ms:.1f} ms")
+    failed = False
+    for stmt in CASES:
+        try:
+            elapsed = time_python(CHECK.format(stmt=stmt, heavy=HEAVY_MODULES), args.repeat) - baseline
+        except RuntimeError as e:
+            print(f"FAIL  {stmt}\n      {e}")
+            failed = True
+            continue
+        ok = elapsed <= args.budget_ms
+        failed |= not ok
+        print(f"{'ok  ' if ok else 'FAIL'}  {elapsed:7.1f} ms  {stmt}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,457 @@
+"""Latency and peak memory of the hot paths of AEsir_utils, compared to a baseline.
+
+Synthetic fixtures (see ``fixtures.py``) are built once per preset and reused.
+Every case then runs in a fresh interpreter, so that its peak RSS is its own and
+no cache is shared between cases: one warm-up call, ``--repeat`` timed calls and
+one call under ``tracemalloc``. Everything runs offline and on the CPU.
+Peak RSS includes the pages of memory-mapped files, so readers that map a
+checkpoint report (reclaimable) memory up to the size of the data they touch.
+
+    pip install -e . && python benchmarks/bench_suite.py --preset smoke
+    python benchmarks/bench_suite.py --save-baseline benchmarks/baseline-default.json
+    python benchmarks/bench_suite.py --output results.json   # compares to the baseline
+
+The results (and baselines) are JSON: ``meta`` describes the machine and the
+versions, ``results`` maps each case to its latencies and memory peaks. With a
+baseline, cases slower or hungrier than ``--threshold`` are reported and the
+script exits with status 1.
+"""
+import argparse
+import contextlib
+import datetime
+import fnmatch
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fixtures import PRESETS, ensure_fixtures  # noqa: E402
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+CASES = {}
+
+# Differences below these are measurement noise, whatever the ratio.
+MIN_TIME_DIFF_S = 0.002
+MIN_MEMORY_DIFF_MB = 8.0
+
+
+def case(name):
+    """Registers ``make(fx, scratch)``, which does the untimed setup of a case and returns
+    ``run()``, or ``(setup, run)`` when every call needs fresh state: ``run(setup())``."""
+    def register(make):
+        CASES[name] = make
+        return make
+    return register
+
+
+@contextlib.contextmanager
+def _devnull_stdout():
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+@case("tree_to_string")
+def _(fx, scratch):
+    from AEsir_utils.data_utils import tree_to_string
+    return lambda: tree_to_string(fx["tree"])
+
+
+@case("tree_to_string[ignore_dirs]")
+def _(fx, scratch):
+    from AEsir_utils.data_utils import tree_to_string
+    return lambda: tree_to_string(fx["tree"], ignore_dirs=["node_modules", "__pycache__"])
+
+
+@case("generate_proj_prompt")
+def _(fx, scratch):
+    from AEsir_utils.data_utils import generate_proj_prompt
+    return lambda: generate_proj_prompt(fx["tree"])
+
+
+@case("generate_proj_prompt_2")
+def _(fx, scratch):
+    from AEsir_utils.data_utils import generate_proj_prompt_2
+    return lambda: generate_proj_prompt_2(fx["tree"])
+
+
+@case("generate_proj_prompt_2[max_tokens]")
+def _(fx, scratch):
+    from AEsir_utils.data_utils import generate_proj_prompt_2
+    return lambda: generate_proj_prompt_2(fx["tree"], max_tokens=100_000)
+
+
+@case("generate_proj_prompt_2[warm cache]")
+def _(fx, scratch):
+    from AEsir_utils.data_utils import PromptCache, generate_proj_prompt_2
+    cache = PromptCache(os.path.join(scratch, "prompt_cache.sqlite"))
+    generate_proj_prompt_2(fx["tree"], cache=cache)
+    return lambda: generate_proj_prompt_2(fx["tree"], cache=cache)
+
+
+def _fresh_dir(scratch):
+    return tempfile.mkdtemp(dir=scratch)
+
+
+@case("img_crop_square")
+def _(fx, scratch):
+    from AEsir_utils.diffusion_utils import img_crop_square
+    return (lambda: _fresh_dir(scratch),
+            lambda out: img_crop_square(fx["jpegs"], 512, output_dir=out, incremental=False, verbose=False))
+
+
+@case("img_crop_square[all cpus]")
+def _(fx, scratch):
+    from AEsir_utils.diffusion_utils import img_crop_square
+    return (lambda: _fresh_dir(scratch),
+            lambda out: img_crop_square(fx["jpegs"], 512, output_dir=out, num_workers=None,
+                                        incremental=False, verbose=False))
+
+
+@case("img_crop_square[shards]")
+def _(fx, scratch):
+    from AEsir_utils.diffusion_utils import img_crop_square
+    return (lambda: _fresh_dir(scratch),
+            lambda out: img_crop_square(fx["jpegs"], 512, output_dir=out, incremental=False,
+                                        verbose=False, output_format="shards"))
+
+
+@case("img_crop_square[unchanged rerun]")
+def _(fx, scratch):
+    from AEsir_utils.diffusion_utils import img_crop_square
+    out = _fresh_dir(scratch)
+    img_crop_square(fx["jpegs"], 512, output_dir=out, verbose=False)
+    return lambda: img_crop_square(fx["jpegs"], 512, output_dir=out, verbose=False)
+
+
+@case("add_diffusion_noise[uint8 frame]")
+def _(fx, scratch):
+    import numpy as np
+    from AEsir_utils.diffusion_utils import add_diffusion_noise
+    size = fx["spec"]["frame"]
+    frame = np.random.default_rng(0).integers(0, 256, (size["height"], size["width"], 3), dtype=np.uint8)
+    gen = np.random.default_rng(0)
+    return lambda: add_diffusion_noise(frame, 200, generator=gen)
+
+
+@case("add_diffusion_noise[torch batch]")
+def _(fx, scratch):
+    import torch
+    from AEsir_utils.diffusion_utils import add_diffusion_noise
+    batch = torch.rand(16, 3, 512, 512, generator=torch.Generator().manual_seed(0))
+    steps = torch.arange(16) * 50
+    gen = torch.Generator().manual_seed(0)
+    return lambda: add_diffusion_noise(batch, steps, generator=gen)
+
+
+@case("get_ckpt_structure[safetensors]")
+def _(fx, scratch):
+    from AEsir_utils.data_utils import get_ckpt_structure
+    return lambda: get_ckpt_structure(fx["safetensors"])
+
+
+@case("get_ckpt_structure[torch]")
+def _(fx, scratch):
+    import torch  # noqa: F401  Imported here so that its own RSS is not measured.
+    from AEsir_utils.data_utils import get_ckpt_structure
+    return lambda: get_ckpt_structure(fx["torch_ckpt"])
+
+
+@case("diff_ckpt")
+def _(fx, scratch):
+    import torch  # noqa: F401
+    from AEsir_utils.data_utils import diff_ckpt
+    return lambda: diff_ckpt(fx["safetensors"], fx["torch_ckpt"])
+
+
+@case("print_json_structure[loaded]")
+def _(fx, scratch):
+    from AEsir_utils.data_utils import print_json_structure
+    with open(fx["json"]) as f:
+        data = json.load(f)
+
+    def run():
+        with _devnull_stdout():
+            print_json_structure(data)
+    return run
+
+
+@case("print_json_structure[json stream]")
+def _(fx, scratch):
+    from AEsir_utils.data_utils import print_json_structure
+
+    def run():
+        with _devnull_stdout():
+            print_json_structure(fx["json"], stream=True)
+    return run
+
+
+@case("print_json_structure[jsonl]")
+def _(fx, scratch):
+    from AEsir_utils.data_utils import print_json_structure
+
+    def run():
+        with _devnull_stdout():
+            print_json_structure(fx["jsonl"])
+    return run
+
+
+def _load_bboxes(fx):
+    import numpy as np
+    with np.load(fx["bboxes"]) as data:
+        return {k: data[k] for k in data.files}
+
+
+@case("show_bboxes")
+def _(fx, scratch):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from AEsir_utils.detection_utils import show_bboxes
+    data = _load_bboxes(fx)
+    labels = [f"cls{c}" for c in data["classes"]]
+    h, w = data["size"]
+
+    def setup():
+        plt.close("all")
+        fig, axes = plt.subplots(figsize=(w / 100, h / 100), dpi=100)
+        axes.set_xlim(0, w)
+        axes.set_ylim(h, 0)
+        return fig, axes
+
+    def run(state):
+        fig, axes = state
+        show_bboxes(axes, data["boxes"], labels)
+        fig.canvas.draw()
+    return setup, run
+
+
+@case("draw_bboxes")
+def _(fx, scratch):
+    import numpy as np
+    from AEsir_utils.detection_utils import draw_bboxes
+    data = _load_bboxes(fx)
+    h, w = data["size"]
+    image = np.zeros((h, w, 3), dtype=np.uint8)
+    labels = [f"cls{c}" for c in data["classes"]]
+    return lambda: draw_bboxes(image, data["boxes"], labels)
+
+
+@case("batched_nms")
+def _(fx, scratch):
+    from AEsir_utils.detection_utils import batched_nms
+    data = _load_bboxes(fx)
+    return lambda: batched_nms(data["boxes"], data["scores"], data["classes"], 0.5)
+
+
+def _proc_status_mb(field):
+    """A ``kB`` field of /proc/self/status (Linux), in MB, or None."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """Resets VmHWM to the current RSS (Linux >= 4.0), so the peak measured afterwards
+    excludes imports and setup. Returns False where unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    peak = _proc_status_mb("VmHWM")
+    if peak is not None or resource is None:
+        return peak
+    # ru_maxrss is in KB on Linux, in bytes on macOS, and may include the parent's peak.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+def run_case(name, fx, repeat, scratch):
+    """Runs one case in this process. Returns its result dict."""
+    made = CASES[name](fx, scratch)
+    setup, run = made if isinstance(made, tuple) else ((lambda: None), (lambda _: made()))
+    _reset_peak_rss()
+    rss_before = _proc_status_mb("VmRSS")
+    run(setup())
+    times = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - start)
+    peak_rss = _peak_rss_mb()
+    state = setup()
+    tracemalloc.start()
+    run(state)
+    traced_peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "times_s": times,
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": peak_rss,
+        "peak_rss_delta_mb": None if rss_before is None or peak_rss is None else max(0.0, peak_rss - rss_before),
+        "traced_peak_mb": traced_peak,
+    }
+
+
+def spawn_case(name, fixtures_dir, preset, repeat):
+    """Runs one case in a fresh interpreter. Returns its result dict, or ``{"error": ...}``."""
+    env = dict(os.environ, MPLBACKEND="Agg", CUDA_VISIBLE_DEVICES="")
+    with tempfile.TemporaryDirectory() as tmp:
+        result_path = os.path.join(tmp, "result.json")
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", name, "--fixtures", fixtures_dir,
+             "--preset", preset, "--repeat", str(repeat), "--result", result_path],
+            env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"}
+        with open(result_path) as f:
+            return json.load(f)
+
+
+def _versions():
+    versions = {"python": platform.python_version()}
+    for module in ("numpy", "torch", "PIL", "matplotlib", "safetensors"):
+        try:
+            versions[module] = __import__(module).__version__
+        except Exception:
+            versions[module] = None
+    return versions
+
+
+def _git_commit():
+    try:
+        proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return proc.stdout.strip() or None
+
+
+def compare(results, baseline, threshold):
+    """Prints each case against `baseline`. Returns the names of the regressed cases."""
+    regressed = []
+    if baseline["meta"].get("machine") != results["meta"].get("machine"):
+        print("note: the baseline was recorded on another machine, ratios may not be meaningful")
+    if baseline["meta"].get("preset") != results["meta"].get("preset"):
+        print(f"note: baseline preset {baseline['meta'].get('preset')!r} != {results['meta'].get('preset')!r}")
+    print(f"\n{'case':<40}{'time':>10}{'base':>10}{'ratio':>8}{'mem':>10}{'base':>10}{'ratio':>8}")
+    for name, r in results["results"].items():
+        b = baseline["results"].get(name)
+        if b is None or "error" in r or "error" in b:
+            print(f"{name:<40}{'(no comparison)':>24}")
+            continue
+        t_ratio = r["median_s"] / b["median_s"] if b["median_s"] > 0 else float("inf")
+        m, bm = r["peak_rss_delta_mb"] or 0.0, b["peak_rss_delta_mb"] or 0.0
+        m_ratio = m / bm if bm > 0 else (1.0 if m == 0 else float("inf"))
+        slow = t_ratio > 1 + threshold and r["median_s"] - b["median_s"] > MIN_TIME_DIFF_S
+        hungry = m_ratio > 1 + threshold and m - bm > MIN_MEMORY_DIFF_MB
+        flag = "  SLOWER" * slow + "  MORE MEMORY" * hungry
+        if slow or hungry:
+            regressed.append(name)
+        print(f"{name:<40}{r['median_s'] * 1e3:>8.1f}ms{b['median_s'] * 1e3:>8.1f}ms{t_ratio:>8.2f}"
+              f"{m:>8.1f}MB{bm:>8.1f}MB{m_ratio:>8.2f}{flag}")
+    return regressed
+
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--preset', choices=list(PRESETS), default="default")
+    parser.add_argument('--fixtures', type=str, default=None,
+                        help='fixtures directory (default: <tmp>/AEsir_utils_bench/<preset>)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='+', default=None, help='case name patterns (fnmatch)')
+    parser.add_argument('--list', action='store_true', help='list the cases and exit')
+    parser.add_argument('--output', type=str, default=None, help='write the results to this JSON file')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='baseline to compare to (default: benchmarks/baseline-<preset>.json if present)')
+    parser.add_argument('--save-baseline', type=str, default=None, help='also write the results as a baseline')
+    parser.add_argument('--threshold', type=float, default=0.15, help='tolerated relative slowdown / memory growth')
+    parser.add_argument('--child', type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--result', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(CASES))
+        return
+    fixtures_dir = args.fixtures or os.path.join(tempfile.gettempdir(), "AEsir_utils_bench", args.preset)
+
+    if args.child is not None:
+        fx = ensure_fixtures(fixtures_dir, args.preset, log=lambda msg: None)
+        scratch = tempfile.mkdtemp(prefix="scratch-", dir=fixtures_dir)
+        try:
+            result = run_case(args.child, fx, args.repeat, scratch)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        with open(args.result, "w") as f:
+            json.dump(result, f)
+        return
+
+    names = [n for n in CASES if args.only is None or any(fnmatch.fnmatch(n, p) for p in args.only)]
+    start = time.perf_counter()
+    ensure_fixtures(fixtures_dir, args.preset)
+    print(f"fixtures ready in {time.perf_counter() - start:.1f}s: {fixtures_dir}")
+
+    results = {
+        "meta": {
+            "preset": args.preset, "repeat": args.repeat,
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(), "machine": platform.node(), "platform": platform.platform(),
+            "processor": platform.processor(), "cpu_count": os.cpu_count(), "versions": _versions(),
+        },
+        "results": {},
+    }
+    print(f"{'case':<40}{'median':>12}{'min':>12}{'peak RSS +':>12}{'traced':>12}")
+    for name in names:
+        r = spawn_case(name, fixtures_dir, args.preset, args.repeat)
+        results["results"][name] = r
+        if "error" in r:
+            print(f"{name:<40}  ERROR: {r['error']}")
+        else:
+            delta = r["peak_rss_delta_mb"]
+            print(f"{name:<40}{r['median_s'] * 1e3:>10.1f}ms{r['min_s'] * 1e3:>10.1f}ms"
+                  f"{'n/a' if delta is None else f'{delta:.1f}MB':>12}{r['traced_peak_mb']:>10.1f}MB")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+    baseline_path = args.baseline or os.path.join(here, f"baseline-{args.preset}.json")
+    failed = any("error" in r for r in results["results"].values())
+    if os.path.exists(baseline_path) and os.path.abspath(baseline_path) != os.path.abspath(args.save_baseline or ""):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        print(f"\ncomparing to {baseline_path} ({baseline['meta'].get('date')}, commit {baseline['meta'].get('commit')})")
+        regressed = compare(results, baseline, args.threshold)
+        if regressed:
+            print(f"\n{len(regressed)} regression(s): {', '.join(regressed)}")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+"""Synthetic, seeded fixtures for ``bench_suite.py``.
+
+Every generator is deterministic for a given spec, writes its output under a
+fixtures directory and streams large outputs (checkpoints, JSON dumps) to disk
+instead of building them in memory. ``ensure_fixtures`` regenerates a fixture
+only when its spec changed since the last run.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+
+# Sizes of every fixture, per preset. "smoke" runs in seconds, "large" builds
+# multi-GB checkpoints and tens of thousands of files.
+PRESETS = {
+    "smoke": {
+        "tree": {"depth": 2, "width": 3, "files_per_dir": 4, "node_modules_packages": 40, "large_files": 1},
+        "jpegs": {"count": 6, "width": 1600, "height": 1200},
+        "ckpt": {"hidden": 256, "layers": 4, "vocab": 4096},
+        "json": {"records": 5_000},
+        "bboxes": {"count": 1_000, "width": 1920, "height": 1080},
+        "frame": {"width": 1280, "height": 720},
+    },
+    "default": {
+        "tree": {"depth": 4, "width": 4, "files_per_dir": 6, "node_modules_packages": 1_000, "large_files": 4},
+        "jpegs": {"count": 32, "width": 4032, "height": 3024},
+        "ckpt": {"hidden": 2048, "layers": 5, "vocab": 32_000},
+        "json": {"records": 200_000},
+        "bboxes": {"count": 10_000, "width": 1920, "height": 1080},
+        "frame": {"width": 3840, "height": 2160},
+    },
+    "large": {
+        "tree": {"depth": 5, "width": 5, "files_per_dir": 6, "node_modules_packages": 10_000, "large_files": 16},
+        "jpegs": {"count": 128, "width": 6000, "height": 4000},
+        "ckpt": {"hidden": 4096, "layers": 10, "vocab": 32_000},
+        "json": {"records": 2_000_000},
+        "bboxes": {"count": 100_000, "width": 3840, "height": 2160},
+        "frame": {"width": 7680, "height": 4320},
+    },
+}
+
+SPEC_NAME = "spec.json"
+# Bumped when a builder changes what it writes, so that cached fixtures are rebuilt.
+FIXTURE_LAYOUT = 2
+
+
+def _source_text(rng, n_defs):
+    lines = ["import os", "import sys", ""]
+    for i in range(n_defs):
+        k = int(rng.integers(1000))
+        lines += [
+            f"def function_{i}_{k}(value, scale={k}):",
+            f'    """Scales value by {k} and clips it."""',
+            f"    result = value * scale + {i}",
+            "    return max(0, min(result, 1 << 16))",
+            "",
+        ]
+    lines += [f"class Model{n_defs}:", "    def forward(self, x):", "        return x", ""]
+    return "\n".join(lines)
+
+
+def make_tree(root, depth, width, files_per_dir, node_modules_packages, large_files, seed=0):
+    """A source tree `width` directories wide and `depth` deep, with the noise real projects
+    carry: a ``node_modules`` of `node_modules_packages` packages, ``__pycache__`` bytecode, a
+    binary ``.git`` directory, .gitignore'd build outputs and `large_files` multi-MB logs.
+    All files outside hidden directories and ``__pycache__`` are UTF-8 text."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(root)
+    with open(os.path.join(root, ".gitignore"), "w") as f:
+        f.write("*.log\nbuild/*\n!build/keep.txt\n")
+    with open(os.path.join(root, "README.md"), "w") as f:
+        f.write("# Synthetic project\n\n" + "Some documentation line.\n" * 200)
+
+    def fill(path, level):
+        for i in range(files_per_dir):
+            ext = (".py", ".md", ".json", ".ts", ".txt", ".yaml")[i % 6]
+            with open(os.path.join(path, f"file_{level}_{i}{ext}"), "w") as f:
+                f.write(_source_text(rng, int(rng.integers(5, 150))))
+        pycache = os.path.join(path, "__pycache__")
+        os.makedirs(pycache)
+        for i in range(2):
+            with open(os.path.join(pycache, f"file_{level}_{i}.cpython-311.pyc"), "wb") as f:
+                f.write(rng.bytes(int(rng.integers(1_000, 20_000))))
+        if level < depth:
+            for j in range(width):
+                sub = os.path.join(path, f"pkg_{level}_{j}")
+                os.makedirs(sub)
+                fill(sub, level + 1)
+
+    fill(root, 1)
+    for i in range(node_modules_packages):
+        pkg = os.path.join(root, "node_modules", f"package-{i}")
+        os.makedirs(os.path.join(pkg, "lib"))
+        with open(os.path.join(pkg, "package.json"), "w") as f:
+            json.dump({"name": f"package-{i}", "version": f"1.{i % 10}.0", "main": "lib/index.js"}, f)
+        with open(os.path.join(pkg, "lib", "index.js"), "w") as f:
+            f.write(f"module.exports = function p{i}(x) {{ return x + {i}; }};\n" * int(rng.integers(1, 40)))
+    build = os.path.join(root, "build")
+    os.makedirs(build)
+    for i in range(20):
+        with open(os.path.join(build, f"out_{i}.js"), "w") as f:
+            f.write("var x = 1;\n" * 500)
+    with open(os.path.join(build, "keep.txt"), "w") as f:
+        f.write("kept by a negated .gitignore pattern\n")
+    line = "2024-01-01T00:00:00 INFO request handled in 12ms path=/api/items status=200\n"
+    for i in range(large_files):
+        with open(os.path.join(root, f"server_{i}.log"), "w") as f:
+            f.write(line * (3 * 2**20 // len(line)))
+    objects = os.path.join(root, ".git", "objects")
+    os.makedirs(objects)
+    for i in range(50):
+        with open(os.path.join(objects, f"{i:02x}"), "wb") as f:
+            f.write(rng.bytes(4096))
+
+
+def make_jpegs(root, count, width, height, seed=0):
+    """`count` smooth, photo-like JPEGs, alternately landscape and portrait, plus one file
+    that is not an image (the skip path of `img_crop_square`)."""
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    os.makedirs(root)
+    for i in range(count):
+        w, h = (width, height) if i % 2 == 0 else (height, width)
+        coarse = rng.integers(0, 256, (h // 64 + 2, w // 64 + 2, 3), dtype=np.uint8)
+        img = np.asarray(Image.fromarray(coarse).resize((w, h), Image.BICUBIC))
+        img = np.clip(img.astype(np.int16) + rng.integers(-8, 9, img.shape, dtype=np.int16), 0, 255).astype(np.uint8)
+        Image.fromarray(img).save(os.path.join(root, f"img_{i:04d}.jpg"), quality=92)
+    with open(os.path.join(root, "notes.txt"), "w") as f:
+        f.write("not an image\n")
+
+
+def ckpt_tensors(hidden, layers, vocab):
+    """``(name, shape)`` of a decoder-only transformer checkpoint."""
+    tensors = [("model.embed_tokens.weight", (vocab, hidden))]
+    for i in range(layers):
+        p = f"model.layers.{i}."
+        tensors += [
+            (p + "input_layernorm.weight", (hidden,)),
+            (p + "self_attn.qkv_proj.weight", (3 * hidden, hidden)),
+            (p + "self_attn.o_proj.weight", (hidden, hidden)),
+            (p + "post_attention_layernorm.weight", (hidden,)),
+            (p + "mlp.up_proj.weight", (4 * hidden, hidden)),
+            (p + "mlp.down_proj.weight", (hidden, 4 * hidden)),
+        ]
+    tensors += [("model.norm.weight", (hidden,)), ("lm_head.weight", (vocab, hidden))]
+    return tensors
+
+
+def make_safetensors(path, hidden, layers, vocab, seed=0, chunk_elems=1 << 24):
+    """Writes a float16 '.safetensors' checkpoint tensor by tensor, in bounded memory."""
+    rng = np.random.default_rng(seed)
+    tensors = ckpt_tensors(hidden, layers, vocab)
+    header, offset = {}, 0
+    for name, shape in tensors:
+        nbytes = int(np.prod(shape)) * 2
+        header[name] = {"dtype": "F16", "shape": list(shape), "data_offsets": [offset, offset + nbytes]}
+        offset += nbytes
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (-len(header_bytes) % 8)
+    with open(path, "wb") as f:
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for name, shape in tensors:
+            n = int(np.prod(shape))
+            for start in range(0, n, chunk_elems):
+                k = min(chunk_elems, n - start)
+                (rng.standard_normal(k, dtype=np.float32) * 0.02).astype(np.float16).tofile(f)
+
+
+def make_torch_ckpt(path, safetensors_path):
+    """Saves the tensors of `safetensors_path` with ``torch.save``. They are copy-on-write
+    views of the mapped file, so the checkpoint is never held in memory as a whole."""
+    import torch
+    with open(safetensors_path, "rb") as f:
+        header_size = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(header_size))
+    data = np.memmap(safetensors_path, dtype=np.uint8, mode="c")
+    start = 8 + header_size
+    state_dict = {}
+    for name, entry in header.items():
+        begin, end = entry["data_offsets"]
+        array = data[start + begin:start + end].view(np.float16).reshape(entry["shape"])
+        state_dict[name] = torch.from_numpy(array)
+    torch.save(state_dict, path)
+
+
+def _json_record(rng, i):
+    record = {
+        "id": i,
+        "name": f"item-{i}",
+        "tags": [f"tag{int(t)}" for t in rng.integers(0, 50, int(rng.integers(0, 5)))],
+        "meta": {
+            "score": float(rng.random()),
+            "bbox": [float(v) for v in rng.random(4)],
+            "flags": {"valid": bool(rng.random() < 0.9), "source": ("web", "cam", "synthetic")[i % 3]},
+        },
+    }
+    if i % 7 == 0:
+        record["caption"] = "a synthetic caption " * int(rng.integers(1, 6))
+    if i % 11 == 0:
+        record["meta"]["score"] = None
+    return record
+
+
+def make_json(json_path, jsonl_path, records, seed=0):
+    """The same records as one large '.json' document and as a '.jsonl' file, streamed to disk."""
+    rng = np.random.default_rng(seed)
+    with open(json_path, "w") as fj, open(jsonl_path, "w") as fl:
+        fj.write('{"version": 1, "records": [')
+        for i in range(records):
+            line = json.dumps(_json_record(rng, i))
+            fj.write(line if i == 0 else "," + line)
+            fl.write(line + "\n")
+        fj.write("]}")
+
+
+def make_bboxes(path, count, width, height, seed=0):
+    """Dense xyxy boxes, scores and class ids, saved as a '.npz'."""
+    rng = np.random.default_rng(seed)
+    xy = rng.random((count, 2)) * [width, height]
+    wh = rng.gamma(2.0, 40.0, (count, 2)) + 4
+    boxes = np.concatenate([xy, np.minimum(xy + wh, [width, height])], axis=1).astype(np.float32)
+    np.savez(path, boxes=boxes, scores=rng.random(count).astype(np.float32),
+             classes=rng.integers(0, 80, count), size=np.array([height, width]))
+
+
+def ensure_fixtures(root, preset, log=print):
+    """Builds the fixtures of `preset` under `root`, reusing those whose spec did not change.
+
+    Returns:
+        dict: Fixture name -> path, plus ``"spec"`` (the preset).
+    """
+    spec = PRESETS[preset]
+    os.makedirs(root, exist_ok=True)
+    spec_path = os.path.join(root, SPEC_NAME)
+    try:
+        with open(spec_path) as f:
+            built = json.load(f)
+    except (OSError, ValueError):
+        built = {}
+    if built.get("layout") != FIXTURE_LAYOUT:
+        built = {"layout": FIXTURE_LAYOUT}
+
+    paths = {
+        "tree": os.path.join(root, "tree"),
+        "jpegs": os.path.join(root, "jpegs"),
+        "safetensors": os.path.join(root, "ckpt", "model.safetensors"),
+        "torch_ckpt": os.path.join(root, "ckpt", "model.pt"),
+        "json": os.path.join(root, "data", "records.json"),
+        "jsonl": os.path.join(root, "data", "records.jsonl"),
+        "bboxes": os.path.join(root, "bboxes.npz"),
+    }
+    builders = {
+        "tree": lambda s: make_tree(paths["tree"], **s),
+        "jpegs": lambda s: make_jpegs(paths["jpegs"], **s),
+        "ckpt": lambda s: (make_safetensors(paths["safetensors"], **s),
+                           make_torch_ckpt(paths["torch_ckpt"], paths["safetensors"])),
+        "json": lambda s: make_json(paths["json"], paths["jsonl"], **s),
+        "bboxes": lambda s: make_bboxes(paths["bboxes"], **s),
+    }
+    outputs = {"tree": ["tree"], "jpegs": ["jpegs"], "ckpt": ["safetensors", "torch_ckpt"],
+               "json": ["json", "jsonl"], "bboxes": ["bboxes"]}
+    for name, build in builders.items():
+        targets = [paths[k] for k in outputs[name]]
+        if built.get(name) == spec[name] and all(os.path.exists(p) for p in targets):
+            continue
+        log(f"building fixture {name}: {spec[name]}")
+        for p in targets:
+            if os.path.isdir(p):
+                shutil.rmtree(p)
+            elif os.path.exists(p):
+                os.remove(p)
+            os.makedirs(os.path.dirname(p), exist_ok=True)
+        build(spec[name])
+        built[name] = spec[name]
+        with open(spec_path, "w") as f:
+            json.dump(built, f, indent=2)
+    paths["spec"] = spec
+    return paths
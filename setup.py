@@ -14,7 +14,7 @@ setup(
         "License :: OSI Approved :: MIT License",  
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.6', 
+    python_requires='>=3.7', 
     install_requires=[  
                            
     ],
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+import torch
+
+from AEsir_utils.detection_utils import (batched_nms, box_iou, box_iou_max, box_iou_pairs, iter_box_iou_blocks,
+                                         nms)
+
+
+def _random_boxes(rng, n, extent=100):
+    xy = rng.uniform(0, extent, (n, 2))
+    wh = rng.uniform(0, 20, (n, 2))
+    return np.concatenate([xy, xy + wh], axis=1)
+
+
+def _iou_ref(a, b):
+    inter = max(0.0, min(a[2], b[2]) - max(a[0], b[0])) * max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _iou_matrix_ref(boxes1, boxes2):
+    return np.array([[_iou_ref(a, b) for b in boxes2] for a in boxes1]).reshape(len(boxes1), len(boxes2))
+
+
+def _nms_ref(boxes, scores, threshold):
+    keep = []
+    for i in sorted(range(len(boxes)), key=lambda i: -scores[i]):
+        if all(_iou_ref(boxes[i], boxes[k]) <= threshold for k in keep):
+            keep.append(i)
+    return keep
+
+
+@pytest.fixture(params=["numpy", "torch"])
+def as_input(request):
+    return np.asarray if request.param == "numpy" else torch.from_numpy
+
+
+def _np(x):
+    return x.numpy() if torch.is_tensor(x) else np.asarray(x)
+
+
+def test_box_iou(as_input):
+    rng = np.random.default_rng(0)
+    boxes1, boxes2 = _random_boxes(rng, 30), _random_boxes(rng, 20)
+    boxes2[0] = boxes2[0, [0, 1, 0, 1]]  # empty box
+    np.testing.assert_allclose(_np(box_iou(as_input(boxes1), as_input(boxes2))), _iou_matrix_ref(boxes1, boxes2),
+                               atol=1e-9)
+
+
+def test_blocked_iou(as_input):
+    rng = np.random.default_rng(1)
+    boxes1, boxes2 = _random_boxes(rng, 45, 300), _random_boxes(rng, 37, 300)
+    ref = _iou_matrix_ref(boxes1, boxes2)
+
+    full = np.zeros_like(ref)
+    for row, col, block in iter_box_iou_blocks(as_input(boxes1), as_input(boxes2), block_size=8):
+        block = _np(block)
+        full[row:row + block.shape[0], col:col + block.shape[1]] = block
+    np.testing.assert_allclose(full, ref, atol=1e-9)
+
+    best, index = box_iou_max(as_input(boxes1), as_input(boxes2), block_size=8)
+    np.testing.assert_allclose(_np(best), ref.max(axis=1), atol=1e-9)
+    overlapping = ref.max(axis=1) > 0
+    np.testing.assert_array_equal(_np(index)[overlapping], ref.argmax(axis=1)[overlapping])
+    assert np.all(_np(index)[~overlapping] == -1)
+
+    rows, cols, ious = box_iou_pairs(as_input(boxes1), as_input(boxes2), 0.1, block_size=8)
+    got = sorted(zip(_np(rows).tolist(), _np(cols).tolist()))
+    assert got == sorted(zip(*np.nonzero(ref > 0.1)))
+    np.testing.assert_allclose(_np(ious), ref[_np(rows), _np(cols)], atol=1e-9)
+
+
+@pytest.mark.parametrize("threshold", [0.0, 0.3, 0.7])
+def test_nms(as_input, threshold):
+    rng = np.random.default_rng(2)
+    boxes = _random_boxes(rng, 60, 60)
+    scores = rng.permutation(60).astype(np.float64)
+    keep = nms(as_input(boxes), as_input(scores), threshold)
+    assert _np(keep).tolist() == _nms_ref(boxes, scores, threshold)
+
+
+def test_batched_nms(as_input):
+    rng = np.random.default_rng(3)
+    boxes = _random_boxes(rng, 60, 60)
+    scores = rng.permutation(60).astype(np.float64)
+    classes = rng.integers(2, 5, 60)
+    ref = []
+    for c in np.unique(classes):
+        idx = np.flatnonzero(classes == c)
+        ref += [idx[i] for i in _nms_ref(boxes[idx], scores[idx], 0.3)]
+    ref.sort(key=lambda i: -scores[i])
+    keep = batched_nms(as_input(boxes), as_input(scores), as_input(classes), 0.3)
+    assert _np(keep).tolist() == ref
+
+
+def test_nms_accepts_lists():
+    boxes = [[0, 0, 10, 10], [1, 1, 10, 10], [20, 20, 30, 30]]
+    assert nms(boxes, [0.9, 0.8, 0.7], 0.5).tolist() == [0, 2]
+    assert batched_nms(boxes, [0.9, 0.8, 0.7], [0, 1, 1], 0.5).tolist() == [0, 1, 2]
+    assert batched_nms(boxes, (0.9, 0.8, 0.7), (0, 0, 0), 0.5).tolist() == [0, 2]
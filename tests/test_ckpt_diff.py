@@ -0,0 +1,103 @@
+import math
+
+import pytest
+import torch
+from safetensors.torch import save_file
+
+from AEsir_utils.data_utils.ckpt_diff import diff_ckpt, format_ckpt_diff
+
+
+def _checkpoints(dtype=torch.float32):
+    g = torch.Generator().manual_seed(0)
+    base = {
+        "a.weight": torch.randn(37, 11, generator=g),
+        "a.bias": torch.randn(11, generator=g),
+        "b.weight": torch.randn(5, 7, generator=g),
+        "gone": torch.zeros(3),
+        "reshaped": torch.ones(4, 2),
+    }
+    other = {k: v.clone() for k, v in base.items()}
+    other["a.weight"] += 0.01 * torch.randn(37, 11, generator=g) + 0.003
+    other["a.bias"][::3] -= 0.5
+    del other["gone"]
+    other["new"] = torch.ones(2)
+    other["reshaped"] = torch.ones(2, 4)
+    cast = lambda ckpt: {k: v.to(dtype).contiguous() for k, v in ckpt.items()}
+    return cast(base), cast(other)
+
+
+def _expected(a, b):
+    a, b = a.double().reshape(-1), b.double().reshape(-1)
+    d = b - a
+    return {
+        "l2_base": a.norm().item(),
+        "l2_other": b.norm().item(),
+        "l2_delta": d.norm().item(),
+        "mean_delta": d.mean().item(),
+        "std_delta": d.std(unbiased=False).item(),
+        "max_abs_delta": d.abs().max().item(),
+        "n_changed": int(torch.count_nonzero(d)),
+    }
+
+
+def _check_stats(report, base, other):
+    assert report["missing"] == ["gone"] and report["extra"] == ["new"]
+    assert report["shape_changed"] == {"reshaped": {"base": [4, 2], "other": [2, 4]}}
+    assert sorted(report["tensors"]) == ["a.bias", "a.weight", "b.weight"]
+    for k, t in report["tensors"].items():
+        for name, value in _expected(base[k], other[k]).items():
+            assert t[name] == pytest.approx(value, rel=1e-9, abs=1e-12), (k, name)
+        assert t["rel_l2_delta"] == pytest.approx(t["l2_delta"] / t["l2_base"])
+        assert t["n_nonfinite"] == 0
+    assert report["tensors"]["b.weight"]["n_changed"] == 0
+    s = report["summary"]
+    assert s["n_compared"] == 3 and s["n_changed"] == 2
+    assert s["l2_delta"] == pytest.approx(math.sqrt(sum(t["l2_delta"] ** 2 for t in report["tensors"].values())))
+
+
+@pytest.mark.parametrize("chunk_elems", [1, 7, 64, 1 << 20])
+def test_stats_match_torch_for_dicts(chunk_elems):
+    base, other = _checkpoints()
+    _check_stats(diff_ckpt(base, other, chunk_elems=chunk_elems), base, other)
+
+
+@pytest.mark.parametrize("dtype", [torch.float32, torch.float16, torch.bfloat16])
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_stats_match_torch_for_safetensors(tmp_path, dtype, num_workers):
+    base, other = _checkpoints(dtype)
+    save_file(base, str(tmp_path / "base.safetensors"))
+    save_file(other, str(tmp_path / "other.safetensors"))
+    report = diff_ckpt(str(tmp_path / "base.safetensors"), str(tmp_path / "other.safetensors"),
+                       chunk_elems=13, num_workers=num_workers)
+    _check_stats(report, base, other)
+
+
+def test_stats_match_torch_for_torch_save(tmp_path):
+    base, other = _checkpoints()
+    torch.save({"state_dict": base}, tmp_path / "base.pt")
+    torch.save({"state_dict": other}, tmp_path / "other.pt")
+    report = diff_ckpt(tmp_path / "base.pt", tmp_path / "other.pt", chunk_elems=10)
+    prefixed = lambda ckpt: {f"state_dict.{k}": v for k, v in ckpt.items()}
+    base, other = prefixed(base), prefixed(other)
+    assert sorted(report["tensors"]) == ["state_dict.a.bias", "state_dict.a.weight", "state_dict.b.weight"]
+    for k, t in report["tensors"].items():
+        for name, value in _expected(base[k], other[k]).items():
+            assert t[name] == pytest.approx(value, rel=1e-9, abs=1e-12), (k, name)
+
+
+def test_nonfinite_values_are_excluded():
+    base = {"w": torch.arange(10, dtype=torch.float32)}
+    other = {"w": base["w"] + 1}
+    other["w"][2] = float("nan")
+    other["w"][7] = float("inf")
+    t = diff_ckpt(base, other, chunk_elems=3)["tensors"]["w"]
+    assert t["n_nonfinite"] == 2 and t["n_changed"] == 8
+    assert t["mean_delta"] == pytest.approx(1.0) and t["std_delta"] == pytest.approx(0.0, abs=1e-12)
+    assert "non-finite: 2" in format_ckpt_diff(diff_ckpt(base, other))
+
+
+def test_structure_only_reads_no_data():
+    base, other = _checkpoints()
+    report = diff_ckpt(base, other, stats=False)
+    assert report["tensors"] == {} and report["summary"]["n_compared"] == 3
+    assert report["summary"]["bytes_compared"] == 0
@@ -0,0 +1,15 @@
+import json
+
+from AEsir_utils.data_utils import print_json_structure
+
+
+def test_print_json_structure_nested_strings(tmp_path, capsys):
+    data = {"name": "model.json", "tags": ["a", "b"], "meta": {"path": "x/y"}}
+    print_json_structure(data)
+    out = capsys.readouterr().out
+    assert "name" in out and "meta" in out and "path" in out
+
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(data))
+    print_json_structure(str(path))
+    assert capsys.readouterr().out == out
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+import torch
+
+from AEsir_utils.diffusion_utils import NoiseSchedule
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_per_sample_batch_mixing_first_and_last_step(dtype):
+    # alpha_bar underflows to 0 at the end, and is tiny but non-zero in between.
+    schedule = NoiseSchedule.constant(beta=0.9, max_steps=1000)
+    T = schedule.max_steps
+    t = np.array([0, T - 1, 0, 150, T])
+    x = np.random.default_rng(0).random((len(t), 3, 4, 4)).astype(dtype)
+    noise = np.random.default_rng(1).standard_normal(x.shape).astype(dtype)
+
+    y = schedule.add_noise(x, t, noise=noise)
+
+    a = schedule.sqrt_alpha_bar[t].astype(dtype).reshape(-1, 1, 1, 1)
+    b = schedule.sqrt_one_minus_alpha_bar[t].astype(dtype).reshape(-1, 1, 1, 1)
+    assert np.isfinite(y).all()
+    np.testing.assert_allclose(y, a * x + b * noise, rtol=1e-6, atol=1e-6)
+    np.testing.assert_array_equal(y[[0, 2]], x[[0, 2]])
+    y_torch = schedule.add_noise(torch.from_numpy(x), torch.from_numpy(t), noise=torch.from_numpy(noise))
+    np.testing.assert_allclose(y, y_torch.numpy(), rtol=1e-6, atol=1e-6)
+
+
+def test_uint8_per_sample_keeps_clean_samples():
+    schedule = NoiseSchedule.constant(beta=0.9, max_steps=1000)
+    x = np.random.default_rng(0).integers(0, 256, (3, 8, 8, 3), dtype=np.uint8)
+    y = schedule.add_noise(x, np.array([0, 999, 0]), generator=0)
+    np.testing.assert_array_equal(y[[0, 2]], x[[0, 2]])
+    assert not np.array_equal(y[1], x[1])
+
+
+def test_generated_noise_matches_a_single_draw():
+    schedule = NoiseSchedule.linear()
+    x = np.zeros((200, 40, 40), np.float32)  # several noise chunks
+    y = schedule.add_noise(x, 10, generator=3)
+    expected = np.random.default_rng(3).standard_normal(x.shape, dtype=np.float32)
+    expected *= np.float32(schedule.sqrt_one_minus_alpha_bar[10])
+    np.testing.assert_allclose(y, expected, rtol=1e-6)
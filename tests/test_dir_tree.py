@@ -0,0 +1,26 @@
+import os
+
+from AEsir_utils.data_utils import generate_proj_prompt, generate_proj_prompt_2, scan_tree, tree_to_string
+
+
+def _make_cycle(tmp_path):
+    src = tmp_path / "proj" / "src"
+    src.mkdir(parents=True)
+    (src / "a.py").write_text("x = 1\n")
+    os.symlink("..", src / "loop")
+    return tmp_path / "proj"
+
+
+def test_scan_tree_does_not_follow_symlinked_dirs(tmp_path):
+    proj = _make_cycle(tmp_path)
+    tree = scan_tree(proj)
+    assert [f.rel_path for f in tree.iter_files()] == [os.path.join("src", "a.py")]
+    loop = tree.dirs[0].dirs[0]
+    assert loop.name == "loop" and not loop.listed
+
+
+def test_prompts_contain_symlink_cycle_once(tmp_path):
+    proj = _make_cycle(tmp_path)
+    for prompt in (generate_proj_prompt(str(proj)), generate_proj_prompt_2(str(proj))):
+        assert prompt.count("x = 1") == 1
+    assert "loop" in tree_to_string(str(proj))
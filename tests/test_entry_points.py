@@ -0,0 +1,45 @@
+import subprocess
+import sys
+from pathlib import Path
+
+PACKAGE = Path(__file__).resolve().parents[1] / "AEsir_utils"
+
+
+def _run_script(rel_path, *args, cwd=None):
+    return subprocess.run([sys.executable, str(PACKAGE / rel_path), *args], cwd=cwd,
+                          check=True, capture_output=True, text=True).stdout
+
+
+def test_data_visual_runs_as_script(tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+    assert "a.txt" in _run_script("data_utils/data_visual.py", cwd=tmp_path)
+
+
+def test_img_process_runs_as_script():
+    assert "--img_dir" in _run_script("diffusion_utils/img_process.py", "--help")
+
+
+def test_img_process_script_writes_shards(tmp_path):
+    import numpy as np
+    from PIL import Image
+
+    from AEsir_utils.diffusion_utils.image_shards import ImageShardReader
+
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    Image.new('RGB', (20, 10), (255, 0, 0)).save(src / "a.png")
+    _run_script("diffusion_utils/img_process.py", "--img_dir", str(src), "--size", "8",
+                "--output_dir", str(out), "--output_format", "shards")
+    reader = ImageShardReader(str(out))
+    assert reader.names == ["a.png"]
+    assert np.all(reader["a.png"] == [255, 0, 0])
+
+
+def test_ckpt_diff_runs_as_script(tmp_path):
+    import torch
+    from safetensors.torch import save_file
+
+    save_file({"w": torch.zeros(4)}, str(tmp_path / "a.safetensors"))
+    save_file({"w": torch.ones(4)}, str(tmp_path / "b.safetensors"))
+    out = _run_script("data_utils/ckpt_diff.py", str(tmp_path / "a.safetensors"), str(tmp_path / "b.safetensors"))
+    assert "w" in out
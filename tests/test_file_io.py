@@ -0,0 +1,27 @@
+import os
+
+import pytest
+from PIL import Image
+
+from AEsir_utils import TMP_PREFIX, atomic_write, encode_image
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    dst = tmp_path / "out.bin"
+    dst.write_bytes(b"old")
+    atomic_write(b"new", str(dst))
+    assert dst.read_bytes() == b"new"
+    assert os.listdir(tmp_path) == ["out.bin"]
+
+
+def test_atomic_write_cleans_up_on_error(tmp_path):
+    with pytest.raises(TypeError):
+        atomic_write("not bytes", str(tmp_path / "out.bin"))
+    assert not any(name.startswith(TMP_PREFIX) for name in os.listdir(tmp_path))
+
+
+def test_encode_image_uses_extension():
+    data = encode_image(Image.new('RGB', (4, 4)), "x.PNG")
+    assert data.startswith(b"\x89PNG")
+    with pytest.raises(ValueError):
+        encode_image(Image.new('RGB', (4, 4)), "x.unknown")
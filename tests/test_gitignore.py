@@ -0,0 +1,77 @@
+import pytest
+
+from AEsir_utils.data_utils import GitIgnoreMatcher, compile_gitignore_pattern, scan_tree
+
+
+def _ignored(lines, path, is_dir=False):
+    return GitIgnoreMatcher.from_lines(lines).is_ignored(path, is_dir)
+
+
+@pytest.mark.parametrize("line", ["", "   ", "# comment", "/"])
+def test_blank_and_comment_lines(line):
+    assert compile_gitignore_pattern(line) is None
+
+
+@pytest.mark.parametrize("lines, path, is_dir, expected", [
+    # Unanchored names match at any depth, anchored ones only below the .gitignore.
+    (["*.log"], "a.log", False, True),
+    (["*.log"], "x/y/a.log", False, True),
+    (["/todo.txt"], "todo.txt", False, True),
+    (["/todo.txt"], "docs/todo.txt", False, False),
+    (["doc/frotz"], "doc/frotz", False, True),
+    (["doc/frotz"], "a/doc/frotz", False, False),
+    # A trailing slash only matches directories.
+    (["build/"], "build", True, True),
+    (["build/"], "build", False, False),
+    # "*" and "?" do not cross directories.
+    (["a/*.py"], "a/b.py", False, True),
+    (["a/*.py"], "a/b/c.py", False, False),
+    (["?.txt"], "x.txt", False, True),
+    (["?.txt"], "xy.txt", False, False),
+    # "**" forms.
+    (["**/logs"], "logs", True, True),
+    (["**/logs"], "a/b/logs", True, True),
+    (["a/**/b"], "a/b", False, True),
+    (["a/**/b"], "a/x/y/b", False, True),
+    (["abc/**"], "abc/x/y", False, True),
+    (["abc/**"], "abc", True, False),
+    # Character classes, escapes and trailing spaces.
+    (["[ab].txt"], "b.txt", False, True),
+    (["[!ab].txt"], "b.txt", False, False),
+    (["[!ab].txt"], "c.txt", False, True),
+    (["\\#notes"], "#notes", False, True),
+    (["\\!important"], "!important", False, True),
+    (["trailing   "], "trailing", False, True),
+    # The last matching rule wins.
+    (["*.log", "!keep.log"], "keep.log", False, False),
+    (["*.log", "!keep.log"], "other.log", False, True),
+    (["!keep.log", "*.log"], "keep.log", False, True),
+])
+def test_patterns(lines, path, is_dir, expected):
+    assert _ignored(lines, path, is_dir) is expected
+
+
+def _tree(root, files):
+    for rel, content in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return sorted(f.rel_path.replace("\\", "/") for f in scan_tree(str(root), gitignore=True).iter_files())
+
+
+def test_negation_inside_excluded_directory_is_not_reincluded(tmp_path):
+    files = _tree(tmp_path, {
+        ".gitignore": "build/\n!build/keep.txt\nout/*\n!out/keep.txt\n",
+        "build/keep.txt": "", "build/x.js": "", "out/keep.txt": "", "out/x.js": "",
+    })
+    assert files == [".gitignore", "out/keep.txt"]
+
+
+def test_nested_gitignore_takes_precedence(tmp_path):
+    files = _tree(tmp_path, {
+        ".gitignore": "*.tmp\n",
+        "a.tmp": "",
+        "sub/.gitignore": "!keep.tmp\n/local.txt\n",
+        "sub/keep.tmp": "", "sub/drop.tmp": "", "sub/local.txt": "", "sub/deeper/local.txt": "",
+    })
+    assert files == [".gitignore", "sub/.gitignore", "sub/deeper/local.txt", "sub/keep.tmp"]
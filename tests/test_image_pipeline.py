@@ -0,0 +1,33 @@
+import subprocess
+import sys
+
+import numpy as np
+from PIL import Image
+
+from AEsir_utils.diffusion_utils.image_pipeline import iter_image_batches
+
+
+def _make_images(img_dir, n=3):
+    img_dir.mkdir()
+    for i in range(n):
+        Image.new('RGB', (40, 30), (i * 50, 0, 0)).save(img_dir / f"{i}.png")
+
+
+def test_numpy_batches_do_not_import_torch(tmp_path):
+    _make_images(tmp_path / "imgs")
+    code = (
+        "import sys\n"
+        "from AEsir_utils.diffusion_utils.image_pipeline import iter_image_batches\n"
+        f"batches = list(iter_image_batches({str(tmp_path / 'imgs')!r}, 16, batch_size=2))\n"
+        "assert [len(b['names']) for b in batches] == [2, 1]\n"
+        "assert 'torch' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_torch_batches_with_noise(tmp_path):
+    _make_images(tmp_path / "imgs")
+    batch = next(iter_image_batches(str(tmp_path / "imgs"), 16, batch_size=3, output="torch", noise_steps=10))
+    assert tuple(batch["images"].shape) == (3, 3, 16, 16)
+    assert batch["noisy"].shape == batch["images"].shape
+    assert np.asarray(batch["steps"]).shape == (3,)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from AEsir_utils.diffusion_utils.image_shards import ImageShardReader, ImageShardWriter
+from AEsir_utils.diffusion_utils.img_process import img_crop_square
+
+SIZE = 6
+
+
+def _images(n, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (n, SIZE, SIZE, 3), dtype=np.uint8)
+
+
+def test_round_trip_across_shards(tmp_path):
+    images = _images(10)
+    with ImageShardWriter(str(tmp_path), SIZE, shard_size=4) as writer:
+        for i, image in enumerate(images):
+            writer.add(f"img{i}", image)
+
+    reader = ImageShardReader(str(tmp_path))
+    assert len(reader) == 10 and reader.names == [f"img{i}" for i in range(10)]
+    for i in range(10):
+        np.testing.assert_array_equal(reader[i], images[i])
+        np.testing.assert_array_equal(reader[f"img{i}"], images[i])
+    np.testing.assert_array_equal(reader[-1], images[-1])
+    np.testing.assert_array_equal(reader[1:3], images[1:3])
+    np.testing.assert_array_equal(reader[2:9], images[2:9])  # spans three shards
+    np.testing.assert_array_equal(reader[::3], images[::3])
+    np.testing.assert_array_equal(reader.get_batch([7, "img0"]), images[[7, 0]])
+    batches = list(reader.iter_batches(3))
+    assert [len(b) for b in batches] == [3, 1, 3, 1, 2]
+    np.testing.assert_array_equal(np.concatenate(batches), images)
+    assert isinstance(reader[1:3], np.memmap)  # zero-copy within a shard
+    with pytest.raises(IndexError):
+        reader[10]
+
+
+def test_append_and_overwrite(tmp_path):
+    images = _images(6, seed=1)
+    with ImageShardWriter(str(tmp_path), SIZE, shard_size=4) as writer:
+        for i in range(3):
+            writer.add(f"img{i}", images[i])
+    with ImageShardWriter(str(tmp_path), SIZE, shard_size=100) as writer:
+        assert writer.shard_size == 4 and "img2" in writer
+        writer.add("img1", images[5])
+        for i in range(3, 5):
+            writer.add(f"img{i}", images[i])
+
+    reader = ImageShardReader(str(tmp_path))
+    assert reader.names == ["img0", "img1", "img2", "img3", "img4"]
+    np.testing.assert_array_equal(reader["img1"], images[5])
+    np.testing.assert_array_equal(reader[4], images[4])
+
+    with pytest.raises(ValueError):
+        ImageShardWriter(str(tmp_path), SIZE + 1)
+    with pytest.raises(ValueError):
+        ImageShardWriter(str(tmp_path), SIZE).add("bad", np.zeros((SIZE, SIZE), np.uint8))
+
+
+def test_img_crop_square_shards_match_files(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    for i in range(5):
+        Image.fromarray(np.random.default_rng(i).integers(0, 256, (30, 20, 3), dtype=np.uint8)).save(src / f"{i}.png")
+    img_crop_square(str(src), 8, output_dir=str(tmp_path / "files"), verbose=False)
+    img_crop_square(str(src), 8, output_dir=str(tmp_path / "shards"), output_format="shards",
+                    shard_size=2, verbose=False)
+
+    reader = ImageShardReader(str(tmp_path / "shards"))
+    assert sorted(reader.names) == [f"{i}.png" for i in range(5)]
+    for name in reader.names:
+        np.testing.assert_array_equal(reader[name], np.asarray(Image.open(tmp_path / "files" / name)))
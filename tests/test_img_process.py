@@ -0,0 +1,60 @@
+import io
+
+from PIL import Image
+
+from AEsir_utils.diffusion_utils.img_process import img_crop_square
+
+
+def _jpeg(size=(96, 64), color=(200, 30, 30)):
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def test_corrupt_image_fails_only_that_file(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    (src / "a_good.jpg").write_bytes(_jpeg())
+    data = _jpeg((640, 480))
+    (src / "b_truncated.jpg").write_bytes(data[:len(data) // 2])
+    (src / "c_good.jpg").write_bytes(_jpeg())
+    (src / "notes.txt").write_text("not an image")
+
+    summary = img_crop_square(str(src), 32, output_dir=str(out), verbose=False)
+
+    assert (summary["processed"], summary["skipped"], summary["failed"]) == (2, 1, 1)
+    assert Image.open(out / "c_good.jpg").size == (32, 32)
+    assert not (out / "b_truncated.jpg").exists()
+
+
+def test_rerun_does_not_reopen_rejected_files(tmp_path):
+    from AEsir_utils import RunStats
+
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    (src / "good.jpg").write_bytes(_jpeg())
+    data = _jpeg((640, 480))
+    (src / "truncated.jpg").write_bytes(data[:len(data) // 2])
+    (src / "notes.txt").write_text("not an image")
+    img_crop_square(str(src), 32, output_dir=str(out), verbose=False)
+
+    stats = RunStats()
+    summary = img_crop_square(str(src), 32, output_dir=str(out), verbose=False, stats=stats)
+    assert (summary["unchanged"], summary["skipped"], summary["failed"]) == (1, 1, 1)
+    assert "bytes_read" not in stats.counts
+    assert len(stats.skipped) == len(stats.failed) == 1
+
+    (src / "notes.txt").write_text("still not an image")
+    stats = RunStats()
+    img_crop_square(str(src), 32, output_dir=str(out), verbose=False, stats=stats)
+    assert stats.counts["bytes_read"] == len("still not an image")
+
+
+def test_changing_fast_decode_reprocesses(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    (src / "good.jpg").write_bytes(_jpeg())
+    img_crop_square(str(src), 32, output_dir=str(out), verbose=False)
+    assert img_crop_square(str(src), 32, output_dir=str(out), verbose=False)["unchanged"] == 1
+    summary = img_crop_square(str(src), 32, output_dir=str(out), verbose=False, fast_decode=False)
+    assert summary["processed"] == 1
@@ -0,0 +1,33 @@
+import io
+import json
+
+import pytest
+
+from AEsir_utils.data_utils import infer_json_schema
+from AEsir_utils.data_utils.json_schema import _JsonStream
+
+DOC = json.dumps(dict({f"k{i}": 1.5e10 * i + 0.5 for i in range(40)}, neg=-2.25e-3, list=[1.5, 2e5]))
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 40))
+def test_numbers_split_across_chunks(chunk_size):
+    assert _JsonStream(io.StringIO(DOC), chunk_size=chunk_size).decode() == json.loads(DOC)
+
+
+def test_streamed_schema_matches_for_every_chunk_size(tmp_path):
+    path = tmp_path / "doc.json"
+    path.write_text(DOC)
+    expected = infer_json_schema(str(path))
+    for chunk_size in range(1, 40):
+        assert infer_json_schema(str(path), chunk_size=chunk_size) == expected
+
+
+def test_invalid_value_fails_without_reading_the_rest():
+    f = io.StringIO('{"a": tru, "b": "' + "x" * 100_000 + '"}')
+    stream = _JsonStream(f, chunk_size=64)
+    stream.next_char("{")
+    stream.decode()
+    stream.next_char(":")
+    with pytest.raises(json.JSONDecodeError):
+        stream.decode()
+    assert len(stream.buf) <= 64
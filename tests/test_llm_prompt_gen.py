@@ -0,0 +1,78 @@
+import io
+
+import pytest
+
+from AEsir_utils.data_utils import (FILE_PROMPT, OVERVIEW_PROMPT, approx_token_count, generate_proj_prompt,
+                                    generate_proj_prompt_2, rank_files, scan_tree, tree_to_string,
+                                    write_proj_prompt)
+
+
+def test_generate_proj_prompt_layout(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "a.py").write_text("x = 1\n")
+    (tmp_path / "b.md").write_text("# b\n")
+    (tmp_path / ".hidden").write_text("secret")
+    (tmp_path / "c.pyc").write_bytes(b"\0")
+
+    tree = scan_tree(str(tmp_path))
+    blocks = [FILE_PROMPT.format(file=f.rel_path, file_content=open(f.path).read())
+              for f in tree.iter_files() if f.name in ("a.py", "b.md")]
+    expected = OVERVIEW_PROMPT.format(proj_dir_tree=tree_to_string(tree)) + "\n" + "\n".join(blocks)
+    assert generate_proj_prompt(str(tmp_path)) == expected
+
+
+def test_write_proj_prompt_matches_generate(tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\n")
+    (tmp_path / "b.txt").write_text("b\n")
+    out = io.StringIO()
+    n = write_proj_prompt(str(tmp_path), out)
+    assert out.getvalue() == generate_proj_prompt_2(str(tmp_path))
+    assert n == len(out.getvalue())
+
+
+def _project(root):
+    (root / "README.md").write_text("# Project\n" + "Docs line.\n" * 5)
+    (root / "main.py").write_text("import lib\n\nlib.run()\n")
+    body = "".join(f"def helper_{i}(x):\n    return x + {i}\n\n" for i in range(200))
+    (root / "lib.py").write_text("class Runner:\n    pass\n\n" + body)
+    (root / "notes.txt").write_text("note " * 2000)
+    return root
+
+
+@pytest.mark.parametrize("max_tokens", [400, 1500, 4000, 20000])
+def test_budgeted_prompt_stays_within_budget(tmp_path, max_tokens):
+    proj = _project(tmp_path)
+    prompt = generate_proj_prompt_2(str(proj), max_tokens=max_tokens, token_counter=len)
+    assert len(prompt) <= max_tokens
+
+
+def test_large_file_falls_back_to_signatures(tmp_path):
+    proj = _project(tmp_path)
+    lib_size = len((proj / "lib.py").read_text())
+    prompt = generate_proj_prompt_2(str(proj), max_tokens=lib_size, token_counter=len)
+    assert "the content of the file (README.md)" in prompt
+    assert "the content of the file (main.py)" in prompt
+    assert "the signatures of the file (lib.py)" in prompt
+    assert "class Runner:" in prompt and "def helper_199(x):" in prompt
+    assert "return x + 199" not in prompt
+    assert "files skipped: notes.txt ---" in prompt
+
+
+def test_unbudgeted_prompt_is_complete(tmp_path):
+    proj = _project(tmp_path)
+    prompt = generate_proj_prompt_2(str(proj))
+    assert "return x + 199" in prompt and "Token budget" not in prompt
+
+
+def test_rank_files_puts_entry_points_first(tmp_path):
+    proj = _project(tmp_path)
+    (proj / "pkg").mkdir()
+    (proj / "pkg" / "main.py").write_text("")
+    ranked = [f.rel_path.replace("\\", "/") for f in rank_files(list(scan_tree(str(proj)).iter_files()))]
+    assert ranked[:3] == ["README.md", "main.py", "pkg/main.py"]
+
+
+def test_approx_token_count():
+    assert approx_token_count("") == 0
+    assert approx_token_count("abcd") == 1
+    assert approx_token_count("abcde") == 2
@@ -0,0 +1,69 @@
+import os
+import sqlite3
+
+import pytest
+
+from AEsir_utils.data_utils import PromptCache
+
+
+def test_puts_do_not_hold_the_database_lock(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    with PromptCache(path, batch_size=4, commit_interval=3600) as cache:
+        for i in range(10):
+            cache.put(f"k{i}", "v" * i)
+            other = sqlite3.connect(str(path), timeout=0.1)
+            other.execute("INSERT OR REPLACE INTO entries VALUES (?, 'x', 1, 0)", (f"other{i}",))
+            other.commit()
+            other.close()
+        assert cache.get("k9") == "v" * 9  # still buffered
+    with PromptCache(path) as cache:
+        assert cache.info()["entries"] == 20
+        assert cache.get("k5") == "vvvvv"
+
+
+def test_flush_evicts_least_recently_used(tmp_path):
+    with PromptCache(tmp_path / "cache.sqlite", max_bytes=10) as cache:
+        cache.put("a", "aaaa")
+        cache.put("b", "bbbb")
+        cache.flush()
+        assert cache.get("a") == "aaaa"
+        cache.put("c", "cccc")
+        cache.flush()
+        assert cache.get("b") is None
+        assert cache.get("a") == "aaaa" and cache.get("c") == "cccc"
+
+
+def _prompt(proj, cache_path, **kwargs):
+    from AEsir_utils import RunStats
+    from AEsir_utils.data_utils import generate_proj_prompt_2
+
+    stats = RunStats()
+    prompt = generate_proj_prompt_2(str(proj), cache=str(cache_path), stats=stats, **kwargs)
+    return prompt, stats.counts
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"max_tokens": 10_000}])
+def test_project_prompt_cache_hits_and_invalidation(tmp_path, kwargs):
+    proj, cache_path = tmp_path / "proj", tmp_path / "cache.sqlite"
+    proj.mkdir()
+    (proj / "a.py").write_text("def a():\n    return 1\n")
+    (proj / "b.py").write_text("def b():\n    return 2\n")
+
+    cold, counts = _prompt(proj, cache_path, **kwargs)
+    assert counts["files_read"] == 2 and "files_cached" not in counts
+
+    warm, counts = _prompt(proj, cache_path, **kwargs)
+    assert warm == cold
+    assert counts["files_cached"] == 2 and counts["overview_cached"] == 1 and "files_read" not in counts
+
+    # Same size, new content and mtime: only that file is read again.
+    st = os.stat(proj / "a.py")
+    (proj / "a.py").write_text("def z():\n    return 9\n")
+    os.utime(proj / "a.py", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    changed, counts = _prompt(proj, cache_path, **kwargs)
+    assert counts["files_read"] == 1 and counts["files_cached"] == 1
+    assert "def z()" in changed and "def a()" not in changed
+
+    # Other options do not reuse the cached blocks.
+    _, counts = _prompt(proj, cache_path, max_file_size_kb=1, **kwargs)
+    assert counts["files_read"] == 2
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from AEsir_utils.detection_utils import draw_bboxes, draw_bboxes_dir
+
+H, W = 40, 50
+GRAYS = [(1, 1, 1), (2, 2, 2), (3, 3, 3)]
+
+
+def _random_boxes(rng, n, min_side):
+    xy = rng.integers(-10, [W + 5, H + 5], (n, 2))
+    wh = rng.integers(min_side, min_side + 15, (n, 2))
+    return np.concatenate([xy, xy + wh - 1], axis=1)
+
+
+@pytest.mark.parametrize("thickness", [1, 2, 3])
+def test_matches_pil_rectangle(thickness):
+    rng = np.random.default_rng(thickness)
+    for _ in range(200):
+        boxes = _random_boxes(rng, int(rng.integers(1, 4)), 2 * thickness)
+        ours = draw_bboxes(np.zeros((H, W), np.uint8), boxes, colors=GRAYS, thickness=thickness)
+        ref = Image.new('L', (W, H))
+        draw = ImageDraw.Draw(ref)
+        for i, box in enumerate(boxes.tolist()):
+            draw.rectangle(box, outline=i % 3 + 1, width=thickness)
+        np.testing.assert_array_equal(ours, np.asarray(ref))
+
+
+@pytest.mark.parametrize("box", [[10, 5, 10, 20], [5, 12, 30, 12], [7, 7, 7, 7], [4, 4, 6, 30]])
+def test_thin_boxes_are_filled_inside_their_bounds(box):
+    ours = draw_bboxes(np.zeros((H, W), np.uint8), [box], colors=[(1, 1, 1)], thickness=3)
+    expected = np.zeros((H, W), np.uint8)
+    x1, y1, x2, y2 = box
+    expected[y1:y2 + 1, x1:x2 + 1] = 1
+    np.testing.assert_array_equal(ours, expected)
+
+
+def test_draw_bboxes_dir_leaves_no_temp_files(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    Image.new('RGB', (W, H)).save(src / "a.png")
+    summary = draw_bboxes_dir(str(src), {"a.png": [[2, 2, 20, 20]]}, str(out), verbose=False)
+    assert summary["processed"] == 1
+    assert sorted(p.name for p in out.iterdir()) == ["a.png"]
+    assert np.asarray(Image.open(out / "a.png"))[2, 2].tolist() == [0, 0, 255]
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_draw_bboxes_dir_counts_bad_files_as_failed(tmp_path, num_workers):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    Image.new('RGB', (W, H)).save(src / "a.png")
+    data = (src / "a.png").read_bytes()
+    (src / "truncated.png").write_bytes(data[:len(data) // 2])
+    Image.new('RGB', (W, H)).save(src / "c.unknownext", format="PNG")
+    (src / "text.png").write_text("not an image")
+    annotations = {
+        "a.png": [[2, 2, 20, 20]],
+        "truncated.png": [[2, 2, 20, 20]],
+        "c.unknownext": [[2, 2, 20, 20]],
+        "text.png": [[2, 2, 20, 20]],
+    }
+    summary = draw_bboxes_dir(str(src), annotations, str(out), num_workers=num_workers, verbose=False)
+    assert (summary["processed"], summary["skipped"], summary["failed"]) == (1, 1, 2)
+    assert sorted(p.name for p in out.iterdir()) == ["a.png"]
+
+
+@pytest.mark.parametrize("mode", ["RGBA", "LA"])
+def test_draw_bboxes_dir_keeps_alpha(tmp_path, mode):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    Image.new(mode, (W, H)).save(src / "a.png")
+    draw_bboxes_dir(str(src), {"a.png": [[2, 2, 20, 20]]}, str(out), verbose=False)
+    result = Image.open(out / "a.png")
+    assert result.mode == "RGBA"
+    assert result.getpixel((2, 2)) == (0, 0, 255, 255)
+    assert result.getpixel((10, 10))[3] == 0
@@ -0,0 +1,35 @@
+import tracemalloc
+
+import pytest
+
+from AEsir_utils import RunStats
+
+
+@pytest.fixture
+def tracing():
+    tracemalloc.start()
+    yield
+    tracemalloc.stop()
+
+
+def test_peak_without_reset_peak(tracing, monkeypatch):
+    monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)
+    big = bytearray(4_000_000)
+    del big
+
+    stats = RunStats(track_memory=True)
+    small = bytearray(1000)
+    assert stats.peak_memory()["peak_traced_bytes"] is None
+
+    stats = RunStats(track_memory=True)
+    bigger = bytearray(8_000_000)
+    assert stats.peak_memory()["peak_traced_bytes"] >= 8_000_000
+    del small, bigger
+
+
+def test_track_memory_reports_own_peak():
+    stats = RunStats(track_memory=True)
+    data = bytearray(2_000_000)
+    stats.stop()
+    assert stats.peak_memory()["peak_traced_bytes"] >= 2_000_000
+    del data